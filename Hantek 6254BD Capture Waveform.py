@@ -7,10 +7,13 @@ from ctypes import *
 import time
 import numpy
 import matplotlib.pyplot as plt
+from convert import alloc_raw, channel_scale, channel_view, to_volts
+from driver import load_driver
 #https://docs.python.org/3/library/ctypes.html
-# load dll (cdll or windll)
+# load dll (cdll or windll): HTHardDll on Windows, the simulator elsewhere
+# (HANTEK_DRIVER=dll|sim and HANTEK_DLL_PATH override, see driver.py)
 # OBJdll = windll.LoadLibrary(r".\Dll\x64\HTHardDll.dll") # (64 bit)
-OBJdll = windll.LoadLibrary(r"C:\Users\zhoul\Desktop\Hantek scope\Hantek Python API\Dll\x64\HTHardDll.dll")
+OBJdll = load_driver()
 # OBJdll = windll.LoadLibrary(r".\Dll\x86\HTHardDll.dll") # (32 bit)
 
 class RELAYCONTROL(Structure):
@@ -253,10 +256,8 @@ print("Data is ready to read, READING DATA")
 # https://stackoverflow.com/questions/37680467/pointer-to-c-int16-array-buffer-in-ctypes
 # https://stackoverflow.com/questions/1363163/pointers-and-arrays-in-python-ctypes
 # https://stackoverflow.com/questions/50819576/python-passing-user-defined-class-by-reference-to-dlls
-CH1ReadData = (wintypes.WORD * 4096)() # the () initializes the array
-CH2ReadData = (wintypes.WORD * 4096)()
-CH3ReadData = (wintypes.WORD * 4096)()
-CH4ReadData = (wintypes.WORD * 4096)()
+# One contiguous block; CHnReadData alias its four slices (see convert.alloc_raw)
+rawBlock, (CH1ReadData, CH2ReadData, CH3ReadData, CH4ReadData) = alloc_raw(4096)
 
 # NOTE: ffi_prep_cif failed ERROR happens when you don't include argtypes and restype
 dsoHTGetData = OBJdll.dsoHTGetData
@@ -271,21 +272,19 @@ CH2SrcData = []
 CH3SrcData = []
 CH4SrcData = []
 if result == 1:
-    for i in range(stDataControl.nReadDataLen):
-        # Calculate Time Points
-        if(ADC_CHANNEL_MODE == 1):
-            curSampleRate = SAMPLING_RATE_SINGLE[TIME_PER_DIVISION]
-        elif(ADC_CHANNEL_MODE == 2):
-            curSampleRate = SAMPLING_RATE_DUAL[TIME_PER_DIVISION]
-        elif(ADC_CHANNEL_MODE == 4):
-            curSampleRate = SAMPLING_RATE_QUAD[TIME_PER_DIVISION]
-        else:
-            print('ADC_CHANNEL_MODE can only be 1, 2 or 4, aborting.')
-        timeData.append(i / curSampleRate)
-        CH1SrcData.append((CH1ReadData[i] - (255 - CH_ZERO_POS[0])) * PROBE_MULTIPLIER * VOLT_MULT[VOLTS_PER_DIVISION] * VOLT_DIVISIONS / 256)
-        CH2SrcData.append((CH2ReadData[i] - (255 - CH_ZERO_POS[1])) * PROBE_MULTIPLIER * VOLT_MULT[VOLTS_PER_DIVISION] * VOLT_DIVISIONS / 256)
-        CH3SrcData.append((CH3ReadData[i] - (255 - CH_ZERO_POS[2])) * PROBE_MULTIPLIER * VOLT_MULT[VOLTS_PER_DIVISION] * VOLT_DIVISIONS / 256)
-        CH4SrcData.append((CH4ReadData[i] - (255 - CH_ZERO_POS[3])) * PROBE_MULTIPLIER * VOLT_MULT[VOLTS_PER_DIVISION] * VOLT_DIVISIONS / 256)
+    # Calculate Time Points
+    if(ADC_CHANNEL_MODE == 1):
+        curSampleRate = SAMPLING_RATE_SINGLE[TIME_PER_DIVISION]
+    elif(ADC_CHANNEL_MODE == 2):
+        curSampleRate = SAMPLING_RATE_DUAL[TIME_PER_DIVISION]
+    elif(ADC_CHANNEL_MODE == 4):
+        curSampleRate = SAMPLING_RATE_QUAD[TIME_PER_DIVISION]
+    else:
+        print('ADC_CHANNEL_MODE can only be 1, 2 or 4, aborting.')
+    nRead = stDataControl.nReadDataLen
+    timeData = numpy.arange(nRead) / curSampleRate
+    scale, offset = channel_scale(VOLT_MULT[VOLTS_PER_DIVISION], CH_ZERO_POS, PROBE_MULTIPLIER)
+    CH1SrcData, CH2SrcData, CH3SrcData, CH4SrcData = to_volts(channel_view(rawBlock), scale, offset)[:, :nRead]
 else:
     print('READ FAILED')
 
@@ -0,0 +1,326 @@
+"""
+Chunked, compressed archive of many captures (.htarc) with random access.
+
+Each capture's channels are cut into chunks of `chunk_samples` samples and
+every chunk is compressed on its own, so any (run, channel, sample range)
+is read back by decompressing only the chunks it overlaps.
+
+Codecs are "[delta-]<compressor>":
+    delta-   first differences of the codes (wrapping), so an idle bus line
+             becomes a run of zeros and every edge a single non-zero value
+    zlib     zlib level 1            lzma   lzma preset 1
+    rle      (value, run length) pairs, pure NumPy
+    raw      stored as is
+The default is plain zlib: on the I2C run folders it compresses slightly
+better than delta-zlib (the 8-bit codes already repeat byte for byte on
+idle lines) and it keeps up with the capture loop several times over;
+lzma gains ~20% more ratio but is too slow to run inline.
+
+Layout (little endian):
+    header  MAGIC, version, chunk_samples
+    chunks  compressed bytes, back to back
+    index   CHUNK_DTYPE rows (run, channel, start, length, offset, size)
+    meta    JSON: codec and per-run dtype, shape, scale/offset, timing, trigger
+    footer  index offset, index bytes, meta bytes, END_MAGIC
+
+Usage:
+    python archive.py bench [codec ...]      compress speed vs capture rate
+    python archive.py ratio FOLDER ...       ratios on existing run folders
+"""
+
+import json
+import lzma
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+MAGIC      = b"HTARC\x00\x00\x00"
+END_MAGIC  = b"HTARCEND"
+VERSION    = 1
+EXTENSION  = ".htarc"
+DEFAULT_CODEC  = "zlib"
+DEFAULT_CHUNK  = 1 << 16
+
+_HEADER = struct.Struct("<8sHI")
+_FOOTER = struct.Struct("<QQQ8s")
+CHUNK_DTYPE = np.dtype([("run", "<u4"), ("channel", "<u2"), ("start", "<u8"),
+                        ("length", "<u4"), ("offset", "<u8"), ("size", "<u4")])
+
+
+# ── CODECS ─────────────────────────────────────────────────────────────────────
+def _rle_encode(x: np.ndarray) -> bytes:
+    starts = np.flatnonzero(np.diff(x)) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, len(x))).astype("<u4")
+    return struct.pack("<I", len(starts)) + x[starts].tobytes() + lengths.tobytes()
+
+
+def _rle_decode(buf: bytes, dtype) -> np.ndarray:
+    k = struct.unpack_from("<I", buf)[0]
+    values = np.frombuffer(buf, dtype=dtype, count=k, offset=4)
+    lengths = np.frombuffer(buf, dtype="<u4", count=k,
+                            offset=4 + k * np.dtype(dtype).itemsize)
+    return np.repeat(values, lengths)
+
+
+_COMPRESSORS = {
+    "raw":  (lambda x: x.tobytes(),
+             lambda b, dt: np.frombuffer(b, dtype=dt)),
+    "zlib": (lambda x: zlib.compress(x.tobytes(), 1),
+             lambda b, dt: np.frombuffer(zlib.decompress(b), dtype=dt)),
+    "lzma": (lambda x: lzma.compress(x.tobytes(), preset=1),
+             lambda b, dt: np.frombuffer(lzma.decompress(b), dtype=dt)),
+    "rle":  (_rle_encode, _rle_decode),
+}
+
+
+def _parse_codec(codec: str) -> tuple:
+    delta, _, name = codec.rpartition("-")
+    if name not in _COMPRESSORS or delta not in ("", "delta"):
+        raise ValueError(f"unknown codec {codec!r}")
+    return bool(delta), _COMPRESSORS[name]
+
+
+def encode(x: np.ndarray, codec: str = DEFAULT_CODEC) -> bytes:
+    """Compress one 1-D code array."""
+    delta, (comp, _) = _parse_codec(codec)
+    if delta:
+        x = np.diff(x, prepend=x.dtype.type(0))        # wraps modulo the dtype
+    return comp(np.ascontiguousarray(x))
+
+
+def decode(buf: bytes, dtype, codec: str = DEFAULT_CODEC) -> np.ndarray:
+    delta, (_, decomp) = _parse_codec(codec)
+    x = decomp(buf, np.dtype(dtype))
+    return np.cumsum(x, dtype=dtype) if delta else x
+
+
+# ── WRITER ─────────────────────────────────────────────────────────────────────
+class ArchiveWriter:
+    """
+    Append captures with add(); close() writes the index.  Chunks of one
+    capture are compressed on `workers` threads (zlib and lzma release the
+    GIL) and written in order.
+    """
+
+    def __init__(self, path: str, codec: str = DEFAULT_CODEC,
+                 chunk_samples: int = DEFAULT_CHUNK, workers: int = 1):
+        _parse_codec(codec)
+        self.path          = path
+        self.codec         = codec
+        self.chunk_samples = chunk_samples
+        self.raw_bytes     = 0
+        self._index        = []
+        self._runs         = []
+        self._f            = open(path, "wb")
+        self._f.write(_HEADER.pack(MAGIC, VERSION, chunk_samples))
+        self._ex           = ThreadPoolExecutor(workers) if workers > 1 else None
+
+    def add(self, codes: np.ndarray, scale, offset, sample_rate: float,
+            time_div: int = 0xFFFF, trigger: dict = None) -> int:
+        """Append one (channels, samples) uint8/uint16 capture; returns its run number."""
+        codes = np.asarray(codes)
+        run = len(self._runs)
+        nch, n = codes.shape
+        pieces = [(ch, s, codes[ch, s:s + self.chunk_samples])
+                  for ch in range(nch) for s in range(0, n, self.chunk_samples)]
+        enc = lambda p: encode(p[2], self.codec)
+        blobs = self._ex.map(enc, pieces) if self._ex else map(enc, pieces)
+        for (ch, start, piece), blob in zip(pieces, blobs):
+            self._index.append((run, ch, start, len(piece), self._f.tell(), len(blob)))
+            self._f.write(blob)
+        self.raw_bytes += codes.nbytes
+        self._runs.append({
+            "dtype": codes.dtype.name, "channels": nch, "samples": n,
+            "scale": np.broadcast_to(np.asarray(scale, float), (nch,)).tolist(),
+            "offset": np.broadcast_to(np.asarray(offset, float), (nch,)).tolist(),
+            "sample_rate": sample_rate, "time_div": time_div,
+            "trigger": trigger or {},
+        })
+        return run
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        if self._ex is not None:
+            self._ex.shutdown()
+        index = np.array(self._index, dtype=CHUNK_DTYPE).tobytes()
+        meta  = json.dumps({"codec": self.codec, "runs": self._runs}).encode()
+        pos = self._f.tell()
+        self._f.write(index)
+        self._f.write(meta)
+        self._f.write(_FOOTER.pack(pos, len(index), len(meta), END_MAGIC))
+        self._f.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ── READER ─────────────────────────────────────────────────────────────────────
+class ArchiveReader:
+    def __init__(self, path: str):
+        self.path = path
+        self._f   = open(path, "rb")
+        magic, version, self.chunk_samples = _HEADER.unpack(self._f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an {EXTENSION} file")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported version {version}")
+        self._f.seek(-_FOOTER.size, os.SEEK_END)
+        pos, n_index, n_meta, end = _FOOTER.unpack(self._f.read(_FOOTER.size))
+        if end != END_MAGIC:
+            raise ValueError(f"{path}: truncated archive (no index)")
+        self._f.seek(pos)
+        self.index = np.frombuffer(self._f.read(n_index), dtype=CHUNK_DTYPE)
+        meta = json.loads(self._f.read(n_meta))
+        self.codec = meta["codec"]
+        self.runs  = meta["runs"]
+
+    def __len__(self) -> int:
+        return len(self.runs)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def read(self, run: int, channel: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """Codes [start, stop) of 0-based `channel`, decompressing only overlapping chunks."""
+        info = self.runs[run]
+        stop = info["samples"] if stop is None else min(stop, info["samples"])
+        out = np.empty(max(0, stop - start), dtype=info["dtype"])
+        idx = self.index
+        sel = idx[(idx["run"] == run) & (idx["channel"] == channel)
+                  & (idx["start"] < stop) & (idx["start"] + idx["length"] > start)]
+        for c in sel:
+            self._f.seek(int(c["offset"]))
+            x = decode(self._f.read(int(c["size"])), info["dtype"], self.codec)
+            s = int(c["start"])
+            lo, hi = max(start, s), min(stop, s + int(c["length"]))
+            out[lo - start:hi - start] = x[lo - s:hi - s]
+        return out
+
+    def codes(self, run: int) -> np.ndarray:
+        """Whole (channels, samples) code array of one run."""
+        info = self.runs[run]
+        return np.stack([self.read(run, ch) for ch in range(info["channels"])])
+
+    def volts(self, run: int, channel: int, start: int = 0, stop: int = None) -> np.ndarray:
+        info = self.runs[run]
+        x = self.read(run, channel, start, stop)
+        return (x - info["offset"][channel]) * info["scale"][channel]
+
+
+# ── BENCHMARK ──────────────────────────────────────────────────────────────────
+def _sim_captures(n: int, count: int) -> list:
+    """`count` (4, n) uint8 captures from the simulated I2C/square/noise channels."""
+    from ctypes import byref
+    import getData
+    from convert import alloc_raw, channel_view
+    from simdll import SimDll
+
+    sim = SimDll(time_scale=0)
+    rc, dc = getData.build_controls()
+    dc.nBufferLen = dc.nReadDataLen = n
+    getData.configure_scope(0, rc, dc, sim)
+    block, raw = alloc_raw(n)
+    out = []
+    for _ in range(count):
+        sim.dsoHTStartCollectData(0, 1)
+        sim.dsoHTGetData(0, raw[0], raw[1], raw[2], raw[3], byref(dc))
+        out.append(channel_view(block).astype(np.uint8))
+    return out
+
+
+def benchmark(codecs=("raw", "zlib", "delta-zlib", "rle", "delta-rle", "lzma", "delta-lzma"),
+              n: int = 1 << 16, count: int = 32) -> None:
+    from pipeline import CapturePipeline
+    from simdll import SimDll
+    from getData import DataControl
+
+    # bytes/s the capture loop itself produces on the simulator at this length
+    dc = DataControl(nReadDataLen=n, nBufferLen=n)
+    rep = CapturePipeline(SimDll(), 0, dc, lambda run, codes: None).run(count)
+    loop_MBs = rep["captures_s"] * 4 * n / 1e6
+
+    caps = _sim_captures(n, count)
+    tmp = os.path.join(tempfile.mkdtemp(), "bench" + EXTENSION)
+    print(f"capture loop: {loop_MBs:.1f} MB/s of uint8 codes ({n} samples × 4 ch)")
+    print(f"{'codec':<12} {'ratio':>7} {'write MB/s':>11} {'read MB/s':>10} {'margin':>7}")
+    try:
+        for codec in codecs:
+            t0 = time.perf_counter()
+            with ArchiveWriter(tmp, codec) as w:
+                for c in caps:
+                    w.add(c, 1.0, 128, 2.5e6)
+            t1 = time.perf_counter()
+            with ArchiveReader(tmp) as r:
+                for run in range(len(r)):
+                    assert np.array_equal(r.codes(run), caps[run])
+            t2 = time.perf_counter()
+            mb = w.raw_bytes / 1e6
+            print(f"{codec:<12} {w.raw_bytes / os.path.getsize(tmp):>6.1f}x "
+                  f"{mb / (t1 - t0):>11.1f} {mb / (t2 - t1):>10.1f} "
+                  f"{mb / (t1 - t0) / loop_MBs:>6.0f}x")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def ratios(folders, codecs=("zlib", "delta-zlib", "delta-rle", "delta-lzma")) -> None:
+    """
+    Archive every run of each folder and compare sizes.  A run saved both
+    as text and as .htcap is archived once, from the .htcap.
+    """
+    from capfile import read_capture, text_codes
+
+    for folder in folders:
+        runs = {}                               # stem -> {extension: path}
+        for name in os.listdir(folder):
+            stem, ext = os.path.splitext(name)
+            if ext in (".txt", ".htcap"):
+                runs.setdefault(stem, {})[ext] = os.path.join(folder, name)
+        caps, text_bytes = [], 0
+        for stem in sorted(runs):
+            paths = runs[stem]
+            if ".txt" in paths:
+                text_bytes += os.path.getsize(paths[".txt"])
+            if ".htcap" in paths:
+                cap = read_capture(paths[".htcap"])
+                codes, scale, offset, fs = np.array(cap.codes), cap.scale, cap.offset, cap.sample_rate
+            else:
+                codes, scale, offset, fs = text_codes(paths[".txt"])
+            caps.append((codes, scale, offset, fs))
+        raw = sum(c[0].nbytes for c in caps)
+        print(f"{folder}: {len(caps)} runs, text {text_bytes / 1e3:.0f} kB, "
+              f"binary {raw / 1e3:.1f} kB")
+        for codec in codecs:
+            path = os.path.join(tempfile.gettempdir(), "ratio" + EXTENSION)
+            with ArchiveWriter(path, codec) as w:
+                for c in caps:
+                    w.add(*c)
+            size = os.path.getsize(path)
+            os.remove(path)
+            vs_text = f"{text_bytes / size:6.1f}x vs text, " if text_bytes else ""
+            print(f"  {codec:<12} {size / 1e3:8.1f} kB  {vs_text}{raw / size:5.1f}x vs binary")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        benchmark(*([tuple(sys.argv[2:])] if sys.argv[2:] else []))
+    elif len(sys.argv) >= 3 and sys.argv[1] == "ratio":
+        ratios(sys.argv[2:])
+    else:
+        sys.exit(__doc__)
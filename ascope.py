@@ -0,0 +1,302 @@
+"""
+Asyncio client for one scope.
+
+    async with AsyncScope() as scope:
+        await scope.configure(time_div=14, volt_div=8, trigger_level=200)
+        frame = await scope.capture(timeout=1.0)
+        async for frame in scope.stream():
+            ...
+
+HTHardDll is not re-entrant, so every driver call (including loading it)
+runs on one dedicated thread; the event loop only awaits those calls.
+Readiness is polled with waiting.Backoff delays between dsoHTGetState calls
+on that thread, so the loop never blocks.
+
+capture() calls are serialised with an asyncio.Lock.  Cancelling or timing
+out a capture is safe: the call in flight on the DLL thread finishes, its
+result is dropped and the next capture re-arms the scope.  Frames own a
+copy of the codes (made on the DLL thread), so nothing aliases a driver
+buffer.
+
+stream() subscribers share one capture task: every frame is fanned out to
+each subscriber's bounded queue, and a subscriber that falls behind loses
+its oldest frames (counted in `dropped`) rather than stalling the others.
+The task stops when the last subscriber leaves.  A capture timeout is
+raised in every consumer; any other error ends the task and is raised in
+every consumer too, and close() ends every stream.
+
+Usage (simulated driver, many concurrent consumers):
+    python ascope.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import byref
+import numpy as np
+
+from convert import alloc_raw, channel_scale, channel_view
+from driver import SAMPLING_RATE_SINGLE, VOLT_MULT, load_driver
+from waiting import STATE_READY, Backoff
+
+_CLOSED = None      # queued by close(): the stream ends
+
+
+class Frame:
+    """One captured record: (4, n) uint8 codes plus what is needed to scale them."""
+
+    __slots__ = ("seq", "timestamp", "codes", "scale", "offset", "sample_rate")
+
+    def __init__(self, seq, timestamp, codes, scale, offset, sample_rate):
+        self.seq         = seq
+        self.timestamp   = timestamp
+        self.codes       = codes
+        self.scale       = scale
+        self.offset      = offset
+        self.sample_rate = sample_rate
+
+    def volts(self, ch: int) -> np.ndarray:
+        return (self.codes[ch] - self.offset[ch]) * self.scale[ch]
+
+    @property
+    def time(self) -> np.ndarray:
+        return np.arange(self.codes.shape[1]) / self.sample_rate
+
+
+class AsyncScope:
+    def __init__(self, driver=None, kind: str = None, idx: int = None,
+                 queue_size: int = 8, **sim_kwargs):
+        """
+        Pass an already loaded `driver`, or `kind`/`sim_kwargs` for
+        driver.load_driver() (called on the DLL thread by open()).
+        """
+        self.driver      = driver
+        self.kind        = kind
+        self.idx         = idx
+        self.queue_size  = queue_size
+        self.sim_kwargs  = sim_kwargs
+        self.frames      = 0
+        self._thread     = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hantek-dll")
+        self._lock       = asyncio.Lock()
+        self._subs       = set()
+        self._producer   = None
+        self._state      = None
+        self._rc = self._dc = None
+        self._block = self._raw = None
+        self._scale = self._offset = None
+        self._volt_div   = None
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, fn, *args)
+
+    # ── setup ─────────────────────────────────────────────────────────────────
+    def _open(self) -> None:
+        import getData
+        from scopestate import ScopeState
+
+        if self.driver is None:
+            self.driver = load_driver(self.kind, **self.sim_kwargs)
+        if self.idx is None:
+            self.idx = getData.get_device_index(self.driver)
+        getData.initialize_device(self.idx, self.driver)
+        self._rc, self._dc = getData.build_controls()
+        self._zero_pos = getData.CH_ZERO_POS
+        self._probe    = getData.PROBE_MULTIPLIER
+        self._state    = ScopeState(self.driver, self.idx, self._zero_pos)
+        self._configure({})
+
+    async def open(self) -> "AsyncScope":
+        await self._call(self._open)
+        return self
+
+    async def close(self) -> None:
+        if self._producer is not None:
+            self._producer.cancel()
+            await asyncio.gather(self._producer, return_exceptions=True)
+        self._publish(_CLOSED)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.shutdown)
+
+    async def __aenter__(self) -> "AsyncScope":
+        return await self.open()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def _configure(self, settings: dict) -> list:
+        rc, dc = self._rc, self._dc
+        if "time_div" in settings:
+            dc.nTimeDIV = settings["time_div"]
+        if "volt_div" in settings:
+            for ch in range(4):
+                rc.nCHVoltDIV[ch] = settings["volt_div"]
+        if "trigger_level" in settings:
+            dc.nVTriggerPos = settings["trigger_level"]
+        if "trigger_slope" in settings:
+            dc.nTriggerSlope = settings["trigger_slope"]
+        if "buffer_len" in settings:
+            dc.nBufferLen = dc.nReadDataLen = settings["buffer_len"]
+        done = self._state.apply(rc, dc)
+        if self._block is None or len(self._raw[0]) != dc.nReadDataLen:
+            self._block, self._raw = alloc_raw(dc.nReadDataLen)
+        self._volt_div = VOLT_MULT[rc.nCHVoltDIV[0]]
+        self._scale, self._offset = channel_scale(self._volt_div, self._zero_pos, self._probe)
+        return done
+
+    async def configure(self, **settings) -> list:
+        """
+        Apply time_div, volt_div, trigger_level, trigger_slope and/or
+        buffer_len; only changed driver settings are sent.  Waits for any
+        capture in progress.  Returns the scopestate call keys that were made.
+        """
+        async with self._lock:
+            return await self._call(self._configure, settings)
+
+    @property
+    def sample_rate(self) -> float:
+        return SAMPLING_RATE_SINGLE[self._dc.nTimeDIV]
+
+    # ── capture ───────────────────────────────────────────────────────────────
+    def _read(self) -> np.ndarray:
+        raw = self._raw
+        if self.driver.dsoHTGetData(self.idx, raw[0], raw[1], raw[2], raw[3],
+                                    byref(self._dc)) == 0:
+            raise RuntimeError(f"dsoHTGetData failed on device {self.idx}")
+        return channel_view(self._block)[:, :self._dc.nReadDataLen].astype(np.uint8)
+
+    async def _capture(self) -> Frame:
+        d = self.driver
+        await self._call(d.dsoHTStartCollectData, self.idx, 1)
+        delays = Backoff.for_record(self._dc.nReadDataLen, self.sample_rate).delays()
+        while not await self._call(d.dsoHTGetState, self.idx) & STATE_READY:
+            await asyncio.sleep(next(delays))
+        codes = await self._call(self._read)
+        self.frames += 1
+        return Frame(self.frames, time.time(), codes, self._scale, self._offset,
+                     self.sample_rate)
+
+    async def capture(self, timeout: float = None) -> Frame:
+        """Arm, wait for the trigger and read one frame; TimeoutError after `timeout` s."""
+        async with self._lock:
+            try:
+                return await asyncio.wait_for(self._capture(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"device {self.idx}: no frame within {timeout} s") from None
+
+    # ── streaming ─────────────────────────────────────────────────────────────
+    def _publish(self, item) -> None:
+        for q in list(self._subs):
+            if q.full():
+                q.get_nowait()
+                q.dropped += 1
+            q.put_nowait(item)
+
+    async def _produce(self, timeout: float) -> None:
+        try:
+            while self._subs:
+                try:
+                    frame = await self.capture(timeout)
+                except TimeoutError as exc:
+                    frame = exc
+                except Exception as exc:        # driver failure: end every stream
+                    self._publish(exc)
+                    return
+                self._publish(frame)
+        finally:
+            self._producer = None
+
+    async def stream(self, max_frames: int = None, timeout: float = None):
+        """
+        Async iterator of frames shared with every other stream() consumer.
+        A TimeoutError or driver error from the capture loop is raised in
+        each consumer; the iterator ends when the scope is closed.
+        """
+        q = asyncio.Queue(self.queue_size)
+        q.dropped = 0
+        self._subs.add(q)
+        if self._producer is None:
+            self._producer = asyncio.ensure_future(self._produce(timeout))
+        try:
+            n = 0
+            while max_frames is None or n < max_frames:
+                item = await q.get()
+                if item is _CLOSED:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                n += 1
+                yield item
+        finally:
+            self._subs.discard(q)
+
+
+# ── DEMO ───────────────────────────────────────────────────────────────────────
+async def _demo(consumers: int = 200, frames: int = 50) -> None:
+    async with AsyncScope(kind="sim") as scope:
+        print("configure:", await scope.configure(time_div=13, volt_div=8))
+        f = await scope.capture(timeout=1.0)
+        print(f"single capture: seq {f.seq}, {f.codes.shape}, "
+              f"CH1 {f.volts(0).min():.2f}..{f.volts(0).max():.2f} V")
+
+        async def consume(i: int) -> int:
+            seqs = [fr.seq async for fr in scope.stream(max_frames=frames)]
+            return len(seqs)
+
+        # a slow consumer and many fast ones share the same capture task
+        t0 = time.perf_counter()
+        ticker = 0
+
+        async def tick():
+            nonlocal ticker
+            while True:
+                await asyncio.sleep(0.001)
+                ticker += 1
+
+        tick_task = asyncio.ensure_future(tick())
+        counts = await asyncio.gather(*(consume(i) for i in range(consumers)))
+        wall = time.perf_counter() - t0
+        tick_task.cancel()
+        print(f"{consumers} consumers × {frames} frames in {wall:.2f} s "
+              f"({scope.frames} captures); all complete: {set(counts) == {frames}}; "
+              f"event loop ticked {ticker} times (not blocked)")
+
+        # cancellation mid-capture, then a normal capture still works
+        task = asyncio.ensure_future(scope.capture())
+        await asyncio.sleep(0.0005)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        print("after cancel:", (await scope.capture(timeout=1.0)).seq)
+
+    async with AsyncScope(kind="sim", trigger_latency=5.0) as slow:
+        try:
+            await slow.capture(timeout=0.05)
+        except TimeoutError as exc:
+            print("timeout:", exc)
+        await slow.configure(time_div=14)
+
+    # a driver error reaches every consumer instead of leaving them waiting
+    async with AsyncScope(kind="sim") as bad:
+        bad.driver.dsoHTGetData = lambda *args: 0
+
+        async def consume_bad():
+            try:
+                return [fr async for fr in bad.stream()]
+            except RuntimeError as exc:
+                return exc
+
+        print("driver error:", await asyncio.wait_for(
+            asyncio.gather(consume_bad(), consume_bad()), 5.0))
+
+    # close() ends streams that are still waiting
+    scope = await AsyncScope(kind="sim", trigger_latency=5.0).open()
+
+    async def consume_all():
+        return [fr async for fr in scope.stream()]
+
+    waiting = asyncio.ensure_future(asyncio.gather(consume_all(), consume_all()))
+    await asyncio.sleep(0.01)
+    await scope.close()
+    print("after close:", await asyncio.wait_for(waiting, 5.0))
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
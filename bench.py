@@ -0,0 +1,234 @@
+"""
+Acquisition benchmark: the full capture pipeline against the simulated
+driver, over a matrix of buffer length × channel mask (nCHSet) × timebase ×
+output format.
+
+Every case configures a fresh SimDll through getData.configure_scope, runs
+a CapturePipeline whose sink scales and saves each record the way getData
+does, and records
+
+    captures/s, MB/s (raw codes transferred), wall time
+    per-stage busy time: buffer_wait, acquire (arm + wait, i.e. collect_data),
+        transfer (dsoHTGetData), scale, save, process (scale + save)
+    peak RSS of the process that ran the case
+
+Cases run one per child process by default so peak RSS is per case.
+Results go to a JSON file; with a baseline file every case is compared on
+captures/s, MB/s and peak RSS and the run fails (exit status 1) when one is
+worse than the baseline by more than the tolerance.
+
+Usage:
+    python bench.py [--quick] [--out bench_results.json]
+                    [--baseline bench_baseline.json] [--tolerance 0.15]
+                    [--save-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+MATRIX = {
+    "buffer_len": [4096, 65536],
+    "ch_set":     [0x01, 0x0F],
+    "time_div":   [11, 14],
+    "format":     ["htcap", "txt"],
+}
+QUICK_MATRIX = {
+    "buffer_len": [4096],
+    "ch_set":     [0x0F],
+    "time_div":   [14],
+    "format":     ["htcap", "txt"],
+}
+RUNS      = 50
+TOLERANCE = 0.15
+# metric → +1 if higher is better, -1 if lower is better
+CHECKED   = {"captures_s": +1, "MB_s": +1, "peak_rss_mb": -1}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def case_name(case: dict) -> str:
+    return (f"n{case['buffer_len']}_ch{case['ch_set']:#04x}"
+            f"_tb{case['time_div']}_{case['format']}")
+
+
+def cases(matrix: dict) -> list:
+    keys = list(matrix)
+    return [dict(zip(keys, values)) for values in itertools.product(*matrix.values())]
+
+
+# ── ONE CASE ───────────────────────────────────────────────────────────────────
+def run_case(case: dict, runs: int = RUNS, sim_kwargs: dict = None) -> dict:
+    """Capture `runs` records for one matrix point; returns its result dict."""
+    import getData
+    from convert import channel_scale, to_codes, to_volts
+    from driver import SAMPLING_RATE_SINGLE, VOLT_MULT
+    from pipeline import CapturePipeline, StageStats
+    from simdll import SimDll
+    from waiting import Backoff
+
+    n, tb, fmt = case["buffer_len"], case["time_div"], case["format"]
+    sim = SimDll(**(sim_kwargs or {}))
+    rc, dc = getData.build_controls()
+    dc.nCHSet, dc.nTimeDIV = case["ch_set"], tb
+    dc.nBufferLen = dc.nReadDataLen = n
+    getData.initialize_device(0, sim)
+    getData.configure_scope(0, rc, dc, sim)
+
+    fs     = SAMPLING_RATE_SINGLE[tb]
+    vpdiv  = VOLT_MULT[getData.VOLTS_PER_DIVISION]
+    folder = tempfile.mkdtemp(prefix="htbench_")
+    stages = {name: StageStats(name) for name in ("scale", "save")}
+    t_axis = np.arange(n) / fs
+    scale, offset = channel_scale(vpdiv, getData.CH_ZERO_POS, getData.PROBE_MULTIPLIER)
+
+    def sink(run: int, codes: np.ndarray) -> None:
+        t0 = time.perf_counter()
+        if fmt == "htcap":
+            data, sc, off = to_codes(codes, vpdiv, getData.CH_ZERO_POS,
+                                     getData.PROBE_MULTIPLIER)
+        else:
+            data = to_volts(codes, scale, offset).T
+        t1 = time.perf_counter()
+        if fmt == "htcap":
+            getData.save_capture(os.path.join(folder, f"run{run:05d}.htcap"),
+                                 dc, data, sc, off)
+        else:
+            getData.save_data(run, t_axis, data, folder)
+        t2 = time.perf_counter()
+        stages["scale"].add(t1 - t0, codes.nbytes)
+        stages["save"].add(t2 - t1, data.nbytes)
+
+    pipe = CapturePipeline(sim, 0, dc, sink,
+                           wait=Backoff.for_record(n, fs, timeout=10.0))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):      # mute "Saved:"
+            report = pipe.run(runs)
+        disk = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    wall = report["wall_s"]
+    report["stages"].update({k: v.as_dict(wall) for k, v in stages.items()})
+    return {
+        "case":        case,
+        "runs":        report["runs"],
+        "wall_s":      wall,
+        "captures_s":  report["captures_s"],
+        "MB_s":        pipe.stats["transfer"].nbytes / wall / 1e6 if wall else 0.0,
+        "disk_MB":     disk / 1e6,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages":      report["stages"],
+    }
+
+
+# ── MATRIX / BASELINE ──────────────────────────────────────────────────────────
+def run_matrix(matrix: dict, runs: int = RUNS, isolate: bool = True,
+               sim_kwargs: dict = None) -> dict:
+    results = {}
+    for case in cases(matrix):
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as ex:
+                res = ex.submit(run_case, case, runs, sim_kwargs).result()
+        else:
+            res = run_case(case, runs, sim_kwargs)
+        results[case_name(case)] = res
+        print_case(case_name(case), res)
+    return {
+        "created":  time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python":   platform.python_version(),
+        "runs":     runs,
+        "results":  results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    Regressions of `results` against `baseline` as (case, metric, value,
+    baseline value) tuples.  Cases or metrics missing on either side are skipped.
+    """
+    bad = []
+    for name, res in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, sign in CHECKED.items():
+            value, ref = res.get(metric), base.get(metric)
+            if value is None or ref is None:
+                continue
+            if sign > 0 and value < ref * (1 - tolerance):
+                bad.append((name, metric, value, ref))
+            elif sign < 0 and value > ref * (1 + tolerance):
+                bad.append((name, metric, value, ref))
+    return bad
+
+
+def print_case(name: str, res: dict) -> None:
+    st = res["stages"]
+    rss = res["peak_rss_mb"]
+    print(f"{name:<28} {res['captures_s']:8.1f} cap/s {res['MB_s']:7.1f} MB/s  "
+          f"acquire {st['acquire']['busy_s']:6.3f}  transfer {st['transfer']['busy_s']:6.3f}  "
+          f"scale {st['scale']['busy_s']:6.3f}  save {st['save']['busy_s']:6.3f} s  "
+          f"rss {'?' if rss is None else f'{rss:.0f}'} MB")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--quick", action="store_true", help="small matrix")
+    ap.add_argument("--runs", type=int, default=RUNS)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="baseline JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="write the results to --baseline instead of comparing")
+    ap.add_argument("--in-process", action="store_true",
+                    help="run cases in this process (peak RSS is then cumulative)")
+    args = ap.parse_args(argv)
+
+    results = run_matrix(QUICK_MATRIX if args.quick else MATRIX, args.runs,
+                         isolate=not args.in_process)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"results → {args.out}")
+
+    if args.baseline and args.save_baseline:
+        shutil.copyfile(args.out, args.baseline)
+        print(f"baseline → {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            bad = compare(results, json.load(f), args.tolerance)
+        for name, metric, value, ref in bad:
+            print(f"REGRESSION {name} {metric}: {value:.2f} vs baseline {ref:.2f} "
+                  f"(tolerance {args.tolerance:.0%})")
+        if bad:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Closed-loop frequency response: step the built-in DDS across a log-spaced
+frequency list and measure the gain and phase of a device under test.
+
+The DDS output drives the DUT input and is also probed directly, so every
+capture holds the stimulus on the reference channel (CH1 by default) and
+the DUT output on the response channel (CH2).  For each frequency the
+sweep
+    1. sets the DDS frequency (using the frequency the DLL reports back)
+       and picks the fastest timebase whose record still holds `cycles`
+       periods (choose_timebase, from TIME_MULT / SAMPLING_RATE_*), applied
+       through scopestate.ScopeState so only changed calls are sent;
+    2. waits `settle` seconds, then captures `averages` records;
+    3. hands the records to an analysis thread, which takes a single-bin
+       DFT at the stimulus frequency over a whole number of periods
+       (Hann window) on both channels; gain and phase are the ratio
+       response / reference, averaged as complex numbers.
+Step 3 of one frequency runs while steps 1-2 of the next are under way, so
+the analysis costs no wall time unless it is slower than setup + capture.
+
+With the simulated driver the response channel is an RC low-pass
+(RCLowPass) fed by the simulated DDS, so a sweep can be checked against
+the exact response.
+
+Usage:
+    python bode.py [--start 100] [--stop 1e6] [--points 25] [--samples 4096]
+                   [--cycles 8] [--averages 1] [--settle 0] [--fc 10e3]
+                   [--csv FILE] [--plot FILE] [--serial]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from ctypes import byref
+from typing import NamedTuple
+import numpy as np
+
+BODE_DTYPE = np.dtype([("freq", "f8"), ("time_div", "u2"), ("sample_rate", "f8"),
+                       ("cycles", "f8"), ("ref_amp", "f8"), ("gain", "f8"),
+                       ("gain_db", "f8"), ("phase_deg", "f8")])
+
+REF_CH      = 0
+RESP_CH     = 1
+VOLT_DIV    = 8         # VOLT_MULT index: 1 V/div
+AMPLITUDE   = 1000      # mV peak
+WAVE_SINE   = 0
+
+
+def log_frequencies(start: float, stop: float, points: int) -> np.ndarray:
+    return np.geomspace(start, stop, points)
+
+
+def choose_timebase(freq: float, samples: int, cycles: float = 8,
+                    ch_mode: int = 1) -> int:
+    """
+    Fastest TIME_MULT index whose record of `samples` holds at least
+    `cycles` periods of `freq`; the slowest timebase if none does.
+    """
+    from driver import TIME_MULT
+    from spectrum import sample_rate
+
+    for time_div in range(len(TIME_MULT)):
+        if samples / sample_rate(time_div, ch_mode) * freq >= cycles:
+            break
+    fs = sample_rate(time_div, ch_mode)
+    if fs < 4 * freq:
+        raise ValueError(f"{freq:g} Hz gets fewer than 4 samples per cycle even at "
+                         f"{fs:g} Sa/s, the fastest timebase fitting {cycles} "
+                         f"cycles in {samples} samples")
+    return time_div
+
+
+def single_bin(x: np.ndarray, freq: float, fs: float) -> np.ndarray:
+    """
+    Complex amplitude at `freq` of every row of `x` (volts, (..., samples)),
+    taken over the largest whole number of periods with a Hann window, so
+    a sine of peak A and phase φ (relative to sample 0) gives A·e^{jφ}.
+    """
+    from spectrum import window
+
+    m = int(np.floor(x.shape[-1] * freq / fs) * fs / freq)
+    if m < 2:
+        raise ValueError(f"record holds less than one period of {freq:g} Hz")
+    w, cg, _ = window("hann", m)
+    phasor = np.exp(-2j * np.pi * freq / fs * np.arange(m)) * w
+    seg = x[..., :m]
+    seg = seg - seg.mean(axis=-1, keepdims=True)
+    # sin(θ) = cos(θ - 90°): report the phase of the sine, not the cosine
+    return seg @ phasor * (2j / (m * cg))
+
+
+class Step(NamedTuple):
+    index: int
+    freq: float
+    time_div: int
+    sample_rate: float
+
+
+def analyse_step(step: Step, volts: np.ndarray) -> np.ndarray:
+    """One BODE_DTYPE record from (averages, 2, samples) reference/response volts."""
+    z = single_bin(volts, step.freq, step.sample_rate)       # (averages, 2)
+    h = (z[:, 1] / z[:, 0]).mean()
+    out = np.zeros((), dtype=BODE_DTYPE)
+    out["freq"]        = step.freq
+    out["time_div"]    = step.time_div
+    out["sample_rate"] = step.sample_rate
+    out["cycles"]      = volts.shape[-1] * step.freq / step.sample_rate
+    out["ref_amp"]     = np.abs(z[:, 0]).mean()
+    out["gain"]        = abs(h)
+    out["gain_db"]     = 20 * np.log10(abs(h))
+    out["phase_deg"]   = np.degrees(np.angle(h))
+    return out
+
+
+# ── SWEEP ──────────────────────────────────────────────────────────────────────
+class BodeSweep:
+    """
+    Frequency-response sweep on one device.  `freqs` are the requested
+    stimulus frequencies; `settle` is the wait after each frequency change
+    (DUT and generator settling) before the first capture.  run() returns a
+    BODE_DTYPE array in sweep order; `timings` holds the time spent per
+    stage and the wall time.
+    """
+
+    def __init__(self, scope, freqs, samples: int = 4096, cycles: float = 8,
+                 averages: int = 1, settle: float = 0.0, ref_ch: int = REF_CH,
+                 resp_ch: int = RESP_CH, volt_div: int = VOLT_DIV,
+                 amplitude: int = AMPLITUDE, pipelined: bool = True,
+                 idx: int = None, timeout: float = 10.0):
+        self.scope     = scope
+        self.freqs     = [float(f) for f in freqs]
+        self.samples   = samples
+        self.cycles    = cycles
+        self.averages  = averages
+        self.settle    = settle
+        self.channels  = [ref_ch, resp_ch]
+        self.volt_div  = volt_div
+        self.amplitude = amplitude
+        self.pipelined = pipelined
+        self.idx       = idx
+        self.timeout   = timeout
+        self.timings   = {"setup_s": 0.0, "capture_s": 0.0, "analysis_s": 0.0,
+                          "analysis_wait_s": 0.0, "wall_s": 0.0}
+
+    def _open(self):
+        import getData
+        from scopestate import ScopeState
+
+        s = self.scope
+        if self.idx is None:
+            self.idx = getData.get_device_index(s)
+        getData.initialize_device(self.idx, s)
+        rc, dc = getData.build_controls()
+        dc.nBufferLen = dc.nReadDataLen = self.samples
+        dc.nTriggerSource = rc.nTrigSource = self.channels[0]
+        for ch in range(4):
+            rc.nCHVoltDIV[ch] = self.volt_div
+        state = ScopeState(s, self.idx, getData.CH_ZERO_POS)
+        s.ddsSetCmd(self.idx, 0)                    # continuous wave
+        s.ddsSDKSetWaveType(self.idx, WAVE_SINE)
+        s.ddsSDKSetAmp(self.idx, self.amplitude)
+        s.ddsSDKSetOffset(self.idx, 0)
+        s.ddsSetOnOff(self.idx, 1)
+        return rc, dc, state
+
+    def _setup(self, i: int, rc, dc, state) -> Step:
+        from spectrum import sample_rate
+
+        freq = float(self.scope.ddsSDKSetFre(self.idx, self.freqs[i]))
+        time_div = choose_timebase(freq, self.samples, self.cycles, state.ch_mode)
+        dc.nTimeDIV = time_div
+        state.apply(rc, dc)
+        if self.settle > 0:
+            time.sleep(self.settle)
+        return Step(i, freq, time_div, sample_rate(time_div, state.ch_mode))
+
+    def _capture(self, step: Step, dc, raw, codes) -> np.ndarray:
+        """(averages, 2, samples) volts of the reference and response channels."""
+        import getData
+        from convert import channel_scale, to_volts
+        from driver import VOLT_MULT
+        from waiting import Backoff
+
+        s, n = self.scope, self.samples
+        waiter = Backoff.for_record(n, step.sample_rate, timeout=self.timeout)
+        scale, offset = channel_scale(VOLT_MULT[self.volt_div], getData.CH_ZERO_POS,
+                                      getData.PROBE_MULTIPLIER)
+        ch = self.channels
+        out = np.empty((self.averages, 2, n))
+        for a in range(self.averages):
+            s.dsoHTStartCollectData(self.idx, 1)
+            waiter(s, self.idx)
+            s.dsoHTGetData(self.idx, raw[0], raw[1], raw[2], raw[3], byref(dc))
+            to_volts(codes[ch, :n], scale[ch], offset[ch], out=out[a])
+        return out
+
+    def _analyse(self, step: Step, volts: np.ndarray) -> np.ndarray:
+        t0 = time.perf_counter()
+        rec = analyse_step(step, volts)
+        self.timings["analysis_s"] += time.perf_counter() - t0
+        return rec
+
+    def run(self, log=None) -> np.ndarray:
+        from convert import alloc_raw, channel_view
+
+        t_start = time.perf_counter()
+        rc, dc, state = self._open()
+        block, raw = alloc_raw(self.samples)
+        codes = channel_view(block)
+        results, futures = [], []
+        try:
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                try:
+                    for i in range(len(self.freqs)):
+                        t0 = time.perf_counter()
+                        step = self._setup(i, rc, dc, state)
+                        t1 = time.perf_counter()
+                        volts = self._capture(step, dc, raw, codes)
+                        t2 = time.perf_counter()
+                        self.timings["setup_s"]   += t1 - t0
+                        self.timings["capture_s"] += t2 - t1
+                        if self.pipelined:
+                            futures.append(ex.submit(self._analyse, step, volts))
+                        else:
+                            results.append(self._analyse(step, volts))
+                        if log is not None:
+                            log(f"{step.freq:12.1f} Hz  tb {step.time_div:2d}  "
+                                f"{step.sample_rate / 1e6:8.3f} MS/s")
+                finally:
+                    t0 = time.perf_counter()
+                    wait(futures)           # drain, even when a step failed
+                    self.timings["analysis_wait_s"] = time.perf_counter() - t0
+                results += [f.result() for f in futures]
+        finally:
+            self.scope.ddsSetOnOff(self.idx, 0)     # never leave the DUT driven
+        self.timings["wall_s"] = time.perf_counter() - t_start
+        return np.array(results, dtype=BODE_DTYPE)
+
+
+# ── SIMULATED DUT ──────────────────────────────────────────────────────────────
+class RCLowPass:
+    """
+    simdll waveform: the simulated DDS sine through a first-order low-pass
+    with corner `fc`, i.e. gain 1/sqrt(1 + (f/fc)²) and phase -atan(f/fc).
+    """
+
+    def __init__(self, sim, fc: float, idx: int = 0):
+        self.sim = sim
+        self.fc  = fc
+        self.idx = idx
+
+    def response(self, freq) -> np.ndarray:
+        return 1 / (1 + 1j * np.asarray(freq) / self.fc)
+
+    def __call__(self, t: np.ndarray, ch: int) -> np.ndarray:
+        g = self.sim._dev(self.idx).dds
+        if not g["on"]:
+            return np.zeros_like(t)
+        h = self.response(g["freq"])
+        return g["amp"] / 1000 * abs(h) * np.sin(2 * np.pi * g["freq"] * t + np.angle(h))
+
+
+def save_csv(path: str, result: np.ndarray) -> None:
+    np.savetxt(path, result, delimiter=",", header=",".join(BODE_DTYPE.names),
+               comments="", fmt=["%.6g", "%d", "%.6g", "%.3f", "%.6g", "%.6g", "%.3f", "%.3f"])
+
+
+def plot(result: np.ndarray, path: str = None, reference=None) -> None:
+    """Gain/phase against frequency; `reference` is an optional exact H(f) callable."""
+    import matplotlib
+    if path:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    f = result["freq"]
+    fig, (ax_g, ax_p) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+    ax_g.semilogx(f, result["gain_db"], "o-", label="measured")
+    ax_p.semilogx(f, result["phase_deg"], "o-", label="measured")
+    if reference is not None:
+        ff = np.geomspace(f[0], f[-1], 400)
+        h = reference(ff)
+        ax_g.semilogx(ff, 20 * np.log10(np.abs(h)), "k--", lw=1, label="exact")
+        ax_p.semilogx(ff, np.degrees(np.angle(h)), "k--", lw=1, label="exact")
+    ax_g.set_ylabel("Gain (dB)")
+    ax_p.set_ylabel("Phase (°)")
+    ax_p.set_xlabel("Frequency (Hz)")
+    for ax in (ax_g, ax_p):
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend(fontsize="small")
+    fig.tight_layout()
+    if path:
+        fig.savefig(path, dpi=100)
+        plt.close(fig)
+    else:
+        plt.show()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--start", type=float, default=100.0)
+    ap.add_argument("--stop", type=float, default=1e6)
+    ap.add_argument("--points", type=int, default=25)
+    ap.add_argument("--samples", type=int, default=4096)
+    ap.add_argument("--cycles", type=float, default=8)
+    ap.add_argument("--averages", type=int, default=1)
+    ap.add_argument("--settle", type=float, default=0.0, help="seconds after each step")
+    ap.add_argument("--fc", type=float, default=10e3, help="simulated DUT corner (Hz)")
+    ap.add_argument("--csv")
+    ap.add_argument("--plot", nargs="?", const="")
+    ap.add_argument("--serial", action="store_true", help="analyse inline, not overlapped")
+    args = ap.parse_args(argv)
+
+    from driver import load_driver
+    from simdll import SimDll
+
+    scope, dut = load_driver(), None
+    if isinstance(scope, SimDll):
+        scope.waveforms = ["dds", "flat", "flat", "flat"]
+        dut = scope.waveforms[RESP_CH] = RCLowPass(scope, args.fc)
+
+    sweep = BodeSweep(scope, log_frequencies(args.start, args.stop, args.points),
+                      args.samples, args.cycles, args.averages, args.settle,
+                      pipelined=not args.serial)
+    result = sweep.run()
+
+    print(f"{'freq':>12} {'tb':>3} {'MS/s':>9} {'cycles':>7} {'gain dB':>8} {'phase°':>8}"
+          + ("  error dB / °" if dut else ""))
+    for r in result:
+        line = (f"{r['freq']:12.1f} {r['time_div']:3d} {r['sample_rate'] / 1e6:9.3f} "
+                f"{r['cycles']:7.1f} {r['gain_db']:8.2f} {r['phase_deg']:8.2f}")
+        if dut:
+            h = dut.response(r["freq"])
+            line += (f"  {r['gain_db'] - 20 * np.log10(abs(h)):+6.2f} / "
+                     f"{r['phase_deg'] - np.degrees(np.angle(h)):+6.2f}")
+        print(line)
+    t = sweep.timings
+    mode = (f"overlapped, {t['analysis_wait_s'] * 1e3:.1f} ms left at the end"
+            if sweep.pipelined else "inline")
+    print(f"{len(result)} points in {t['wall_s']:.2f} s: setup {t['setup_s']:.2f} s, "
+          f"capture {t['capture_s']:.2f} s, analysis {t['analysis_s'] * 1e3:.1f} ms ({mode})")
+
+    if args.csv:
+        save_csv(args.csv, result)
+    if args.plot is not None:
+        plot(result, args.plot or None, dut.response if dut else None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
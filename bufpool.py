@@ -0,0 +1,148 @@
+"""
+Preallocated capture buffers reused across runs.
+
+A BufferPool owns N BufferSets, each one contiguous WORD block (see
+convert.alloc_raw) that dsoHTGetData writes into and NumPy views in place.
+Sets are handed out with acquire() and go back to the pool when their last
+reference is released, so a set can be shared by several consumers (e.g. a
+saver and a live display) without copying.  The pool also caches time axes
+per (timebase, length) and counts every allocation it makes, so a steady
+capture loop can be checked for zero allocations after warm-up.
+"""
+
+import threading
+import numpy as np
+
+from convert import alloc_raw, channel_view
+
+
+class BufferSet:
+    """One (4, n) capture buffer: `raw` for the DLL, `codes` for NumPy."""
+
+    def __init__(self, pool: "BufferPool", n: int):
+        self.block, self.raw = alloc_raw(n)
+        self.codes  = channel_view(self.block)
+        self.refs   = 0
+        self._pool  = pool
+        self._volts = None
+
+    def volts_out(self) -> np.ndarray:
+        """Float scratch array (4, n) for convert.to_volts(out=...), made once."""
+        if self._volts is None:
+            self._volts = np.empty(self.codes.shape, dtype=float)
+            self._pool._count("volts_allocated")
+        return self._volts
+
+    def retain(self) -> "BufferSet":
+        self._pool._retain(self)
+        return self
+
+    def release(self) -> None:
+        self._pool._release(self)
+
+    def __enter__(self) -> "BufferSet":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class BufferPool:
+    def __init__(self, n_samples: int, n_sets: int = 4, grow: bool = False):
+        """
+        `grow=True` allocates a new set when the pool is empty instead of
+        blocking in acquire(); the allocation is counted either way.
+        """
+        self.n_samples = n_samples
+        self.grow      = grow
+        self._cond     = threading.Condition()
+        self._free     = []
+        self._axes     = {}
+        self._counters = {
+            "sets_allocated":    0,
+            "volts_allocated":   0,
+            "time_axes_built":   0,
+            "time_axis_hits":    0,
+            "acquires":          0,
+            "releases":          0,
+            "acquire_waits":     0,
+        }
+        for _ in range(n_sets):
+            self._free.append(self._new_set())
+
+    def _new_set(self) -> BufferSet:
+        self._counters["sets_allocated"] += 1
+        return BufferSet(self, self.n_samples)
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self._counters[name] += 1
+
+    # ── lending ───────────────────────────────────────────────────────────────
+    def acquire(self, timeout: float = None) -> BufferSet:
+        """Take a free set (refs = 1), blocking while all sets are in use."""
+        with self._cond:
+            if not self._free:
+                if self.grow:
+                    self._free.append(self._new_set())
+                else:
+                    self._counters["acquire_waits"] += 1
+                    if not self._cond.wait_for(lambda: self._free, timeout):
+                        raise TimeoutError("no free capture buffer")
+            buf = self._free.pop()
+            buf.refs = 1
+            self._counters["acquires"] += 1
+            return buf
+
+    def _retain(self, buf: BufferSet) -> None:
+        with self._cond:
+            if buf.refs <= 0:
+                raise RuntimeError("retain() on a buffer that is not checked out")
+            buf.refs += 1
+
+    def _release(self, buf: BufferSet) -> None:
+        with self._cond:
+            if buf.refs <= 0:
+                raise RuntimeError("buffer released more times than acquired")
+            buf.refs -= 1
+            if buf.refs == 0:
+                self._free.append(buf)
+                self._counters["releases"] += 1
+                self._cond.notify()
+
+    @property
+    def in_use(self) -> int:
+        with self._cond:
+            return self._counters["acquires"] - self._counters["releases"]
+
+    # ── time axes ─────────────────────────────────────────────────────────────
+    def time_axis(self, time_div: int, sample_rate: float, n: int = None) -> np.ndarray:
+        """Read-only np.arange(n) / sample_rate, built once per (time_div, n)."""
+        n = self.n_samples if n is None else n
+        key = (time_div, n)
+        with self._cond:
+            axis = self._axes.get(key)
+            if axis is not None:
+                self._counters["time_axis_hits"] += 1
+                return axis
+        axis = np.arange(n) / sample_rate
+        axis.flags.writeable = False
+        with self._cond:
+            self._counters["time_axes_built"] += 1
+            return self._axes.setdefault(key, axis)
+
+    def counters(self) -> dict:
+        with self._cond:
+            snap = dict(self._counters)
+        snap["in_use"] = snap["acquires"] - snap["releases"]
+        return snap
+
+
+if __name__ == "__main__":
+    pool = BufferPool(4096, n_sets=2)
+    for run in range(1000):
+        with pool.acquire() as buf:
+            buf.codes[:] = run & 0xFF
+            pool.time_axis(14, 2.5e6)
+            buf.volts_out()
+    print(pool.counters())
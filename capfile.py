@@ -0,0 +1,162 @@
+"""
+Compact binary container for one scope capture (.htcap).
+
+Layout (little endian):
+    HEADER_SIZE bytes of header  – see _HEADER below, zero padded
+    codes                        – (channels, samples) uint8 or uint16, C order
+
+Only the raw ADC codes are stored.  Volts are rebuilt from the per-channel
+scale/offset pair, volts = (code - offset) * scale, and the time axis from the
+stored sample rate, so nothing is formatted or parsed as text.
+
+Usage:
+    python capfile.py convert "pico_I2C(100kHz)" "pico_I2C(400kHz)"
+"""
+
+import os
+import struct
+import sys
+import numpy as np
+
+MAGIC        = b"HTCAP\x00\x00\x00"
+VERSION      = 1
+HEADER_SIZE  = 128
+EXTENSION    = ".htcap"
+TIME_DIV_UNKNOWN = 0xFFFF
+
+# magic, version, channels, samples, dtype code, time_div, sample_rate,
+# trigger source, slope, horizontal pos, vertical pos, scale[4], offset[4]
+_HEADER = struct.Struct("<8sHHIBxHd4H4d4d")
+_DTYPES = {1: np.uint8, 2: np.uint16}
+_CODES  = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+DEFAULT_TRIGGER = {"source": 0, "slope": 0, "h_pos": 50, "v_pos": 200}
+
+
+class Capture:
+    """A capture opened with read_capture(); `codes` is a read-only memmap."""
+
+    def __init__(self, codes, scale, offset, time_div, sample_rate, trigger):
+        self.codes       = codes
+        self.scale       = scale
+        self.offset      = offset
+        self.time_div    = time_div
+        self.sample_rate = sample_rate
+        self.trigger     = trigger
+
+    @property
+    def time(self) -> np.ndarray:
+        return np.arange(self.codes.shape[1]) / self.sample_rate
+
+    def volts(self, ch: int) -> np.ndarray:
+        return (self.codes[ch] - self.offset[ch]) * self.scale[ch]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Same column names as the text files: 'Time(s)', 'CH1'..'CH4'."""
+        if column == "Time(s)":
+            return self.time
+        return self.volts(int(column[2:]) - 1)
+
+    def __len__(self) -> int:
+        return self.codes.shape[1]
+
+
+# ── WRITE / READ ───────────────────────────────────────────────────────────────
+def write_capture(path: str, codes: np.ndarray, scale, offset,
+                  time_div: int, sample_rate: float,
+                  trigger: dict = None) -> None:
+    """Write a (channels, samples) uint8/uint16 code array plus its header."""
+    codes = np.ascontiguousarray(codes)
+    if codes.dtype not in _CODES:
+        raise ValueError(f"codes must be uint8 or uint16, got {codes.dtype}")
+    trig = dict(DEFAULT_TRIGGER, **(trigger or {}))
+    nch, n = codes.shape
+    scale  = np.broadcast_to(np.asarray(scale, dtype=float), (4,))
+    offset = np.broadcast_to(np.asarray(offset, dtype=float), (4,))
+
+    header = _HEADER.pack(
+        MAGIC, VERSION, nch, n, _CODES[codes.dtype], time_div, sample_rate,
+        trig["source"], trig["slope"], trig["h_pos"], trig["v_pos"],
+        *scale, *offset,
+    )
+    with open(path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        f.write(codes.tobytes())
+
+
+def read_header(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+    fields = _HEADER.unpack(raw)
+    if fields[0] != MAGIC:
+        raise ValueError(f"{path}: not an {EXTENSION} file")
+    if fields[1] != VERSION:
+        raise ValueError(f"{path}: unsupported version {fields[1]}")
+    return {
+        "channels":    fields[2],
+        "samples":     fields[3],
+        "dtype":       _DTYPES[fields[4]],
+        "time_div":    fields[5],
+        "sample_rate": fields[6],
+        "trigger":     dict(zip(("source", "slope", "h_pos", "v_pos"),
+                                fields[7:11])),
+        "scale":       np.array(fields[11:15]),
+        "offset":      np.array(fields[15:19]),
+    }
+
+
+def read_capture(path: str) -> Capture:
+    """Open a capture; the codes are memory-mapped, not read."""
+    h = read_header(path)
+    codes = np.memmap(path, dtype=h["dtype"], mode="r", offset=HEADER_SIZE,
+                      shape=(h["channels"], h["samples"]))
+    return Capture(codes, h["scale"], h["offset"], h["time_div"],
+                   h["sample_rate"], h["trigger"])
+
+
+# ── TEXT ARCHIVE CONVERSION ────────────────────────────────────────────────────
+def text_codes(path: str, vpdiv: float = 1.0, zero_pos=(128, 128, 128, 128),
+               probe: float = 1) -> tuple:
+    """
+    (codes, scale, offset, sample_rate) of one tab-separated run file
+    written by getData.save_data.  The codes are recovered exactly from the
+    volts and the scale that wrote them (VOLT_MULT entry × probe); a
+    mismatch raises ValueError.
+    """
+    from convert import channel_scale
+
+    table = np.loadtxt(path, delimiter="\t", skiprows=1)
+    t, volts = table[:, 0], table[:, 1:].T
+    scale, offset = channel_scale(vpdiv, zero_pos, probe)
+
+    codes = np.rint(volts / scale[:, None] + offset[:, None])
+    if np.abs((codes - offset[:, None]) * scale[:, None] - volts).max() > 1e-6:
+        raise ValueError(f"{path}: values are not multiples of scale {scale[0]}")
+    dtype = np.uint8 if codes.max() < 256 else np.uint16
+    return codes.astype(dtype), scale, offset, 1.0 / (t[1] - t[0])
+
+
+def convert_text(path: str, vpdiv: float = 1.0, zero_pos=(128, 128, 128, 128),
+                 probe: float = 1, time_div: int = TIME_DIV_UNKNOWN) -> str:
+    """Convert one text run file (see text_codes) to .htcap next to it."""
+    codes, scale, offset, fs = text_codes(path, vpdiv, zero_pos, probe)
+    out = os.path.splitext(path)[0] + EXTENSION
+    write_capture(out, codes, scale, offset, time_div, fs)
+    return out
+
+
+def convert_folder(folder: str, **kwargs) -> list:
+    done = []
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".txt"):
+            done.append(convert_text(os.path.join(folder, name), **kwargs))
+    return done
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        sys.exit(__doc__)
+    for folder in sys.argv[2:]:
+        for out in convert_folder(folder):
+            size_in = os.path.getsize(out[:-len(EXTENSION)] + ".txt")
+            print(f"{out}: {size_in} → {os.path.getsize(out)} bytes")
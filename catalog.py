@@ -0,0 +1,284 @@
+"""
+SQLite index of captures across run folders.
+
+Every capture file gets one row in `captures` (path, folder, run and device
+number parsed from the name, file timestamp, timebase, sample rate, trigger
+settings, per-channel scale/offset, data offset, dtype/shape and SHA-1) and
+one row per channel in `channel_stats` (min/max volts, edge count from
+edges.find_edges).  Queries run against the index only; the matching
+captures come back as capfile.Capture objects whose codes are memory-mapped
+at the recorded offset, so no file is scanned or parsed.
+
+Text run files are only converted to .htcap (capfile.convert_text, so they
+can be memory-mapped too) when asked: add_folder(convert=True) / index
+--convert, with the volts/div they were captured at (`vpdiv`, default
+1 V/div; a mismatch raises ValueError).  Otherwise they are left alone and
+folder_runs() returns them as text paths.  Run numbers are parsed as integers, so
+run100 sorts after run99, and the bus rate is taken from a "(400kHz)"-style
+folder name when there is one.  Re-indexing a folder skips files whose
+mtime and size are unchanged.
+
+Usage:
+    python catalog.py index "pico_I2C(100kHz)" "pico_I2C(400kHz)" [--convert [--vpdiv 1]]
+    python catalog.py query --bus 400e3 --channel 1 --min-edges 20
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import numpy as np
+
+from capfile import EXTENSION, HEADER_SIZE, Capture, convert_folder, read_header
+from loader import sha1_file
+
+DB_FILE = "runs.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    folder      TEXT NOT NULL,
+    run         INTEGER,
+    device      INTEGER,
+    timestamp   REAL,
+    bus_hz      REAL,
+    time_div    INTEGER,
+    sample_rate REAL,
+    channels    INTEGER,
+    samples     INTEGER,
+    dtype       TEXT,
+    data_offset INTEGER,
+    size        INTEGER,
+    mtime_ns    INTEGER,
+    sha1        TEXT,
+    trig_source INTEGER,
+    trig_slope  INTEGER,
+    h_pos       INTEGER,
+    v_pos       INTEGER,
+    scale       TEXT,
+    offset      TEXT
+);
+CREATE TABLE IF NOT EXISTS channel_stats (
+    capture_id  INTEGER NOT NULL REFERENCES captures(id) ON DELETE CASCADE,
+    channel     INTEGER NOT NULL,
+    v_min       REAL,
+    v_max       REAL,
+    edges       INTEGER,
+    PRIMARY KEY (capture_id, channel)
+);
+CREATE INDEX IF NOT EXISTS captures_folder ON captures(folder, run);
+CREATE INDEX IF NOT EXISTS captures_bus    ON captures(bus_hz, time_div);
+CREATE INDEX IF NOT EXISTS stats_edges     ON channel_stats(channel, edges);
+"""
+
+_RUN    = re.compile(r"run(\d+)")
+_DEVICE = re.compile(r"dev(\d+)_")
+_BUS    = re.compile(r"(\d+(?:\.\d+)?)\s*([kM]?)Hz")
+_UNITS  = {"": 1.0, "k": 1e3, "M": 1e6}
+
+
+def bus_rate(folder: str):
+    """Bus rate in Hz from a folder name like "pico_I2C(400kHz)", else None."""
+    m = _BUS.search(os.path.basename(os.path.normpath(folder)))
+    return float(m.group(1)) * _UNITS[m.group(2)] if m else None
+
+
+def _number(pattern, name: str):
+    m = pattern.search(name)
+    return int(m.group(1)) if m else None
+
+
+class Catalog:
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self.db   = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── indexing ──────────────────────────────────────────────────────────────
+    def add(self, path: str, hysteresis: float = 0.1) -> bool:
+        """Index one .htcap file; returns False if it was already up to date."""
+        from edges import find_edges
+
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.db.execute("SELECT mtime_ns, size FROM captures WHERE path = ?",
+                              (path,)).fetchone()
+        if row and row["mtime_ns"] == st.st_mtime_ns and row["size"] == st.st_size:
+            return False
+
+        h = read_header(path)
+        codes = np.memmap(path, dtype=h["dtype"], mode="r", offset=HEADER_SIZE,
+                          shape=(h["channels"], h["samples"]))
+        volts = (codes - h["offset"][:h["channels"], None]) * h["scale"][:h["channels"], None]
+        edges = np.bincount(find_edges(volts, h["sample_rate"], hysteresis)["run"],
+                            minlength=h["channels"])
+        name, folder = os.path.basename(path), os.path.dirname(path)
+        trig = h["trigger"]
+
+        with self.db:
+            self.db.execute("DELETE FROM captures WHERE path = ?", (path,))
+            cur = self.db.execute(
+                "INSERT INTO captures (path, folder, run, device, timestamp, bus_hz,"
+                " time_div, sample_rate, channels, samples, dtype, data_offset, size,"
+                " mtime_ns, sha1, trig_source, trig_slope, h_pos, v_pos, scale, offset)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, folder, _number(_RUN, name), _number(_DEVICE, name),
+                 st.st_mtime, bus_rate(folder), h["time_div"], h["sample_rate"],
+                 h["channels"], h["samples"], np.dtype(h["dtype"]).name, HEADER_SIZE,
+                 st.st_size, st.st_mtime_ns, sha1_file(path), trig["source"],
+                 trig["slope"], trig["h_pos"], trig["v_pos"],
+                 json.dumps(h["scale"].tolist()), json.dumps(h["offset"].tolist())))
+            self.db.executemany(
+                "INSERT INTO channel_stats VALUES (?, ?, ?, ?, ?)",
+                [(cur.lastrowid, ch + 1, float(volts[ch].min()), float(volts[ch].max()),
+                  int(edges[ch])) for ch in range(h["channels"])])
+        return True
+
+    def add_folder(self, folder: str, convert: bool = False, **convert_kwargs) -> dict:
+        """
+        Index every .htcap capture in `folder`.  With `convert`, text runs
+        are first written as .htcap next to them; `convert_kwargs` (vpdiv,
+        zero_pos, probe) must match the settings they were captured with.
+        """
+        if convert and text_runs(folder):
+            convert_folder(folder, **convert_kwargs)
+        added = skipped = 0
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(EXTENSION):
+                if self.add(os.path.join(folder, name)):
+                    added += 1
+                else:
+                    skipped += 1
+        return {"added": added, "skipped": skipped}
+
+    def prune(self) -> int:
+        """Drop rows whose file no longer exists."""
+        gone = [(r["id"],) for r in self.db.execute("SELECT id, path FROM captures")
+                if not os.path.exists(r["path"])]
+        with self.db:
+            self.db.executemany("DELETE FROM captures WHERE id = ?", gone)
+        return len(gone)
+
+    # ── queries ───────────────────────────────────────────────────────────────
+    def rows(self, folder: str = None, bus_hz: float = None, time_div: int = None,
+             channel: int = None, min_edges: int = None, max_edges: int = None,
+             device: int = None) -> list:
+        """
+        Matching capture rows ordered by folder and run.  `channel` (1-4)
+        selects which channel the edge limits apply to (default: any).
+        `folder` may contain SQL LIKE wildcards.
+        """
+        sql  = ["SELECT DISTINCT c.* FROM captures c"
+                " JOIN channel_stats s ON s.capture_id = c.id WHERE 1"]
+        args = []
+        for clause, value in (("c.folder LIKE ?", folder), ("c.bus_hz = ?", bus_hz),
+                              ("c.time_div = ?", time_div), ("s.channel = ?", channel),
+                              ("s.edges >= ?", min_edges), ("s.edges <= ?", max_edges),
+                              ("c.device = ?", device)):
+            if value is not None:
+                sql.append(f"AND {clause}")
+                args.append(value)
+        sql.append("ORDER BY c.folder, c.run, c.device")
+        return [dict(r) for r in self.db.execute(" ".join(sql), args)]
+
+    def query(self, **filters) -> list:
+        """rows(**filters) opened as [(row, capfile.Capture)] with memory-mapped codes."""
+        return [(row, open_row(row)) for row in self.rows(**filters)]
+
+    def stats(self, capture_id: int) -> list:
+        return [dict(r) for r in self.db.execute(
+            "SELECT * FROM channel_stats WHERE capture_id = ? ORDER BY channel",
+            (capture_id,))]
+
+
+def open_row(row: dict) -> Capture:
+    """Memory-map a capture from its catalog row, without reading the header."""
+    codes = np.memmap(row["path"], dtype=row["dtype"], mode="r",
+                      offset=row["data_offset"],
+                      shape=(row["channels"], row["samples"]))
+    trigger = {"source": row["trig_source"], "slope": row["trig_slope"],
+               "h_pos": row["h_pos"], "v_pos": row["v_pos"]}
+    return Capture(codes, np.array(json.loads(row["scale"])),
+                   np.array(json.loads(row["offset"])), row["time_div"],
+                   row["sample_rate"], trigger)
+
+
+def stack(captures, channel: int) -> np.ndarray:
+    """(runs, samples) volts of 1-based `channel` for query() results of equal length."""
+    return np.stack([cap.volts(channel - 1) for _, cap in captures])
+
+
+def text_runs(folder: str) -> list:
+    """Text run files of `folder` that have no .htcap next to them."""
+    names = os.listdir(folder)
+    stems = {os.path.splitext(n)[0] for n in names if n.endswith(EXTENSION)}
+    return [os.path.join(folder, n) for n in names
+            if n.endswith(".txt") and _RUN.search(n) and os.path.splitext(n)[0] not in stems]
+
+
+def folder_runs(folder: str, db: str = None, convert: bool = False,
+                **convert_kwargs) -> list:
+    """
+    Paths of every run in `folder` in run order, indexing it first: the
+    .htcap captures, plus text runs without one (converted first only with
+    `convert`, see Catalog.add_folder).
+    """
+    with Catalog(db or os.path.join(folder, DB_FILE)) as cat:
+        cat.add_folder(folder, convert, **convert_kwargs)
+        paths = [r["path"] for r in cat.rows(folder=os.path.abspath(folder))]
+    paths += [os.path.abspath(p) for p in text_runs(folder)]
+    return sorted(paths, key=lambda p: (_number(_RUN, os.path.basename(p)) or 0, p))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--db", default=DB_FILE)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ix = sub.add_parser("index")
+    ix.add_argument("folders", nargs="+")
+    ix.add_argument("--convert", action="store_true",
+                    help="write .htcap copies of text runs and index them")
+    ix.add_argument("--vpdiv", type=float, default=1.0,
+                    help="volts/div the text runs were captured at")
+    q = sub.add_parser("query")
+    q.add_argument("--folder")
+    q.add_argument("--bus", type=float)
+    q.add_argument("--time-div", type=int)
+    q.add_argument("--channel", type=int)
+    q.add_argument("--min-edges", type=int)
+    q.add_argument("--max-edges", type=int)
+    args = ap.parse_args(argv)
+
+    with Catalog(args.db) as cat:
+        if args.cmd == "index":
+            for folder in args.folders:
+                print(f"{folder}: {cat.add_folder(folder, args.convert, vpdiv=args.vpdiv)}")
+            print(f"pruned {cat.prune()} missing files")
+            return 0
+        hits = cat.query(folder=args.folder, bus_hz=args.bus, time_div=args.time_div,
+                         channel=args.channel, min_edges=args.min_edges,
+                         max_edges=args.max_edges)
+        for row, cap in hits:
+            edges = [s["edges"] for s in cat.stats(row["id"])]
+            print(f"{os.path.basename(row['folder'])}/run{row['run']:03d}  "
+                  f"{row['samples']} samples @ {row['sample_rate']:g} S/s  edges {edges}")
+        print(f"{len(hits)} captures")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Vectorised raw-ADC → volts conversion for the four channel buffers filled by
+dsoHTGetData.
+
+The buffers are allocated as one contiguous block of WORDs so NumPy can view
+all four channels as a single (4, n) array without copying, and scaling is a
+single broadcast over that view.
+"""
+
+import time
+from ctypes import sizeof, wintypes
+import numpy as np
+
+VOLT_DIVISIONS  = 8
+VOLT_RESOLUTION = 256     # 8 bit ADC
+NUM_CHANNELS    = 4
+
+
+# ── BUFFERS ────────────────────────────────────────────────────────────────────
+def alloc_raw(n: int) -> tuple:
+    """
+    Allocate one contiguous WORD block for all four channels.
+    Returns (block, [ch1, ch2, ch3, ch4]); each chN is a (WORD * n) array that
+    aliases its slice of `block`, so it can be passed straight to dsoHTGetData.
+    """
+    block = (wintypes.WORD * (NUM_CHANNELS * n))()
+    size  = n * sizeof(wintypes.WORD)
+    chans = [(wintypes.WORD * n).from_buffer(block, ch * size)
+             for ch in range(NUM_CHANNELS)]
+    return block, chans
+
+
+def channel_view(raw) -> np.ndarray:
+    """
+    Return the raw codes as a (4, n) uint16 array.
+    A block from alloc_raw() is viewed in place; a list of four separate
+    ctypes buffers (the old per-channel layout) costs one copy to stack.
+    """
+    if isinstance(raw, np.ndarray):
+        return raw
+    if isinstance(raw, (list, tuple)):
+        return np.stack([np.frombuffer(buf, dtype=np.uint16) for buf in raw])
+    return np.frombuffer(raw, dtype=np.uint16).reshape(NUM_CHANNELS, -1)
+
+
+# ── SCALING ────────────────────────────────────────────────────────────────────
+def channel_scale(vpdiv, zero_pos, probe: float = 1) -> tuple:
+    """
+    Per-channel (scale, offset) such that volts = (code - offset) * scale.
+    `vpdiv` is volts/div (a VOLT_MULT entry) for all channels or one per channel.
+    """
+    vpdiv  = np.broadcast_to(np.asarray(vpdiv, dtype=float), (NUM_CHANNELS,))
+    scale  = vpdiv * probe * VOLT_DIVISIONS / VOLT_RESOLUTION
+    offset = 255.0 - np.asarray(zero_pos, dtype=float)
+    return scale, offset
+
+
+def to_volts(codes: np.ndarray, scale: np.ndarray, offset: np.ndarray,
+             out: np.ndarray = None) -> np.ndarray:
+    """
+    Scale a (4, n) code array into volts in one broadcast.
+    Pass `out` (float64, same shape) to reuse an existing array.
+    """
+    if out is None:
+        out = np.empty(codes.shape, dtype=float)
+    np.subtract(codes, offset[:, None], out=out)
+    np.multiply(out, scale[:, None], out=out)
+    return out
+
+
+def to_codes(raw, vpdiv, zero_pos, probe: float = 1) -> tuple:
+    """
+    Integer-only mode: return (codes, scale, offset) with `codes` left as the
+    raw uint8 ADC values and one scale/offset pair per channel.
+    """
+    codes = channel_view(raw).astype(np.uint8)
+    scale, offset = channel_scale(vpdiv, zero_pos, probe)
+    return codes, scale, offset
+
+
+# ── BENCHMARK ──────────────────────────────────────────────────────────────────
+def _loop_scale(raw, n: int, vpdiv: float, zero_pos) -> np.ndarray:
+    """The per-sample loop previously used by getData.read_and_save."""
+    scaled = np.zeros((n, 4), dtype=float)
+    for i in range(n):
+        for ch in range(4):
+            raw_val       = raw[ch][i] - (255 - zero_pos[ch])
+            scaled[i, ch] = raw_val * vpdiv * 8 / 256
+    return scaled
+
+
+def benchmark(lengths=(4096, 65536, 1 << 20), vpdiv: float = 1.0) -> None:
+    zero_pos = [128, 128, 128, 128]
+    rng      = np.random.default_rng(0)
+    print(f"{'samples':>10} {'loop (s)':>10} {'numpy (s)':>10} {'speed-up':>9}")
+    for n in lengths:
+        block, chans = alloc_raw(n)
+        codes = channel_view(block)
+        codes[:] = rng.integers(0, 256, codes.shape, dtype=np.uint16)
+
+        t0   = time.perf_counter()
+        ref  = _loop_scale(chans, n, vpdiv, zero_pos)
+        t1   = time.perf_counter()
+        scale, offset = channel_scale(vpdiv, zero_pos)
+        fast = to_volts(channel_view(block), scale, offset).T
+        t2   = time.perf_counter()
+
+        assert np.allclose(ref, fast)
+        loop_s, np_s = t1 - t0, t2 - t1
+        print(f"{n:>10} {loop_s:>10.4f} {np_s:>10.5f} {loop_s / np_s:>8.0f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
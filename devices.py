@@ -0,0 +1,156 @@
+"""
+Drive every scope dsoHTSearchDevice reports from one process.
+
+DeviceManager initialises and configures all present devices concurrently,
+then runs one CapturePipeline per device.  The pipelines share a barrier so
+run N is armed on every device at the same time, and every saved record goes
+into one tab-separated run index (run_index.tsv) tagged with its device id.
+
+Usage (three simulated scopes):
+    python devices.py
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import wintypes
+
+import getData
+from capfile import EXTENSION
+from convert import to_codes
+from pipeline import CapturePipeline, print_report
+
+
+def find_devices(scope) -> list:
+    """Indices of every present device in the 32-slot search array."""
+    devices = (wintypes.WORD * 32)()
+    if scope.dsoHTSearchDevice(devices) == 0:
+        return []
+    return [i for i, present in enumerate(devices) if present]
+
+
+class RunIndex:
+    """Append-only, thread-safe index of records from all devices."""
+
+    COLUMNS = ("record", "device", "run", "timestamp", "file")
+
+    def __init__(self, path: str):
+        self.path  = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._f    = open(path, "w", buffering=1)
+        self._f.write("\t".join(self.COLUMNS) + "\n")
+
+    def add(self, device: int, run: int, fn: str) -> int:
+        with self._lock:
+            self.count += 1
+            self._f.write(f"{self.count}\t{device}\t{run}\t{time.time():.6f}\t"
+                          f"{os.path.basename(fn)}\n")
+            return self.count
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class DeviceManager:
+    def __init__(self, scope, folder: str, indices: list = None):
+        """`indices` restricts the manager to those devices; default: all found."""
+        self.scope    = scope
+        self.folder   = folder
+        self.indices  = indices
+        self.controls = {}
+
+    # ── setup ─────────────────────────────────────────────────────────────────
+    def _setup_one(self, idx: int) -> None:
+        rc, dc = getData.build_controls()
+        getData.initialize_device(idx, self.scope)
+        getData.configure_scope(idx, rc, dc, self.scope)
+        self.controls[idx] = (rc, dc)
+
+    def setup(self) -> list:
+        if self.indices is None:
+            self.indices = find_devices(self.scope)
+        if not self.indices:
+            raise RuntimeError("No Hantek device found")
+        with ThreadPoolExecutor(max_workers=len(self.indices)) as ex:
+            list(ex.map(self._setup_one, self.indices))
+        return self.indices
+
+    # ── capture ───────────────────────────────────────────────────────────────
+    def _sink(self, idx: int, index: RunIndex):
+        def sink(run: int, codes, dc) -> None:
+            codes, scale, offset = to_codes(codes,
+                                            getData.VOLT_MULT[getData.VOLTS_PER_DIVISION],
+                                            getData.CH_ZERO_POS,
+                                            getData.PROBE_MULTIPLIER)
+            fn = os.path.join(self.folder, f"dev{idx:02d}_run{run:05d}{EXTENSION}")
+            getData.save_capture(fn, dc, codes, scale, offset)
+            index.add(idx, run, fn)
+        return sink
+
+    def capture(self, runs: int, **pipeline_kwargs) -> dict:
+        """Capture `runs` synchronized records on every device; returns aggregate stats."""
+        if not self.controls:
+            self.setup()
+        os.makedirs(self.folder, exist_ok=True)
+        index   = RunIndex(os.path.join(self.folder, "run_index.tsv"))
+        barrier = threading.Barrier(len(self.indices))
+        pipes   = {idx: CapturePipeline(self.scope, idx, self.controls[idx][1],
+                                        self._sink(idx, index),
+                                        barrier=barrier, sink_dc=True,
+                                        **pipeline_kwargs)
+                   for idx in self.indices}
+        reports, errors = {}, {}
+
+        def work(idx: int) -> None:
+            try:
+                reports[idx] = pipes[idx].run(runs)
+            except BaseException as exc:
+                errors[idx] = exc
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=work, args=(idx,)) for idx in self.indices]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        index.close()
+
+        if errors:
+            idx, exc = next(iter(errors.items()))
+            raise RuntimeError(f"capture failed on device {idx}") from exc
+
+        nbytes = sum(p.stats["transfer"].nbytes for p in pipes.values())
+        total  = sum(r["runs"] for r in reports.values())
+        return {
+            "devices":    len(self.indices),
+            "records":    total,
+            "wall_s":     wall,
+            "captures_s": total / wall if wall else 0.0,
+            "MB_s":       nbytes / wall / 1e6 if wall else 0.0,
+            "per_device": reports,
+        }
+
+
+def print_aggregate(report: dict) -> None:
+    print(f"{report['devices']} devices, {report['records']} records in "
+          f"{report['wall_s']:.3f} s → {report['captures_s']:.1f} captures/s, "
+          f"{report['MB_s']:.1f} MB/s")
+    for idx, r in report["per_device"].items():
+        print(f"device {idx}:")
+        print_report(r)
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import tempfile
+    from driver import load_driver
+
+    mgr = DeviceManager(load_driver("sim", n_devices=3), tempfile.mkdtemp())
+    print("devices:", mgr.setup())
+    with contextlib.redirect_stdout(io.StringIO()):      # mute per-file "Saved:"
+        report = mgr.capture(50)
+    print_aggregate(report)
@@ -0,0 +1,126 @@
+"""
+Driver layer: the HTHardDll ctypes binding behind one loader, plus the
+structs and lookup tables every capture module shares.
+
+load_driver() returns an object exposing the DLL entry points
+(dsoHTSearchDevice, dsoInitHard, …, ddsSetOnOff):
+
+    "dll" – the real HTHardDll.dll via ctypes, with every argtypes/restype
+            declared once from SIGNATURES
+    "sim" – simdll.SimDll, a pure-Python/NumPy simulator
+
+The choice comes from the `kind` argument, else the HANTEK_DRIVER
+environment variable, else "dll" on Windows and "sim" everywhere else.
+HANTEK_DLL_PATH overrides DLL_PATH.  With instrument=True the driver is
+wrapped in instrument.Instrumented (call counts, timing, return codes).
+
+Buffers are passed to dsoHTGetData as the WORD arrays themselves (not
+byref) because the declared POINTER(WORD) argtypes reject byref(array);
+structs are passed with byref().
+"""
+
+import os
+from ctypes import POINTER, Structure, wintypes
+
+DLL_PATH = r"C:\Users\zhoul\Desktop\Hantek scope\Hantek Python API\Dll\x64\HTHardDll.dll"
+ENV_VAR  = "HANTEK_DRIVER"
+
+# ── LOOKUP TABLES ──────────────────────────────────────────────────────────────
+#0=2nS, 1=5nS, 2=10nS, 3=20nS, 4=50nS, 5=100nS, 6=200nS, 7=500nS, 8=1uS, 9=2uS, 10=5uS, 11=10uS, 12=20uS, 13=50uS, 14=100uS, 15=200uS, 16=500uS
+#17=1mS, 18=2mS, 19=5mS, 20=10mS, 21=20mS, 22=50mS, 23=100mS, 24=200mS, 25=500mS, 26=1S, 27=2S, 28=5S, 29=10S, 30=20S
+#31=50S, 32=100S, 33=200S, 34=500S, 35=1000S
+TIME_MULT = [2E-9, 5E-9, 1E-8, 2E-8, 5E-8, 1E-7, 2E-7, 5E-7, 1E-6, 2E-6, 5E-6, 1E-5, 2E-5, 5E-5, 1E-4, 2E-4, 5E-4, 1E-3, 2E-3, 5E-3, 1E-2, 2E-2, 5E-2, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+SAMPLING_RATE_SINGLE = [1E9, 1E9, 1E9, 1E9, 1E9, 1E9, 1E9, 500E6, 250E6, 125E6, 50E6, 25E6, 12.5E6, 5E6, 2.5E6, 1.25E6, 500E3, 250E3, 125E3, 50E3, 25E3, 12.5E3, 5E3, 2.5E3, 1.25E3, 500, 250, 125, 50, 25, 12.5, 5, 2.5, 1.25, 0.5, 0.25]
+SAMPLING_RATE_DUAL =   [500E6, 500E6, 500E6, 500E6, 500E6, 500E6, 500E6, 500E6, 250E6, 125E6, 50E6, 25E6, 12.5E6, 5E6, 2.5E6, 1.25E6, 500E3, 250E3, 125E3, 50E3, 25E3, 12.5E3, 5E3, 2.5E3, 1.25E3, 500, 250, 125, 50, 25, 12.5, 5, 2.5, 1.25, 0.5, 0.25]
+SAMPLING_RATE_QUAD =   [250E6, 250E6, 250E6, 250E6, 250E6, 250E6, 250E6, 250E6, 250E6, 125E6, 50E6, 25E6, 12.5E6, 5E6, 2.5E6, 1.25E6, 500E3, 250E3, 125E3, 50E3, 25E3, 12.5E3, 5E3, 2.5E3, 1.25E3, 500, 250, 125, 50, 25, 12.5, 5, 2.5, 1.25, 0.5, 0.25]
+
+#0=2mV, 1=5mV, 2=10mV, 3=20mV, 4=50mV, 5=100mV, 6=200mV, 7=500mV, 8=1V, 9=2V, 10=5V, 11=10V (w/ x1 probe)
+VOLT_MULT = [0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10]
+
+# ── STRUCT DEFINITIONS ─────────────────────────────────────────────────────────
+class RelayControl(Structure):
+    _fields_ = [
+        ("bCHEnable",   wintypes.BOOL * 4),
+        ("nCHVoltDIV",  wintypes.WORD * 4),
+        ("nCHCoupling", wintypes.WORD * 4),
+        ("bCHBWLimit",  wintypes.BOOL * 4),
+        ("nTrigSource", wintypes.WORD),
+        ("bTrigFilt",   wintypes.BOOL),
+        ("nALT",        wintypes.WORD),
+    ]
+
+class DataControl(Structure):
+    _fields_ = [
+        ("nCHSet",          wintypes.WORD),
+        ("nTimeDIV",        wintypes.WORD),
+        ("nTriggerSource",  wintypes.WORD),
+        ("nHTriggerPos",    wintypes.WORD),
+        ("nVTriggerPos",    wintypes.WORD),
+        ("nTriggerSlope",   wintypes.WORD),
+        ("nBufferLen",      wintypes.ULONG),
+        ("nReadDataLen",    wintypes.ULONG),
+        ("nAlreadyReadLen", wintypes.ULONG),
+        ("nALT",            wintypes.WORD),
+        ("nETSOpen",        wintypes.WORD),
+        ("nDriverCode",     wintypes.WORD),
+        ("nLastAddress",    wintypes.ULONG),
+        ("nFPGAVersion",    wintypes.WORD),
+    ]
+
+# ── SIGNATURES ─────────────────────────────────────────────────────────────────
+_W, _PW = wintypes.WORD, POINTER(wintypes.WORD)
+SIGNATURES = {
+    # name                          (argtypes, restype)
+    "dsoHTSearchDevice":           ([_PW], _W),
+    "dsoInitHard":                 ([_W], _W),
+    "dsoHTADCCHModGain":           ([_W, _W], _W),
+    "dsoHTSetSampleRate":          ([_W, _W, POINTER(RelayControl), POINTER(DataControl)], _W),
+    "dsoHTSetCHAndTrigger":        ([_W, POINTER(RelayControl), _W], _W),
+    "dsoHTSetRamAndTrigerControl": ([_W, _W, _W, _W, _W], _W),
+    "dsoHTSetCHPos":               ([_W, _W, _W, _W, _W], _W),
+    "dsoHTSetVTriggerLevel":       ([_W, _W, _W], _W),
+    "dsoHTSetTrigerMode":          ([_W, _W, _W, _W], _W),
+    "dsoHTStartCollectData":       ([_W, _W], _W),
+    "dsoHTGetState":               ([_W], _W),
+    "dsoHTGetData":                ([_W, _PW, _PW, _PW, _PW, POINTER(DataControl)], _W),
+    "ddsSetCmd":                   ([_W, wintypes.USHORT], wintypes.ULONG),
+    "ddsSDKSetWaveType":           ([_W, _W], _W),
+    "ddsSDKSetFre":                ([_W, wintypes.FLOAT], wintypes.FLOAT),
+    "ddsSDKSetAmp":                ([_W, _W], _W),
+    "ddsSDKSetOffset":             ([_W, wintypes.SHORT], wintypes.SHORT),
+    "ddsSetOnOff":                 ([_W, wintypes.SHORT], wintypes.ULONG),
+}
+
+
+def declare(dll):
+    """Set argtypes/restype on every SIGNATURES entry the library exports."""
+    for name, (argtypes, restype) in SIGNATURES.items():
+        fn = getattr(dll, name, None)
+        if fn is not None:
+            fn.argtypes = argtypes
+            fn.restype  = restype
+    return dll
+
+
+def load_dll(path: str = DLL_PATH):
+    from ctypes import windll
+    return declare(windll.LoadLibrary(path))
+
+
+def load_driver(kind: str = None, instrument: bool = False, **sim_kwargs):
+    """
+    Return the scope driver ("dll" or "sim", see module docstring).
+    `sim_kwargs` are passed to simdll.SimDll.
+    """
+    kind = kind or os.environ.get(ENV_VAR) or ("dll" if os.name == "nt" else "sim")
+    if kind == "dll":
+        driver = load_dll(os.environ.get("HANTEK_DLL_PATH", DLL_PATH))
+    elif kind == "sim":
+        from simdll import SimDll
+        driver = SimDll(**sim_kwargs)
+    else:
+        raise ValueError(f"unknown driver {kind!r} (expected 'dll' or 'sim')")
+    if instrument:
+        from instrument import Instrumented
+        driver = Instrumented(driver)
+    return driver
@@ -1,19 +1,33 @@
 import os
-import time
-from ctypes import Structure, POINTER, byref, windll, wintypes
+from ctypes import byref, wintypes
 import numpy as np
 
+from bufpool import BufferPool
+from capfile import EXTENSION, write_capture
+from convert import channel_scale, to_codes, to_volts
+from driver import (DataControl, RelayControl, SAMPLING_RATE_SINGLE, VOLT_MULT,
+                    load_driver)
+from instrument import print_snapshot
+from pipeline import CapturePipeline, print_report
+from runstats import RunStats
+from scopestate import config_calls
+from waiting import Backoff, print_summary
+
 # ── DLL LOADING ────────────────────────────────────────────────────────────────
-DLL_PATH = r"C:\Users\zhoul\Desktop\Hantek scope\Hantek Python API\Dll\x64\HTHardDll.dll"
-_scope   = windll.LoadLibrary(DLL_PATH)
+# HTHardDll on Windows, the simulator elsewhere; HANTEK_DRIVER=dll|sim overrides.
+# Every call is counted/timed and its return code checked (see instrument.py)
+_scope = load_driver(instrument=True)
 
 # ── OUTPUT FOLDER ──────────────────────────────────────────────────────────────
 SAVE_FOLDER = os.path.join(os.getcwd(), "pico_I2C(400kHz)")
-os.makedirs(SAVE_FOLDER, exist_ok=True)
 
 # ── CONSTANTS ──────────────────────────────────────────────────────────────────
 BUFFER_LEN         = 4096
 RUN_COUNT          = 10
+PIPELINE_BUFFERS   = 4     # preallocated capture buffers shared by the pipeline
+PIPELINE_WORKERS   = 2     # threads scaling/saving while the next run is captured
+STATS_FILE         = "run_stats.npz"   # running mean/std/edge-jitter checkpoint in SAVE_FOLDER
+SAVE_FORMAT        = "htcap"   # "htcap" = binary codes (capfile.py), "txt" = tab-separated volts
 # Define your sampling rate and voltage settings here
 #0=2nS, 1=5nS, 2=10nS, 3=20nS, 4=50nS, 5=100nS, 6=200nS, 7=500nS, 8=1uS, 9=2uS, 10=5uS, 11=10uS, 12=20uS, 13=50uS, 14=100uS, 15=200uS, 16=500uS 
 #17=1mS, 18=2mS, 19=5mS, 20=10mS, 21=20mS, 22=50mS, 23=100mS, 24=200mS, 25=500mS, 26=1S, 27=2S, 28=5S, 29=10S, 30=20S
@@ -24,51 +38,17 @@ VOLTS_PER_DIVISION = 8
 PROBE_MULTIPLIER   = 1
 CH_ZERO_POS        = [128, 128, 128, 128]
 
-SAMPLING_RATE_SINGLE = [1E9, 1E9, 1E9, 1E9, 1E9, 1E9, 1E9, 500E6, 
-                        250E6, 125E6, 50E6, 25E6, 12.5E6, 5E6, 2.5E6, 
-                        1.25E6, 500E3, 250E3, 125E3, 50E3, 25E3, 12.5E3, 
-                        5E3, 2.5E3, 1.25E3, 500, 250, 125, 50, 25, 12.5, 
-                        5, 2.5, 1.25, 0.5, 0.25]
-
-VOLT_MULT       = [0.002, 0.005, 0.01, 0.02, 0.05, 0.1,
-                   0.2, 0.5, 1, 2, 5, 10]
-
-# ── STRUCT DEFINITIONS ─────────────────────────────────────────────────────────
-class RelayControl(Structure):
-    _fields_ = [
-        ("bCHEnable",   wintypes.BOOL * 4),
-        ("nCHVoltDIV",  wintypes.WORD * 4),
-        ("nCHCoupling", wintypes.WORD * 4),
-        ("bCHBWLimit",  wintypes.BOOL * 4),
-        ("nTrigSource", wintypes.WORD),
-        ("bTrigFilt",   wintypes.BOOL),
-        ("nALT",        wintypes.WORD),
-    ]
-
-class DataControl(Structure):
-    _fields_ = [
-        ("nCHSet",          wintypes.WORD),
-        ("nTimeDIV",        wintypes.WORD),
-        ("nTriggerSource",  wintypes.WORD),
-        ("nHTriggerPos",    wintypes.WORD),
-        ("nVTriggerPos",    wintypes.WORD),
-        ("nTriggerSlope",   wintypes.WORD),
-        ("nBufferLen",      wintypes.ULONG),
-        ("nReadDataLen",    wintypes.ULONG),
-        ("nAlreadyReadLen", wintypes.ULONG),
-        ("nALT",            wintypes.WORD),
-        ("nETSOpen",        wintypes.WORD),
-        ("nDriverCode",     wintypes.WORD),
-        ("nLastAddress",    wintypes.ULONG),
-        ("nFPGAVersion",    wintypes.WORD),
-    ]
+# Poll sleeps back off from 50 µs up to a quarter of the record duration
+WAIT_TIMEOUT = 60.0   # seconds without a trigger before giving up
+WAIT_POLICY  = Backoff.for_record(BUFFER_LEN, SAMPLING_RATE_SINGLE[TIME_PER_DIVISION],
+                                  timeout=WAIT_TIMEOUT)
 
-# ── SCOPE INTERFACE ────────────────────────────────────────────────────────────
-def get_device_index() -> int:
-    search = _scope.dsoHTSearchDevice
-    search.argtypes = [POINTER(wintypes.WORD)]
-    search.restype  = wintypes.WORD
+# Capture buffers and time axes are allocated once and reused by every run
+POOL = BufferPool(BUFFER_LEN, PIPELINE_BUFFERS)
 
+# ── SCOPE INTERFACE ────────────────────────────────────────────────────────────
+def get_device_index(scope=None) -> int:
+    search = (_scope if scope is None else scope).dsoHTSearchDevice
     devices = (wintypes.WORD * 32)()
     if search(devices) == 0:
         raise RuntimeError("No Hantek device found")
@@ -77,37 +57,29 @@ def get_device_index() -> int:
             return i
     raise RuntimeError("No valid device index returned")
 
-def initialize_device(idx: int) -> None:
-    init = _scope.dsoInitHard
-    init.argtypes = [wintypes.WORD]
-    init.restype  = wintypes.WORD
+def initialize_device(idx: int, scope=None) -> None:
+    init = (_scope if scope is None else scope).dsoInitHard
     if init(idx) != 1:
         raise RuntimeError("Device initialization failed")
 
-def configure_scope(idx: int, rc: RelayControl, dc: DataControl) -> None:
-    _scope.dsoHTSetSampleRate(idx, 0, byref(rc), byref(dc))
-    _scope.dsoHTSetCHAndTrigger(idx, byref(rc), dc.nTimeDIV)
-    _scope.dsoHTSetRamAndTrigerControl(idx,
-        dc.nTimeDIV, dc.nCHSet, dc.nTriggerSource, 0)
-    for ch in range(4):
-        _scope.dsoHTSetCHPos(idx,
-            rc.nCHVoltDIV[ch],
-            CH_ZERO_POS[ch],
-            ch, 1
-        )
-    _scope.dsoHTSetVTriggerLevel(idx, dc.nVTriggerPos, 4)
-    _scope.dsoHTSetTrigerMode(idx, 0, dc.nTriggerSlope, 0)
+def configure_scope(idx: int, rc: RelayControl, dc: DataControl,
+                    scope=None) -> None:
+    # the full sequence; scopestate.ScopeState makes only the changed calls
+    s = _scope if scope is None else scope
+    for _, name, args, _ in config_calls(rc, dc, CH_ZERO_POS):
+        getattr(s, name)(idx, *args)
 
 def collect_data(idx: int) -> None:
     _scope.dsoHTStartCollectData(idx, 1)
-    while (_scope.dsoHTGetState(idx) & 2) == 0:
-        time.sleep(0.001)
+    WAIT_POLICY(_scope, idx)
 
-def save_data(run: int, time_axis: np.ndarray, scaled: np.ndarray) -> None:
+def save_data(run: int, time_axis: np.ndarray, scaled: np.ndarray,
+              folder: str = None) -> None:
     """
-    Write one run’s data to disk. Expects `scaled` shape = (BUFFER_LEN, 4).
+    Write one run’s data to disk as text. Expects `scaled` shape = (BUFFER_LEN, 4).
     """
-    fn = os.path.join(SAVE_FOLDER, f"pico_I2C_run{run:02d}.txt")
+    fn = os.path.join(SAVE_FOLDER if folder is None else folder,
+                      f"pico_I2C_run{run:02d}.txt")
     with open(fn, "w") as f:
         f.write("Time(s)\tCH1\tCH2\tCH3\tCH4\n")
         for t, vals in zip(time_axis, scaled):
@@ -115,33 +87,54 @@ def save_data(run: int, time_axis: np.ndarray, scaled: np.ndarray) -> None:
             f.write(f"{t:.9e}\t{line}\n")
     print(f"Saved: {fn}")
 
-def read_and_save(idx: int, dc: DataControl, run: int) -> None:
-    # 1) Allocate raw‐data buffers
-    raw = [(wintypes.WORD * BUFFER_LEN)() for _ in range(4)]
-    _scope.dsoHTGetData(
-        idx,
-        byref(raw[0]), byref(raw[1]),
-        byref(raw[2]), byref(raw[3]),
-        byref(dc)
-    )
+def save_capture(fn: str, dc: DataControl, codes: np.ndarray,
+                 scale: np.ndarray, offset: np.ndarray) -> None:
+    """
+    Write one run’s raw codes to `fn`. Expects `codes` shape = (4, BUFFER_LEN).
+    """
+    write_capture(fn, codes, scale, offset,
+                  dc.nTimeDIV, SAMPLING_RATE_SINGLE[dc.nTimeDIV],
+                  {"source": dc.nTriggerSource, "slope": dc.nTriggerSlope,
+                   "h_pos": dc.nHTriggerPos, "v_pos": dc.nVTriggerPos})
+    print(f"Saved: {fn}")
 
-    # 2) Build time axis
+def save_run(run: int, dc: DataControl, codes: np.ndarray) -> None:
+    """
+    Scale/persist one run. Expects `codes` shape = (4, BUFFER_LEN).
+    """
+    if SAVE_FORMAT == "htcap":
+        # Keep the raw codes; volts/time are rebuilt from the header
+        codes, scale, offset = to_codes(codes, VOLT_MULT[VOLTS_PER_DIVISION],
+                                        CH_ZERO_POS, PROBE_MULTIPLIER)
+        fn = os.path.join(SAVE_FOLDER, f"pico_I2C_run{run:02d}{EXTENSION}")
+        save_capture(fn, dc, codes, scale, offset)
+        return
+
+    # Build time axis (cached per timebase)
     fs = SAMPLING_RATE_SINGLE[TIME_PER_DIVISION]
-    time_axis = np.arange(BUFFER_LEN) / fs
+    time_axis = POOL.time_axis(TIME_PER_DIVISION, fs, codes.shape[1])
 
-    # 3) Scale into volts
-    scaled = np.zeros((BUFFER_LEN, 4), dtype=float)
-    vpdiv  = VOLT_MULT[VOLTS_PER_DIVISION] * PROBE_MULTIPLIER
-    for i in range(BUFFER_LEN):
-        for ch in range(4):
-            raw_val       = raw[ch][i] - (255 - CH_ZERO_POS[ch])
-            scaled[i, ch] = raw_val * vpdiv * 8 / 256
+    # Scale into volts, shape (BUFFER_LEN, 4)
+    scale, offset = channel_scale(VOLT_MULT[VOLTS_PER_DIVISION],
+                                  CH_ZERO_POS, PROBE_MULTIPLIER)
+    save_data(run, time_axis, to_volts(codes, scale, offset).T)
+
+def read_and_save(idx: int, dc: DataControl, run: int) -> None:
+    # 1) Borrow a pooled raw‐data buffer (one contiguous block, viewed by NumPy)
+    with POOL.acquire() as buf:
+        raw = buf.raw
+        _scope.dsoHTGetData(
+            idx,
+            raw[0], raw[1],
+            raw[2], raw[3],
+            byref(dc)
+        )
 
-    # 4) Write it out
-    save_data(run, time_axis, scaled)
+        # 2) Scale and write it out
+        save_run(run, dc, buf.codes)
 
-def main():
-    # Build control structs
+def build_controls() -> tuple:
+    """Return the (RelayControl, DataControl) pair for the settings above."""
     rc = RelayControl(
         bCHEnable=(wintypes.BOOL * 4)(1,1,1,1),
         nCHVoltDIV=(wintypes.WORD * 4)(*(VOLTS_PER_DIVISION,)*4),
@@ -166,15 +159,36 @@ def main():
     dc.nDriverCode     = 0
     dc.nLastAddress    = 0
     dc.nFPGAVersion    = 0
+    return rc, dc
+
+def main():
+    rc, dc = build_controls()
 
+    os.makedirs(SAVE_FOLDER, exist_ok=True)
     idx = get_device_index()
     initialize_device(idx)
     configure_scope(idx, rc, dc)
 
-    for run in range(1, RUN_COUNT + 1):
-        print(f"--- Capturing Run {run}/{RUN_COUNT} ---")
-        collect_data(idx)
-        read_and_save(idx, dc, run)
+    # Running statistics, updated by the workers one capture at a time
+    stats = RunStats(BUFFER_LEN, SAMPLING_RATE_SINGLE[TIME_PER_DIVISION])
+    scale, offset = channel_scale(VOLT_MULT[VOLTS_PER_DIVISION],
+                                  CH_ZERO_POS, PROBE_MULTIPLIER)
+
+    def sink(run: int, codes: np.ndarray, run_dc: DataControl) -> None:
+        save_run(run, run_dc, codes)
+        stats.update_codes(codes, scale, offset)
+
+    # Capture on one thread while workers scale/save the previous runs
+    pipe = CapturePipeline(_scope, idx, dc, sink,
+                           n_buffers=PIPELINE_BUFFERS,
+                           n_workers=PIPELINE_WORKERS,
+                           wait=WAIT_POLICY,
+                           pool=POOL,
+                           sink_dc=True)
+    print_report(pipe.run(RUN_COUNT))
+    print_summary(WAIT_POLICY)
+    print_snapshot(_scope.snapshot())
+    stats.save(os.path.join(SAVE_FOLDER, STATS_FILE))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,216 @@
+"""
+Vectorised I2C decoder for SCL/SDA traces.
+
+decode() takes (runs, samples) SCL and SDA arrays (volts as written by
+getData, raw codes, or memmaps) and returns one I2C_DTYPE record per bus
+event, sorted by (run, index):
+
+    START / RESTART / STOP   SDA falls / rises while SCL is high
+    ADDRESS                  first byte after a START: value = 7-bit address,
+                             rw = 1 for a read
+    DATA                     every following byte
+
+Byte records carry the ACK bit (1 = acknowledged) and the sample index and
+time of their first SCL rising edge.  Logic levels come from
+edges.logic_state (per-run mid-level with hysteresis), and every step after
+that is a whole-array operation: conditions and SCL rises are found with
+np.diff/np.nonzero on the 2-D state, each rise is assigned to the
+condition before it with np.searchsorted, and SDA is gathered at all rises
+in one fancy-indexing step.  Bits outside START...STOP and trailing
+incomplete bytes are ignored.
+
+transactions() groups records into one dict per START...STOP for printing.
+decode_folder() decodes every run of a capture folder at once.
+
+Usage:
+    python i2c.py FOLDER [FOLDER ...] [--scl CH1] [--sda CH4] [--csv]
+    python i2c.py --bench [samples]
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+from edges import logic_state
+
+I2C_DTYPE = np.dtype([("run", "i4"), ("kind", "i1"), ("index", "i8"),
+                      ("time", "f8"), ("value", "i2"), ("rw", "i1"), ("ack", "i1")])
+START, RESTART, STOP, ADDRESS, DATA = range(5)
+KIND_NAMES = ("START", "RESTART", "STOP", "ADDRESS", "DATA")
+SCL, SDA = "CH1", "CH4"         # getData / simdll channel assignment
+CSV_FILE = "i2c.csv"
+
+
+def decode(scl, sda, fs: float, hysteresis: float = 0.1,
+           threshold: float = None) -> np.ndarray:
+    """
+    Every START/RESTART/STOP/ADDRESS/DATA event in (runs, samples) SCL and
+    SDA arrays; see the module docstring.  `fs` is the sample rate.
+    """
+    c = logic_state(scl, hysteresis, threshold)
+    d = logic_state(sda, hysteresis, threshold)
+    if c.shape != d.shape:
+        raise ValueError(f"SCL {c.shape} and SDA {d.shape} shapes differ")
+    n = c.shape[1]
+
+    # conditions: SDA transition between two samples where SCL stays high
+    dd = np.diff(d.view(np.int8), axis=1)
+    cr, cj = np.nonzero(dd & c[:, 1:] & c[:, :-1])
+    is_start = dd[cr, cj] == -1
+    cj += 1
+    cflat = cr.astype(np.int64) * n + cj
+    prev_start = np.zeros(len(cr), dtype=bool)
+    prev_start[1:] = is_start[:-1] & (cr[1:] == cr[:-1])
+    ckind = np.where(is_start, np.where(prev_start, RESTART, START), STOP)
+
+    # SCL rising edges, each assigned to the condition before it
+    rr, rj = np.nonzero(np.diff(c.view(np.int8), axis=1) == 1)
+    rj += 1
+    seg = np.searchsorted(cflat, rr.astype(np.int64) * n + rj, side="right") - 1
+    ok = seg >= 0
+    ok[ok] = (cr[seg[ok]] == rr[ok]) & is_start[seg[ok]]
+    rr, rj, seg = rr[ok], rj[ok], seg[ok]
+
+    # bit position inside the transfer; complete bytes end on bit 8 (ACK)
+    rank = np.arange(len(seg)) - np.searchsorted(seg, seg)
+    last = np.flatnonzero(rank % 9 == 8)
+    first = last - 8
+    bits = d[rr[first[:, None] + np.arange(9)], rj[first[:, None] + np.arange(9)]]
+    value = bits[:, :8].astype(np.int16) @ (1 << np.arange(7, -1, -1, dtype=np.int16))
+    is_addr = rank[first] == 0
+
+    out = np.empty(len(cr) + len(first), dtype=I2C_DTYPE)
+    k = len(cr)
+    out["run"][:k], out["kind"][:k], out["index"][:k] = cr, ckind, cj
+    out["value"][:k] = out["rw"][:k] = out["ack"][:k] = -1
+    out["run"][k:], out["index"][k:] = rr[first], rj[first]
+    out["kind"][k:]  = np.where(is_addr, ADDRESS, DATA)
+    out["value"][k:] = np.where(is_addr, value >> 1, value)
+    out["rw"][k:]    = np.where(is_addr, value & 1, -1)
+    out["ack"][k:]   = ~bits[:, 8]
+    out["time"] = out["index"] / fs
+    return out[np.lexsort((out["index"], out["run"]))]
+
+
+def transactions(records: np.ndarray) -> list:
+    """One dict per START...STOP (or START...RESTART) with address, rw, data and acks."""
+    out, cur = [], None
+    for rec in records:
+        kind = rec["kind"]
+        if kind in (START, RESTART) or (cur is not None and rec["run"] != cur["run"]):
+            if cur is not None:
+                out.append(cur)
+            cur = None
+            if kind in (START, RESTART):
+                cur = {"run": int(rec["run"]), "time": float(rec["time"]),
+                       "restart": kind == RESTART, "address": None, "rw": None,
+                       "data": [], "acks": [], "stop": False}
+        elif cur is None:
+            continue
+        elif kind == ADDRESS:
+            cur["address"], cur["rw"] = int(rec["value"]), int(rec["rw"])
+            cur["acks"].append(bool(rec["ack"]))
+        elif kind == DATA:
+            cur["data"].append(int(rec["value"]))
+            cur["acks"].append(bool(rec["ack"]))
+        elif kind == STOP:
+            cur["stop"] = True
+            out.append(cur)
+            cur = None
+    if cur is not None:
+        out.append(cur)
+    return out
+
+
+def format_transaction(tr: dict) -> str:
+    addr = "??" if tr["address"] is None else f"0x{tr['address']:02X}"
+    rw   = "" if tr["rw"] is None else ("R" if tr["rw"] else "W")
+    data = " ".join(f"{b:02X}{'' if a else '*'}"
+                    for b, a in zip(tr["data"], tr["acks"][1:]))
+    return (f"run{tr['run'] + 1:02d} {tr['time'] * 1e6:10.2f} µs  "
+            f"{'Sr' if tr['restart'] else 'S '} {addr} {rw:1s} "
+            f"{'' if not tr['acks'] or tr['acks'][0] else 'NACK '}[{data}]"
+            f"{' P' if tr['stop'] else ''}")
+
+
+def save_csv(records: np.ndarray, path: str) -> None:
+    with open(path, "w") as f:
+        f.write("run,kind,index,time,value,rw,ack\n")
+        for r in records:
+            f.write(f"{r['run'] + 1},{KIND_NAMES[r['kind']]},{r['index']},"
+                    f"{r['time']:.9e},{r['value']},{r['rw']},{r['ack']}\n")
+
+
+def decode_folder(folder: str, scl: str = SCL, sda: str = SDA, **kwargs) -> np.ndarray:
+    """decode() every run in `folder`; record["run"] is 0-based in run order."""
+    from catalog import folder_runs
+    from loader import load_runs
+
+    t, data = load_runs(folder_runs(folder), [scl, sda])
+    return decode(data[scl], data[sda], 1.0 / (t[1] - t[0]), **kwargs)
+
+
+# ── BENCHMARK ──────────────────────────────────────────────────────────────────
+def _synthetic(n: int, fs: float, rate: float, rng) -> tuple:
+    """(scl, sda, bytes) volts of back-to-back random write transfers with noise."""
+    from simdll import i2c_frame
+
+    scl, sda, sent = [], [], []
+    q = int(np.ceil(n * 4 * rate / fs)) + 1
+    while sum(map(len, scl)) < q:
+        data = [int(rng.integers(0, 128)) << 1] + rng.integers(0, 256, 4).tolist()
+        s, d = i2c_frame(data, gap_bits=2)
+        scl.append(s)
+        sda.append(d)
+        sent += data
+    quarter = (np.arange(n) * 4 * rate / fs).astype(np.int64)
+    noise = lambda: rng.normal(0, 0.05, n)
+    return (np.concatenate(scl)[quarter] * 3.3 + noise(),
+            np.concatenate(sda)[quarter] * 3.3 + noise(), sent)
+
+
+def benchmark(n: int = 1_000_000, fs: float = 10e6, rate: float = 400e3) -> None:
+    rng = np.random.default_rng(0)
+    scl, sda, sent = _synthetic(n, fs, rate, rng)
+    decode(scl[:1000], sda[:1000], fs)
+    t0 = time.perf_counter()
+    rec = decode(scl, sda, fs)
+    dt = time.perf_counter() - t0
+    got = [int(r["value"]) << 1 | int(r["rw"]) if r["kind"] == ADDRESS else int(r["value"])
+           for r in rec if r["kind"] in (ADDRESS, DATA)]
+    print(f"{n} samples @ {fs / 1e6:g} MS/s, {rate / 1e3:g} kHz bus: "
+          f"{len(rec)} records in {dt * 1e3:.1f} ms ({n / dt / 1e6:.0f} Msamples/s)")
+    print(f"bytes match what was sent: {got == sent[:len(got)]} "
+          f"({len(got)} of {len(sent)}; the last transfer is cut off)")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("folders", nargs="*")
+    ap.add_argument("--scl", default=SCL)
+    ap.add_argument("--sda", default=SDA)
+    ap.add_argument("--hysteresis", type=float, default=0.1)
+    ap.add_argument("--csv", action="store_true", help=f"write {CSV_FILE} per folder")
+    ap.add_argument("--bench", type=int, nargs="?", const=1_000_000)
+    args = ap.parse_args(argv)
+
+    if args.bench:
+        benchmark(args.bench)
+        return 0
+    for folder in args.folders:
+        t0 = time.perf_counter()
+        rec = decode_folder(folder, args.scl, args.sda, hysteresis=args.hysteresis)
+        trs = transactions(rec)
+        print(f"── {folder}: {len(trs)} transactions, {len(rec)} records "
+              f"({time.perf_counter() - t0:.2f} s)")
+        for tr in trs:
+            print(format_transaction(tr))
+        if args.csv:
+            save_csv(rec, os.path.join(folder, CSV_FILE))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Call counting, timing and return-code checks around every driver entry point.
+
+Instrumented(driver) wraps each SIGNATURES function of a driver from
+driver.load_driver() (the real DLL, whose argtypes/restype are already
+declared, or SimDll) in a thin closure that
+
+    counts the call and times it with perf_counter_ns
+    checks the return code of the CHECKED entry points (0 = failure):
+        counted as an error, and raised as DriverError when strict=True
+    optionally logs one metrics line every `log_interval` seconds
+
+Every other attribute is forwarded to the wrapped driver, so an Instrumented
+driver can be passed anywhere a scope is expected.  snapshot() returns the
+counters as a dict; reset() clears them.
+
+Overhead (per call and relative to a 4096-sample capture loop):
+    python instrument.py
+"""
+
+import threading
+import time
+
+from driver import SIGNATURES
+
+# entry points that return 0 when the call failed
+CHECKED = frozenset({
+    "dsoInitHard", "dsoHTSetSampleRate", "dsoHTSetCHAndTrigger",
+    "dsoHTSetRamAndTrigerControl", "dsoHTSetCHPos", "dsoHTSetVTriggerLevel",
+    "dsoHTSetTrigerMode", "dsoHTStartCollectData", "dsoHTGetData",
+})
+
+
+class DriverError(RuntimeError):
+    def __init__(self, name: str, args: tuple, result):
+        super().__init__(f"{name} failed (returned {result!r})")
+        self.name   = name
+        self.args_  = args
+        self.result = result
+
+
+class CallStats:
+    """Count, error count and total/max duration (ns) of one entry point."""
+
+    __slots__ = ("name", "calls", "errors", "total_ns", "max_ns", "_lock")
+
+    def __init__(self, name: str):
+        self.name  = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = self.errors = self.total_ns = self.max_ns = 0
+
+    def add(self, ns: int, failed: bool) -> None:
+        with self._lock:
+            self.calls    += 1
+            self.total_ns += ns
+            if ns > self.max_ns:
+                self.max_ns = ns
+            if failed:
+                self.errors += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            calls, errors, total, mx = self.calls, self.errors, self.total_ns, self.max_ns
+        return {
+            "calls":    calls,
+            "errors":   errors,
+            "total_ms": total / 1e6,
+            "mean_us":  total / calls / 1e3 if calls else 0.0,
+            "max_us":   mx / 1e3,
+        }
+
+
+class Instrumented:
+    def __init__(self, driver, strict: bool = False, log=None,
+                 log_interval: float = None):
+        """
+        `strict` raises DriverError on a failed CHECKED call (it is counted
+        either way).  With `log_interval` set, `log` (default print) gets a
+        format_line() summary at most once per that many seconds.
+        """
+        self._driver      = driver
+        self.strict       = strict
+        self.log          = log or print
+        self.log_interval = log_interval
+        self._stats       = {}
+        self._next_log    = None
+        self._log_lock    = threading.Lock()
+        for name in SIGNATURES:
+            fn = getattr(driver, name, None)
+            if fn is not None:
+                setattr(self, name, self._wrap(name, fn))
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def _wrap(self, name: str, fn):
+        st    = self._stats[name] = CallStats(name)
+        check = name in CHECKED
+        clock = time.perf_counter_ns
+
+        def call(*args):
+            t0 = clock()
+            result = fn(*args)
+            t1 = clock()
+            failed = check and result == 0
+            st.add(t1 - t0, failed)
+            if failed and self.strict:
+                raise DriverError(name, args, result)
+            if self.log_interval is not None:
+                self._maybe_log(t1)
+            return result
+
+        call.__name__ = name
+        return call
+
+    def _maybe_log(self, now_ns: int) -> None:
+        with self._log_lock:
+            if self._next_log is None:
+                self._next_log = now_ns + int(self.log_interval * 1e9)
+                return
+            if now_ns < self._next_log:
+                return
+            self._next_log = now_ns + int(self.log_interval * 1e9)
+        self.log(format_line(self.snapshot()))
+
+    # ── metrics ───────────────────────────────────────────────────────────────
+    def snapshot(self) -> dict:
+        """{"calls", "errors", "total_ms", "functions": {name: CallStats.as_dict()}}"""
+        funcs = {name: st.as_dict() for name, st in self._stats.items()}
+        funcs = {name: d for name, d in funcs.items() if d["calls"]}
+        return {
+            "calls":     sum(d["calls"] for d in funcs.values()),
+            "errors":    sum(d["errors"] for d in funcs.values()),
+            "total_ms":  sum(d["total_ms"] for d in funcs.values()),
+            "functions": funcs,
+        }
+
+    def reset(self) -> None:
+        for st in self._stats.values():
+            with st._lock:
+                st.reset()
+
+
+def format_line(snap: dict) -> str:
+    """One-line summary: totals plus the three most expensive entry points."""
+    top = sorted(snap["functions"].items(), key=lambda kv: -kv[1]["total_ms"])[:3]
+    parts = " ".join(f"{name}={d['calls']}/{d['total_ms']:.1f}ms" for name, d in top)
+    return (f"driver: {snap['calls']} calls, {snap['errors']} errors, "
+            f"{snap['total_ms']:.1f} ms in driver | {parts}")
+
+
+def print_snapshot(snap: dict) -> None:
+    print(f"{'function':<28} {'calls':>7} {'errors':>6} {'total ms':>10} "
+          f"{'mean µs':>9} {'max µs':>9}")
+    for name, d in sorted(snap["functions"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        print(f"{name:<28} {d['calls']:>7} {d['errors']:>6} {d['total_ms']:>10.2f} "
+              f"{d['mean_us']:>9.1f} {d['max_us']:>9.1f}")
+    print(f"{'total':<28} {snap['calls']:>7} {snap['errors']:>6} {snap['total_ms']:>10.2f}")
+
+
+# ── OVERHEAD ───────────────────────────────────────────────────────────────────
+def _per_call_ns(fn, calls: int) -> float:
+    t0 = time.perf_counter_ns()
+    for _ in range(calls):
+        fn(0)
+    return (time.perf_counter_ns() - t0) / calls
+
+
+def measure_overhead(n: int = 4096, runs: int = 200, calls: int = 200_000) -> dict:
+    """
+    Wrapper cost per call (on dsoHTGetState) and as a fraction of a capture
+    loop of `runs` records of `n` samples on the simulator.
+    """
+    import getData
+    from pipeline import CapturePipeline
+    from simdll import SimDll
+    from waiting import Backoff
+
+    sim  = SimDll()
+    inst = Instrumented(SimDll())
+    per_call = (_per_call_ns(inst.dsoHTGetState, calls)
+                - _per_call_ns(sim.dsoHTGetState, calls))
+    inst.reset()
+
+    rc, dc = getData.build_controls()
+    dc.nBufferLen = dc.nReadDataLen = n
+    walls = {}
+    for label, scope in (("plain", sim), ("instrumented", inst)):
+        getData.configure_scope(0, rc, dc, scope)
+        wait = Backoff.for_record(n, getData.SAMPLING_RATE_SINGLE[dc.nTimeDIV])
+        pipe = CapturePipeline(scope, 0, dc, lambda run, codes: None, wait=wait)
+        walls[label] = pipe.run(runs)["wall_s"]
+    snap = inst.snapshot()
+    calls_per_capture = snap["functions"]["dsoHTGetState"]["calls"] / runs + 2
+    capture_s = walls["plain"] / runs
+    return {
+        "per_call_ns":       per_call,
+        "calls_per_capture": calls_per_capture,
+        "capture_ms":        capture_s * 1e3,
+        "overhead":          calls_per_capture * per_call * 1e-9 / capture_s,
+        "wall_plain_s":      walls["plain"],
+        "wall_instr_s":      walls["instrumented"],
+    }
+
+
+if __name__ == "__main__":
+    o = measure_overhead()
+    print(f"wrapper cost {o['per_call_ns']:.0f} ns/call, "
+          f"{o['calls_per_capture']:.1f} calls per 4096-sample capture of "
+          f"{o['capture_ms']:.2f} ms → {o['overhead']:.3%} overhead")
+    print(f"capture loop wall: plain {o['wall_plain_s']:.3f} s, "
+          f"instrumented {o['wall_instr_s']:.3f} s")
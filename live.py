@@ -0,0 +1,421 @@
+"""
+Live scope view fed by the capture pipeline.
+
+LiveCapture runs a pipeline.CapturePipeline on background threads with
+run(None); its sink copies each record into an ascope.Frame and publishes
+it to a LatestSlot.  The slot holds only the newest frame: put() is a
+single reference assignment and take() a single read (both atomic under
+the GIL), so acquisition never takes a lock or waits for the display, and
+frames the display has not picked up by the time the next one arrives are
+simply overwritten (counted as dropped).
+
+LiveViewer draws the newest frame with blitting: line and text artists
+are created once (animated=True), each update calls set_data() on them,
+restores the cached background, draws just those artists and blits the
+axes.  Records longer than two samples per pixel column are reduced to a
+min/max pair per column and drawn as one filled band per channel (cheap
+to rasterise, and a one-sample glitch still widens its column).  The
+background is re-cached on every full draw (resize, zoom, record length
+change).
+
+Capture FPS (records through the pipeline) and display FPS (frames drawn)
+are measured and shown separately; `max_fps` caps the display so it
+leaves CPU for the capture threads.
+
+Usage (simulated scope; --headless renders on Agg and prints the rates):
+    python live.py [--seconds 10] [--max-fps 60] [--headless]
+"""
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+import numpy as np
+
+from ascope import Frame
+from pipeline import CapturePipeline
+
+
+class LatestSlot:
+    """Newest-frame mailbox between any number of producers and one consumer."""
+
+    def __init__(self):
+        self._item = None               # (seq, frame), replaced as a whole
+        self._seq  = itertools.count(1)
+        self._seen = 0
+        self._t0   = None
+        self.taken   = 0
+        self.dropped = 0
+
+    def put(self, frame) -> None:
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        self._item = (next(self._seq), frame)
+
+    def take(self):
+        """Newest frame not yet taken, or None."""
+        item = self._item
+        if item is None or item[0] <= self._seen:
+            return None
+        self.dropped += item[0] - self._seen - 1
+        self._seen = item[0]
+        self.taken += 1
+        return item[1]
+
+    @property
+    def published(self) -> int:
+        return self._seen if self._item is None else max(self._seen, self._item[0])
+
+    @property
+    def capture_fps(self) -> float:
+        """Frames published per second since the first one."""
+        dt = time.perf_counter() - self._t0 if self._t0 else 0.0
+        return self.published / dt if dt else 0.0
+
+
+class SharedSlot:
+    """
+    LatestSlot across processes: one frame in shared memory behind a
+    sequence lock.  The writer makes the sequence odd, copies the frame in
+    and makes it even again; the reader copies the frame out and keeps it
+    only if the sequence was even and unchanged throughout, so neither side
+    ever waits for the other (a torn read is just skipped).  Writer threads
+    in one process serialise on a local lock.  Create it in the capture
+    process and attach with SharedSlot(name=slot.name) in the viewer.
+    """
+
+    _INTS, _FLOATS = 4, 11      # [seq, n, run, published], [time, fs, t0, scale×4, offset×4]
+
+    def __init__(self, max_samples: int = None, name: str = None):
+        from multiprocessing import shared_memory
+
+        if name is None:
+            size = 8 * (self._INTS + self._FLOATS) + 4 * max_samples
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            max_samples = (self.shm.size - 8 * (self._INTS + self._FLOATS)) // 4
+        buf = self.shm.buf
+        self._ints   = np.ndarray(self._INTS, np.int64, buf)
+        self._floats = np.ndarray(self._FLOATS, np.float64, buf, 8 * self._INTS)
+        self._data   = np.ndarray((4, max_samples), np.uint8, buf,
+                                  8 * (self._INTS + self._FLOATS))
+        self._lock   = threading.Lock()
+        self._seen   = 0
+        self.max_samples = max_samples
+        self.taken   = 0
+        self.dropped = 0
+        self.torn    = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def put(self, frame: Frame) -> None:
+        n = frame.codes.shape[1]
+        if n > self.max_samples:
+            raise ValueError(f"frame of {n} samples exceeds the slot's {self.max_samples}")
+        with self._lock:
+            ints, f = self._ints, self._floats
+            if ints[3] == 0:
+                f[2] = time.time()
+            ints[0] += 1                                # odd: write in progress
+            self._data[:, :n] = frame.codes
+            ints[1], ints[2] = n, frame.seq
+            f[0], f[1] = frame.timestamp, frame.sample_rate
+            f[3:7], f[7:11] = frame.scale, frame.offset
+            ints[3] += 1
+            ints[0] += 1                                # even: frame complete
+
+    def take(self):
+        """Newest complete frame not yet taken, or None."""
+        ints, f = self._ints, self._floats
+        seq = int(ints[0])
+        if seq & 1 or seq == self._seen:
+            return None
+        n, run = int(ints[1]), int(ints[2])
+        codes = self._data[:, :n].copy()
+        meta = f.copy()
+        if int(ints[0]) != seq:
+            self.torn += 1
+            return None
+        self.dropped += (seq - self._seen) // 2 - 1
+        self._seen = seq
+        self.taken += 1
+        return Frame(run, meta[0], codes, meta[3:7], meta[7:11], meta[1])
+
+    @property
+    def published(self) -> int:
+        return int(self._ints[3])
+
+    @property
+    def capture_fps(self) -> float:
+        dt = time.time() - self._floats[2]
+        return self.published / dt if self.published and dt > 0 else 0.0
+
+    def close(self, unlink: bool = False) -> None:
+        self._ints = self._floats = self._data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class LiveCapture:
+    """Continuous triggered captures on background threads, published to `slot`."""
+
+    def __init__(self, scope, idx: int, dc, scale, offset, sample_rate: float,
+                 slot: LatestSlot = None, **pipeline_kwargs):
+        self.slot        = slot or LatestSlot()
+        self.scale       = np.asarray(scale, dtype=float)
+        self.offset      = np.asarray(offset, dtype=float)
+        self.sample_rate = sample_rate
+        self.pipe        = CapturePipeline(scope, idx, dc, self._sink, **pipeline_kwargs)
+        self.report      = None
+        self.error       = None
+        self._thread     = None
+        self._t0         = None
+
+    def _sink(self, run: int, codes: np.ndarray) -> None:
+        self.slot.put(Frame(run, time.time(), codes.astype(np.uint8), self.scale,
+                            self.offset, self.sample_rate))
+
+    def _run(self) -> None:
+        try:
+            self.report = self.pipe.run(None)
+        except BaseException as exc:
+            self.error = exc
+
+    def start(self) -> "LiveCapture":
+        self._t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict:
+        self.pipe.stop()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.report
+
+    @property
+    def fps(self) -> float:
+        elapsed = time.perf_counter() - self._t0 if self._t0 else 0.0
+        return self.pipe.stats["process"].count / elapsed if elapsed else 0.0
+
+
+class LiveViewer:
+    def __init__(self, slot: LatestSlot, channels=(0, 3), colors=("blue", "green"),
+                 v_range=(-0.5, 4.5), max_fps: float = None, ax=None):
+        import matplotlib.pyplot as plt
+
+        self.slot     = slot
+        self.channels = list(channels)
+        self.max_fps  = max_fps
+        if ax is None:
+            self.fig, ax = plt.subplots(figsize=(12, 5))
+        else:
+            self.fig = ax.figure
+        self.ax       = ax
+        self.canvas   = self.fig.canvas
+        colors        = [c for _, c in zip(self.channels, itertools.cycle(colors))]
+        self.lines    = [ax.plot([], [], color=c, lw=1, animated=True,
+                                 label=f"CH{ch + 1}")[0]
+                         for ch, c in zip(self.channels, colors)]
+        self.bands    = [ax.fill([0], [0], color=c, lw=0, animated=True,
+                                 antialiased=False)[0] for c in colors]
+        self.text     = ax.text(0.01, 0.98, "", transform=ax.transAxes, va="top",
+                                family="monospace", animated=True)
+        ax.set_ylim(*v_range)
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Voltage (V)")
+        ax.legend(loc="upper right", fontsize="small")
+        self.n          = None
+        self.frames     = 0
+        self._bg        = None
+        self._t0        = None
+        self._fps_t     = None
+        self._fps_n     = 0
+        self._fps       = 0.0
+        self._next      = 0.0
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event=None) -> None:
+        self._bg = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._blit()
+
+    def _blit(self) -> None:
+        if self._bg is None:
+            return
+        self.canvas.restore_region(self._bg)
+        for a in self.lines + self.bands + [self.text]:
+            if a.get_visible():
+                self.ax.draw_artist(a)
+        self.canvas.blit(self.fig.bbox)
+
+    def _trace(self, frame: Frame) -> tuple:
+        """
+        (x, lo, hi) of the channels in `frame`: the raw samples (lo is hi)
+        or, for records over two samples per pixel column, each column's
+        min/max extended to the next column's first sample so steep edges
+        stay connected.
+        """
+        v = np.stack([frame.volts(ch) for ch in self.channels])
+        n, columns = v.shape[1], max(1, int(self.ax.bbox.width))
+        if n <= 2 * columns:
+            return np.arange(n) / frame.sample_rate, v, v
+        starts = np.linspace(0, n, columns + 1).astype(np.int64)[:-1]
+        lo = np.minimum.reduceat(v, starts, axis=1)
+        hi = np.maximum.reduceat(v, starts, axis=1)
+        lo[:, :-1] = np.minimum(lo[:, :-1], v[:, starts[1:]])
+        hi[:, :-1] = np.maximum(hi[:, :-1], v[:, starts[1:]])
+        return starts / frame.sample_rate, lo, hi
+
+    def show_frame(self, frame: Frame) -> None:
+        n = frame.codes.shape[1]
+        if n != self.n:                          # new record length: new x-range
+            self.n = n
+            self.ax.set_xlim(0, (n - 1) / frame.sample_rate)
+            self.canvas.draw()
+        x, lo, hi = self._trace(frame)
+        raw = lo is hi
+        if raw:
+            for line, y in zip(self.lines, lo):
+                line.set_data(x, y)
+        else:
+            # a filled min/max band rasterises far faster than a zig-zag line;
+            # pad it by half a pixel so flat stretches stay one pixel thick
+            y0, y1 = self.ax.get_ylim()
+            pad = 0.5 * (y1 - y0) / max(1.0, self.ax.bbox.height)
+            xs = np.concatenate((x, x[::-1]))
+            for band, l, h in zip(self.bands, lo, hi):
+                band.set_xy(np.column_stack((xs, np.concatenate((h + pad, l[::-1] - pad)))))
+        for a in self.lines:
+            a.set_visible(raw)
+        for a in self.bands:
+            a.set_visible(not raw)
+        self.frames += 1
+        self._fps_n += 1
+        now = time.perf_counter()
+        if self._fps_t is None:                  # first frame outside run()
+            self._t0 = self._fps_t = now
+        if now - self._fps_t >= 0.5:
+            self._fps = self._fps_n / (now - self._fps_t)
+            self._fps_t, self._fps_n = now, 0
+        self.text.set_text(f"capture {self.slot.capture_fps:6.1f} fps   "
+                           f"display {self._fps:6.1f} fps   dropped {self.slot.dropped}")
+        self._blit()
+
+    def step(self) -> bool:
+        """Draw the newest frame if there is one (and the FPS cap allows); True if drawn."""
+        now = time.perf_counter()
+        if self.max_fps and now < self._next:
+            return False
+        frame = self.slot.take()
+        if frame is None:
+            return False
+        self._next = now + 1.0 / self.max_fps if self.max_fps else 0.0
+        self.show_frame(frame)
+        return True
+
+    def run(self, duration: float = None, idle: float = 0.001) -> dict:
+        """Update until `duration` s pass or the window is closed; returns report()."""
+        import matplotlib.pyplot as plt
+
+        interactive = self.canvas.supports_blit and plt.get_backend().lower() != "agg"
+        if interactive:
+            plt.show(block=False)
+        self.canvas.draw()
+        self._t0 = self._fps_t = time.perf_counter()
+        while duration is None or time.perf_counter() - self._t0 < duration:
+            if not self.step():
+                time.sleep(idle)
+            if interactive:
+                self.canvas.flush_events()
+                if not plt.fignum_exists(self.fig.number):
+                    break
+        return self.report()
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self._t0 if self._t0 else 0.0
+        return {
+            "elapsed_s":   elapsed,
+            "displayed":   self.frames,
+            "display_fps": self.frames / elapsed if elapsed else 0.0,
+            "published":   self.slot.published,
+            "dropped":     self.slot.dropped,
+        }
+
+
+def view_shared(name: str, duration: float = None, max_fps: float = None,
+                headless: bool = False, results=None) -> dict:
+    """Viewer process entry point: attach to SharedSlot `name` and run a LiveViewer."""
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    slot = SharedSlot(name=name)
+    try:
+        report = LiveViewer(slot, max_fps=max_fps).run(duration)
+        report["torn"] = slot.torn
+    finally:
+        slot.close()
+    if results is not None:
+        results.put(report)
+    return report
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--seconds", type=float, default=None)
+    ap.add_argument("--max-fps", type=float, default=60)
+    ap.add_argument("--buffer", type=int, default=4096)
+    ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--in-process", action="store_true",
+                    help="draw on a thread of the capture process (shares its GIL)")
+    args = ap.parse_args(argv)
+    if args.headless:
+        args.seconds = args.seconds or 5.0
+
+    import multiprocessing as mp
+    from convert import channel_scale
+    from driver import SAMPLING_RATE_SINGLE, VOLT_MULT
+    from getData import DataControl
+    from simdll import SimDll
+    from waiting import Backoff
+
+    sim = SimDll(trigger_latency=0.001)
+    dc = DataControl(nTimeDIV=14, nReadDataLen=args.buffer, nBufferLen=args.buffer)
+    fs = SAMPLING_RATE_SINGLE[14]
+    scale, offset = channel_scale(VOLT_MULT[8], [128] * 4)
+    slot = LatestSlot() if args.in_process else SharedSlot(args.buffer)
+    cap = LiveCapture(sim, 0, dc, scale, offset, fs, slot=slot,
+                      wait=Backoff.for_record(args.buffer, fs))
+    try:
+        if args.in_process:
+            if args.headless:
+                import matplotlib
+                matplotlib.use("Agg")
+            cap.start()
+            report = LiveViewer(slot, max_fps=args.max_fps).run(args.seconds)
+        else:
+            ctx = mp.get_context("spawn")
+            results = ctx.Queue()
+            viewer = ctx.Process(target=view_shared, args=(slot.name, args.seconds,
+                                 args.max_fps, args.headless, results))
+            viewer.start()
+            cap.start()
+            report = results.get()
+            viewer.join()
+    finally:
+        pipe = cap.stop()
+        if not args.in_process:
+            slot.close(unlink=True)
+    print(f"capture {pipe['captures_s']:.1f} fps ({pipe['runs']} records), "
+          f"display {report['display_fps']:.1f} fps ({report['displayed']} frames), "
+          f"dropped {report['dropped']} frames without blocking the capture")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Parallel run-file loader with an on-disk cache of the parsed arrays.
+
+load_runs() returns (time, {channel: (runs, samples) array}) for a list of
+run files.  Only the requested columns are parsed, text files are parsed in
+a process pool, and every parsed column is cached as a .npy file keyed by a
+SHA-1 of the file's contents.  Binary .htcap files are already memory-mapped
+and are read in-process without caching.  A small index maps each path to its
+(mtime, size, sha1), so unchanged files are not even re-hashed; a touched
+file is re-hashed and, if its content is the same, still hits the cache.
+
+The cache lives in a ".runcache" folder next to the run files.
+
+Usage (cold vs warm timing):
+    python loader.py "pico_I2C(400kHz)" [CH1 CH4]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from capfile import EXTENSION, read_capture
+
+CACHE_DIR  = ".runcache"
+TIME_COL   = "Time(s)"
+_INDEX     = "index.json"
+
+
+def run_path(folder: str, run: int) -> str:
+    """Path of run `run`, preferring the binary file over the text one."""
+    stem = os.path.join(folder, f"pico_I2C_run{run:02d}")
+    return stem + EXTENSION if os.path.exists(stem + EXTENSION) else stem + ".txt"
+
+
+def _parse(path: str, columns: list) -> dict:
+    """Parse `columns` of one run file (runs in a worker process)."""
+    if path.endswith(EXTENSION):
+        cap = read_capture(path)
+        return {col: np.asarray(cap[col]) for col in columns}
+    import pandas as pd
+    df = pd.read_csv(path, sep="\t", usecols=columns)
+    return {col: df[col].to_numpy() for col in columns}
+
+
+def sha1_file(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class RunCache:
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._index_path = os.path.join(folder, _INDEX)
+        try:
+            with open(self._index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        self.dirty = False
+
+    def key(self, path: str) -> str:
+        """Content hash of `path`, recomputed only if mtime/size changed."""
+        st = os.stat(path)
+        entry = self.index.get(os.path.abspath(path))
+        if entry and entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry["sha1"]
+        sha = sha1_file(path)
+        self.index[os.path.abspath(path)] = {"mtime": st.st_mtime_ns,
+                                             "size": st.st_size, "sha1": sha}
+        self.dirty = True
+        return sha
+
+    def _file(self, key: str, col: str) -> str:
+        safe = col.replace("(", "").replace(")", "")
+        return os.path.join(self.folder, f"{key}_{safe}.npy")
+
+    def get(self, key: str, col: str):
+        fn = self._file(key, col)
+        return np.load(fn, mmap_mode="r") if os.path.exists(fn) else None
+
+    def put(self, key: str, col: str, arr: np.ndarray) -> None:
+        fn = self._file(key, col)
+        tmp = fn + ".tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, fn)
+
+    def flush(self) -> None:
+        if self.dirty:
+            with open(self._index_path, "w") as f:
+                json.dump(self.index, f)
+            self.dirty = False
+
+
+def load_runs(paths: list, channels=("CH1", "CH4"), workers: int = None,
+              cache: bool = True, timings: dict = None) -> tuple:
+    """
+    Load `channels` (+ time) from every path.  Returns (time, {ch: (runs, n)}).
+    Pass a dict as `timings` to get "hash", "parse" and "total" seconds plus
+    the number of files parsed vs served from the cache.
+    """
+    t0 = time.perf_counter()
+    columns = [TIME_COL] + list(channels)
+    parsed  = [dict() for _ in paths]
+    rc, keys = None, [None] * len(paths)
+
+    for i, p in enumerate(paths):
+        if p.endswith(EXTENSION):
+            parsed[i] = _parse(p, columns)
+    if cache and paths:
+        rc = RunCache(os.path.join(os.path.dirname(os.path.abspath(paths[0])), CACHE_DIR))
+        for i, p in enumerate(paths):
+            if parsed[i]:
+                continue
+            keys[i] = rc.key(p)
+            for col in columns:
+                arr = rc.get(keys[i], col)
+                if arr is not None:
+                    parsed[i][col] = arr
+    t1 = time.perf_counter()
+
+    todo = [(i, [c for c in columns if c not in parsed[i]]) for i in range(len(paths))]
+    todo = [(i, cols) for i, cols in todo if cols]
+    if len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_parse, [paths[i] for i, _ in todo],
+                                  [cols for _, cols in todo]))
+    else:
+        results = [_parse(paths[i], cols) for i, cols in todo]
+    for (i, cols), res in zip(todo, results):
+        parsed[i].update(res)
+        if rc is not None:
+            for col in cols:
+                rc.put(keys[i], col, res[col])
+    if rc is not None:
+        rc.flush()
+    t2 = time.perf_counter()
+
+    t_axis = np.asarray(parsed[0][TIME_COL]) if paths else np.empty(0)
+    data = {ch: np.vstack([p[ch] for p in parsed]) for ch in channels}
+    if timings is not None:
+        timings.update({"hash": t1 - t0, "parse": t2 - t1,
+                        "total": time.perf_counter() - t0,
+                        "parsed": len(todo), "cached": len(paths) - len(todo)})
+    return t_axis, data
+
+
+def clear_cache(folder: str) -> None:
+    shutil.rmtree(os.path.join(folder, CACHE_DIR), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    folder   = sys.argv[1]
+    channels = sys.argv[2:] or ["CH1", "CH4"]
+    paths    = sorted(os.path.join(folder, n) for n in os.listdir(folder)
+                      if n.endswith((".txt", EXTENSION)))
+
+    clear_cache(folder)
+    for label in ("cold", "warm"):
+        t = {}
+        _, data = load_runs(paths, channels, timings=t)
+        print(f"{label}: {t['total'] * 1e3:8.1f} ms  (hash {t['hash'] * 1e3:.1f} ms, "
+              f"parse {t['parse'] * 1e3:.1f} ms, {t['parsed']} parsed, "
+              f"{t['cached']} cached)  shapes={[d.shape for d in data.values()]}")
@@ -0,0 +1,262 @@
+"""
+Level-of-detail rendering of long traces and many runs with matplotlib.
+
+MinMaxPyramid precomputes, for a (runs, samples) array, the min and max of
+every block of `factor`^k samples (k = 1, 2, ...).  envelope() then answers
+"min/max of each pixel column between samples i0 and i1" from the coarsest
+level that still has at least two blocks per column, so a one-sample glitch
+always reaches the screen while the work per redraw is proportional to the
+number of columns, not samples.  Column limits are rounded out to block
+boundaries, so an extreme can move by at most one block but never vanish.
+
+LodPlot draws every run as one LineCollection of two points (min, max) per
+pixel column and recomputes them when the x-limits change (zoom/pan); once
+a column holds two samples or fewer the raw samples are drawn.
+
+DensityPlot is the persistence view: a (value × column) 2-D histogram of
+how many runs pass through each pixel, built from the same envelopes (each
+run's min..max span per column counts once, so steep edges are filled in
+as on a phosphor screen), drawn with imshow.
+
+Usage (render time vs run count, naive plt.plot vs LOD vs density):
+    python lod.py [samples [runs ...]]
+"""
+
+import functools
+import sys
+import time
+import numpy as np
+
+
+class MinMaxPyramid:
+    def __init__(self, y, factor: int = 4, min_blocks: int = 256):
+        self.y      = np.atleast_2d(y)
+        self.factor = factor
+        self.levels = []                    # (block, lo, hi), finest first
+        lo = hi = np.asarray(self.y, dtype=np.float32)
+        block = 1
+        while lo.shape[1] // factor >= min_blocks:
+            m, rest = divmod(lo.shape[1], factor)
+            # pairwise over strided views: much faster than .min(axis=2) on (.., m, 4)
+            lo_, hi_ = lo, hi
+            lo = functools.reduce(np.minimum, (lo_[:, k:m * factor:factor] for k in range(factor)))
+            hi = functools.reduce(np.maximum, (hi_[:, k:m * factor:factor] for k in range(factor)))
+            if rest:                        # trailing samples form a last, partial block
+                lo = np.concatenate((lo, lo_[:, m * factor:].min(axis=1, keepdims=True)), axis=1)
+                hi = np.concatenate((hi, hi_[:, m * factor:].max(axis=1, keepdims=True)), axis=1)
+            block *= factor
+            self.levels.append((block, lo, hi))
+        self.lo = float(np.min(self.levels[-1][1] if self.levels else self.y))
+        self.hi = float(np.max(self.levels[-1][2] if self.levels else self.y))
+
+    @property
+    def shape(self) -> tuple:
+        return self.y.shape
+
+    @property
+    def nbytes(self) -> int:
+        return sum(lo.nbytes + hi.nbytes for _, lo, hi in self.levels)
+
+    def envelope(self, i0: int, i1: int, columns: int) -> tuple:
+        """
+        (x, lo, hi) for samples [i0, i1) split into `columns` columns: x is
+        each column's first sample index (fractional), lo/hi are
+        (runs, columns).  With two samples or fewer per column the raw
+        samples come back with lo is hi.
+        """
+        n = self.y.shape[1]
+        i0, i1 = max(0, int(i0)), min(n, int(np.ceil(i1)))
+        per_col = (i1 - i0) / max(columns, 1)
+        usable = [lvl for lvl in self.levels if 2 * lvl[0] <= per_col]
+        if not usable:
+            raw = np.asarray(self.y[:, i0:i1], dtype=np.float32)
+            return np.arange(i0, i1, dtype=float), raw, raw
+        block, lo, hi = usable[-1]
+        b0, b1 = i0 // block, min(-(-i1 // block), lo.shape[1])
+        starts = np.unique(np.linspace(b0, b1, columns + 1).astype(np.int64)[:-1])
+        starts = starts[starts < b1]
+        lo = np.minimum.reduceat(lo[:, b0:b1], starts - b0, axis=1)
+        hi = np.maximum.reduceat(hi[:, b0:b1], starts - b0, axis=1)
+        return starts * float(block), lo, hi
+
+
+def line_segments(x: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """(runs, points, 2) vertices drawing each column as a min→max stroke."""
+    if lo is hi:
+        xs, ys = np.broadcast_to(x, lo.shape), lo
+    else:
+        xs = np.broadcast_to(np.repeat(x, 2), (lo.shape[0], 2 * len(x)))
+        ys = np.empty(xs.shape, dtype=lo.dtype)
+        ys[:, 0::2], ys[:, 1::2] = lo, hi
+    return np.stack([xs, ys], axis=-1)
+
+
+def density(x_lo: np.ndarray, x_hi: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    (len(edges) - 1, columns) count of runs whose [lo, hi] span per column
+    overlaps each value bin; built with one bincount over a difference array.
+    """
+    runs, cols = x_lo.shape
+    nb = len(edges) - 1
+    b0 = np.clip(np.searchsorted(edges, x_lo, side="right") - 1, 0, nb - 1)
+    b1 = np.clip(np.searchsorted(edges, x_hi, side="right") - 1, 0, nb - 1) + 1
+    col = np.broadcast_to(np.arange(cols) * (nb + 1), (runs, cols))
+    diff = (np.bincount((col + b0).ravel(), minlength=cols * (nb + 1))
+            - np.bincount((col + b1).ravel(), minlength=cols * (nb + 1)))
+    return np.cumsum(diff.reshape(cols, nb + 1), axis=1)[:, :nb].T
+
+
+class _LodArtist:
+    """Shared zoom handling: maps the axes' x-limits to sample indices."""
+
+    def __init__(self, ax, t, y, factor: int):
+        self.ax   = ax
+        self.t0   = float(t[0])
+        self.dt   = float(t[1] - t[0])
+        self.pyr  = y if isinstance(y, MinMaxPyramid) else MinMaxPyramid(y, factor)
+        self.cid  = None
+
+    def _view(self) -> tuple:
+        x0, x1 = self.ax.get_xlim()
+        columns = max(1, int(self.ax.bbox.width))
+        i0 = np.floor((x0 - self.t0) / self.dt)
+        i1 = np.ceil((x1 - self.t0) / self.dt) + 1
+        x, lo, hi = self.pyr.envelope(i0, i1, columns)
+        return self.t0 + x * self.dt, lo, hi
+
+    def _extent(self) -> None:
+        n = self.pyr.shape[1]
+        self.ax.update_datalim([(self.t0, self.pyr.lo),
+                                (self.t0 + (n - 1) * self.dt, self.pyr.hi)])
+        self.ax.autoscale_view()
+        self._update()
+        self.cid = self.ax.callbacks.connect("xlim_changed", self._update)
+
+    def _update(self, ax=None) -> None:
+        raise NotImplementedError
+
+
+class LodPlot(_LodArtist):
+    """
+    Every run of a (runs, samples) array `y` against uniform time `t` as
+    one LineCollection; `y` may also be a prebuilt MinMaxPyramid.  Extra
+    keyword arguments go to LineCollection (color, alpha, lw, label, ...).
+    """
+
+    def __init__(self, ax, t, y, factor: int = 4, **kwargs):
+        from matplotlib.collections import LineCollection
+
+        super().__init__(ax, t, y, factor)
+        kwargs.setdefault("linewidths", kwargs.pop("lw", 1))
+        self.lines = LineCollection([], **kwargs)
+        ax.add_collection(self.lines)
+        self._extent()
+
+    def _update(self, ax=None) -> None:
+        self.lines.set_segments(line_segments(*self._view()))
+
+
+class DensityPlot(_LodArtist):
+    """
+    Persistence map of all runs in `y`.  `color` shades from faint (one
+    run) to solid (every run); otherwise kwargs go to imshow (cmap, ...).
+    """
+
+    def __init__(self, ax, t, y, bins: int = 256, factor: int = 4, color=None,
+                 **kwargs):
+        from matplotlib.colors import LinearSegmentedColormap, to_rgba
+
+        super().__init__(ax, t, y, factor)
+        pad = 0.02 * (self.pyr.hi - self.pyr.lo or 1.0)
+        self.edges = np.linspace(self.pyr.lo - pad, self.pyr.hi + pad, bins + 1)
+        if color is not None:
+            kwargs["cmap"] = LinearSegmentedColormap.from_list(
+                "persistence", [to_rgba(color, 0.15), to_rgba(color, 1.0)])
+        kwargs.setdefault("cmap", "viridis")
+        self.t_end = self.t0 + (self.pyr.shape[1] - 1) * self.dt
+        self.image = ax.imshow(np.full((bins, 1), np.nan), origin="lower", aspect="auto",
+                               interpolation="nearest",
+                               extent=(self.t0, self.t_end, self.edges[0], self.edges[-1]),
+                               **kwargs)
+        self._extent()
+
+    def _update(self, ax=None) -> None:
+        x, lo, hi = self._view()
+        if lo is hi and lo.shape[1] > 1:            # raw samples: span each step
+            x = x[:-1]
+            lo, hi = np.minimum(lo[:, :-1], lo[:, 1:]), np.maximum(hi[:, :-1], hi[:, 1:])
+        counts = density(lo, hi, self.edges).astype(float)
+        counts[counts == 0] = np.nan                    # empty pixels transparent
+        self.image.set_data(counts)
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        x_end = x[-1] + (x[-1] - x[-2] if len(x) > 1 else self.dt)
+        x_end = max(x_end, min(xlim[1], self.t_end))   # a short last column still reaches the end
+        self.image.set_extent((x[0], x_end, self.edges[0], self.edges[-1]))
+        self.image.set_clim(1, np.nanmax(counts) if np.isfinite(counts).any() else 1)
+        self.ax.set_xlim(xlim, emit=False, auto=None)   # set_extent must not move the view
+        self.ax.set_ylim(ylim, emit=False, auto=None)
+
+
+# ── BENCHMARK ──────────────────────────────────────────────────────────────────
+def _synthetic(runs: int, n: int, rng) -> np.ndarray:
+    """Square waves with per-run jitter, noise and one single-sample glitch each."""
+    period = max(n // 20, 8)
+    phase = np.arange(n, dtype=np.float32)
+    y = np.empty((runs, n), dtype=np.float32)
+    for r in range(runs):
+        y[r] = ((phase - rng.normal(0, period * 0.01)) % period < period / 2) * 3.3
+        y[r] += rng.normal(0, 0.05, n).astype(np.float32)
+    y[np.arange(runs), rng.integers(0, n, runs)] = 5.0
+    return y
+
+
+def _draw(fig) -> float:
+    t0 = time.perf_counter()
+    fig.canvas.draw()
+    return time.perf_counter() - t0
+
+
+def benchmark(n: int = 16384, run_counts=(10, 100, 1000), naive_max: int = 100) -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rng = np.random.default_rng(0)
+    print(f"{n} samples/run, 1200 px wide axes (draw = fig.canvas.draw())")
+    print(f"{'runs':>6} {'naive':>9} {'build':>9} {'lod':>9} {'density':>9} {'glitches':>11}")
+    for runs in run_counts:
+        y = _synthetic(runs, n, rng)
+        t = np.arange(n) * 1e-6
+        row = [f"{runs:6d}"]
+
+        if runs <= naive_max:
+            fig, ax = plt.subplots(figsize=(12, 4), dpi=100)
+            for r in range(runs):
+                ax.plot(t, y[r], color="b", alpha=0.3)
+            row.append(f"{_draw(fig) * 1e3:7.0f}ms")
+            plt.close(fig)
+        else:
+            row.append(f"{'-':>9}")
+
+        t0 = time.perf_counter()
+        pyr = MinMaxPyramid(y)
+        row.append(f"{(time.perf_counter() - t0) * 1e3:7.0f}ms")
+
+        fig, ax = plt.subplots(figsize=(12, 4), dpi=100)
+        lp = LodPlot(ax, t, pyr, color="b", alpha=0.3)
+        row.append(f"{_draw(fig) * 1e3:7.0f}ms")
+        shown = sum(int((seg[:, 1] > 4).any()) for seg in lp.lines.get_segments())
+        plt.close(fig)
+
+        fig, ax = plt.subplots(figsize=(12, 4), dpi=100)
+        DensityPlot(ax, t, pyr)
+        row.append(f"{_draw(fig) * 1e3:7.0f}ms")
+        plt.close(fig)
+
+        row.append(f"{shown:6d}/{runs}")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    benchmark(*args[:1], *([args[1:]] if len(args) > 1 else []))
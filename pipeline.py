@@ -0,0 +1,219 @@
+"""
+Producer/consumer capture loop.
+
+One DLL thread arms the scope, waits for the trigger and calls dsoHTGetData
+into a bufpool.BufferPool of preallocated buffers; worker threads scale and
+persist each filled buffer and release it.  The filled queue is bounded by
+the pool size, so when the workers fall behind the DLL thread blocks on a
+free buffer instead of piling up captures in memory.
+
+Usage (simulated driver, no scope needed):
+    python pipeline.py
+"""
+
+import itertools
+import queue
+import threading
+import time
+from ctypes import byref
+import numpy as np
+
+from bufpool import BufferPool
+from waiting import SleepPoll
+
+_STOP = None
+
+
+class StageStats:
+    """Busy time, item count and bytes for one pipeline stage (thread-safe)."""
+
+    def __init__(self, name: str):
+        self.name   = name
+        self.count  = 0
+        self.busy   = 0.0
+        self.nbytes = 0
+        self._lock  = threading.Lock()
+
+    def add(self, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            self.count  += 1
+            self.busy   += seconds
+            self.nbytes += nbytes
+
+    def as_dict(self, wall: float) -> dict:
+        return {
+            "count":  self.count,
+            "busy_s": self.busy,
+            "per_s":  self.count / self.busy if self.busy else 0.0,
+            "MB_s":   self.nbytes / self.busy / 1e6 if self.busy else 0.0,
+            "util":   self.busy / wall if wall else 0.0,
+        }
+
+
+class CapturePipeline:
+    """
+    Capture `runs` records and call `sink(run, codes)` for each one from a
+    worker thread.  `codes` is a (4, nReadDataLen) uint16 view into a pooled
+    buffer and is only valid for the duration of the call.  `wait` is a
+    waiting.WaitPolicy (default: 1 ms SleepPoll).  Pass `pool` to share a
+    BufferPool with other code (its buffers must hold nReadDataLen samples,
+    else ValueError); otherwise one of `n_buffers` sets is made.
+    With `barrier` (a threading.Barrier) every run is armed only once all
+    parties reach it, which keeps several devices' pipelines in lock-step.
+    run(None) captures until stop() is called from another thread.
+    With `sink_dc` the sink is called as sink(run, codes, dc), where `dc` is a
+    copy of the DataControl taken right after that run's dsoHTGetData, so it
+    is not overwritten by the next capture while the sink reads it.
+    """
+
+    def __init__(self, scope, idx: int, dc, sink, n_buffers: int = 4,
+                 n_workers: int = 2, start_control: int = 1, wait=None,
+                 pool: BufferPool = None, barrier: threading.Barrier = None,
+                 sink_dc: bool = False):
+        self.scope         = scope
+        self.idx           = idx
+        self.dc            = dc
+        self.sink          = sink
+        self.n_workers     = n_workers
+        self.start_control = start_control
+        self.wait          = wait if wait is not None else SleepPoll()
+        self.barrier       = barrier
+        self.sink_dc       = sink_dc
+
+        if pool is not None and pool.n_samples < dc.nReadDataLen:
+            raise ValueError(f"pool buffers hold {pool.n_samples} samples, "
+                             f"nReadDataLen is {dc.nReadDataLen}")
+        self.pool    = pool if pool is not None else BufferPool(dc.nReadDataLen, n_buffers)
+        self._filled = queue.Queue(maxsize=n_buffers)
+
+        self.stats = {name: StageStats(name)
+                      for name in ("buffer_wait", "sync", "acquire", "transfer", "process")}
+        self.wall   = 0.0
+        self._error = None
+        self._stop  = threading.Event()
+
+    # ── stages ────────────────────────────────────────────────────────────────
+    def _produce(self, runs: int) -> None:
+        s, idx = self.scope, self.idx
+        try:
+            for run in (itertools.count(1) if runs is None else range(1, runs + 1)):
+                if self._stop.is_set():
+                    break
+                t0 = time.perf_counter()
+                buf = self.pool.acquire()              # backpressure point
+                raw = buf.raw
+                try:
+                    t1 = time.perf_counter()
+                    if self.barrier is not None:
+                        self.barrier.wait()
+                        self.stats["sync"].add(time.perf_counter() - t1)
+                        t1 = time.perf_counter()
+                    s.dsoHTStartCollectData(idx, self.start_control)
+                    self.wait(s, idx)
+                    t2 = time.perf_counter()
+                    s.dsoHTGetData(idx, raw[0], raw[1],
+                                   raw[2], raw[3], byref(self.dc))
+                    t3 = time.perf_counter()
+                    dc = type(self.dc).from_buffer_copy(self.dc)
+                except BaseException:
+                    buf.release()                      # never handed to a worker
+                    raise
+                self.stats["buffer_wait"].add(t1 - t0)
+                self.stats["acquire"].add(t2 - t1)
+                self.stats["transfer"].add(t3 - t2, buf.codes.nbytes)
+                self._filled.put((run, buf, dc))
+                if self._error is not None:
+                    break
+        except BaseException as exc:
+            self._error = exc
+            if self.barrier is not None:
+                self.barrier.abort()
+        finally:
+            for _ in range(self.n_workers):
+                self._filled.put(_STOP)
+
+    def _consume(self) -> None:
+        while True:
+            item = self._filled.get()
+            if item is _STOP:
+                return
+            run, buf, dc = item             # dc: this run's snapshot
+            t0 = time.perf_counter()
+            try:
+                if self._error is None:
+                    codes = buf.codes[:, :dc.nReadDataLen]
+                    if self.sink_dc:
+                        self.sink(run, codes, dc)
+                    else:
+                        self.sink(run, codes)
+            except BaseException as exc:
+                self._error = exc
+            finally:
+                buf.release()
+            self.stats["process"].add(time.perf_counter() - t0, buf.codes.nbytes)
+
+    # ── driver ────────────────────────────────────────────────────────────────
+    def stop(self) -> None:
+        """Finish the capture in flight and end run() early."""
+        self._stop.set()
+
+    def run(self, runs: int = None) -> dict:
+        """Capture `runs` records; returns report(). Re-raises any stage error."""
+        workers = [threading.Thread(target=self._consume, daemon=True)
+                   for _ in range(self.n_workers)]
+        producer = threading.Thread(target=self._produce, args=(runs,), daemon=True)
+
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        producer.start()
+        producer.join()
+        for w in workers:
+            w.join()
+        self.wall = time.perf_counter() - t0
+
+        if self._error is not None:
+            raise self._error
+        return self.report()
+
+    def report(self) -> dict:
+        done = self.stats["process"].count
+        return {
+            "runs":       done,
+            "wall_s":     self.wall,
+            "captures_s": done / self.wall if self.wall else 0.0,
+            "stages":     {k: v.as_dict(self.wall) for k, v in self.stats.items()},
+            "pool":       self.pool.counters(),
+        }
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['runs']} captures in {report['wall_s']:.3f} s "
+          f"→ {report['captures_s']:.1f} captures/s")
+    for name, st in report["stages"].items():
+        if st["count"] == 0:
+            continue
+        print(f"  {name:<12} n={st['count']:<5} busy={st['busy_s']:8.4f} s  "
+              f"{st['per_s']:9.1f}/s  {st['MB_s']:8.1f} MB/s  util={st['util']:5.1%}")
+    pool = report["pool"]
+    print(f"  buffers: {pool['sets_allocated']} allocated, "
+          f"{pool['acquire_waits']} waits for a free buffer")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from capfile import write_capture
+    from convert import channel_scale
+    from getData import BUFFER_LEN, DataControl
+    from simdll import SimDll
+
+    dc = DataControl(nReadDataLen=BUFFER_LEN, nBufferLen=BUFFER_LEN)
+    scale, offset = channel_scale(1.0, [128] * 4)
+    folder = tempfile.mkdtemp()
+
+    def sink(run: int, codes: np.ndarray) -> None:
+        write_capture(f"{folder}/run{run:04d}.htcap", codes.astype(np.uint8),
+                      scale, offset, 14, 2.5e6)
+
+    pipe = CapturePipeline(SimDll(), 0, dc, sink)
+    print_report(pipe.run(200))
@@ -24,7 +24,7 @@ def load_runs(data_dir: str, runs: int, channels: list) -> tuple:
     time = None
 
     for i in range(1, runs + 1):
-        path = os.path.join(data_dir, f"pico_I2C_run{runs:02d}.txt")
+        path = os.path.join(data_dir, f"pico_I2C_run{i:02d}.txt")
         df = pd.read_csv(path, sep="\t")
         if time is None:
             time = df["Time(s)"].values
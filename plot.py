@@ -1,136 +1,166 @@
 import os
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 import matplotlib.patches as mpatches
 
+from edges import FALLING, RISING, analyse
+from catalog import bus_rate, folder_runs
+from loader import load_runs, run_path
+from lod import DensityPlot, LodPlot
+
 # === CONFIG ===
 SAVE_PATH = r"C:\Users\zhoul\Desktop\Hantek scope\Hantek Python API\python code"
 SAVE_PATH = os.path.join(SAVE_PATH, "pico_I2C(400kHz)")
-NUM_RUNS  = 10
+NUM_RUNS  = 10      # None = every run in SAVE_PATH, in run order (catalog.py)
 CHANNELS  = ['CH1', 'CH4']
 COLORS    = {'CH1': 'blue', 'CH4': 'green'}
-
-# === 1) LOAD ALL RUNS ===
-data = {ch: [] for ch in CHANNELS}
-time = None
-
-for i in range(1, NUM_RUNS+1):
-    fn = os.path.join(SAVE_PATH, f"pico_I2C_run{i:02d}.txt")
-    df = pd.read_csv(fn, sep='\t')
-    if time is None:
-        time = df['Time(s)'].values
-    for ch in CHANNELS:
-        data[ch].append(df[ch].values)
-
-# === 2) STACK & COMPUTE VOLTAGE MEAN/STD ===
-stacked   = {ch: np.vstack(data[ch]) for ch in CHANNELS}  # shape (runs, samples)
-mean_vals = {ch: np.mean(stacked[ch], axis=0) for ch in CHANNELS}
-std_vals  = {ch: np.std (stacked[ch], axis=0) for ch in CHANNELS}
-
-# === 3) PULSE DURATION ON THE MEAN TRACE ===
-durations = {}
-for ch in CHANNELS:
-    mv     = mean_vals[ch]
-    thr    = 0.5*(mv.min() + mv.max())
-    high   = mv > thr
-    diffs  = np.diff(high.astype(int))
-
-    # rising = low→high, falling = high→low
-    ris_idx = np.where(diffs ==  1)[0] + 1
-    fal_idx = np.where(diffs == -1)[0] + 1
-    # edge‐cases
-    if high[0]:   ris_idx = np.insert(ris_idx,  0, 0)
-    if high[-1]:  fal_idx = np.append( fal_idx, len(high)-1)
-
-    dur = time[fal_idx] - time[ris_idx]
-    durations[ch] = {'ris_idx': ris_idx, 'fal_idx': fal_idx, 'dur': dur}
-
-    # print
-    print(f"\n=== {ch} pulse durations ===")
-    for i, d in enumerate(dur,1):
-        print(f" Pulse #{i}: {d*1e6:6.2f} µs")
-    #print(f" → mean = {dur.mean()*1e6:6.2f} µs ± {dur.std()*1e6:6.2f} µs")
-
-# === 4) EDGE‑TIME JITTER ACROSS RUNS ===
-jitter = {}
-for ch in CHANNELS:
-    run_r, run_f = [], []
-
-    for run in range(NUM_RUNS):
-        v    = stacked[ch][run]
-        thr  = 0.5*(v.min() + v.max())
-        high = v > thr
-        diffs = np.diff(high.astype(int))
-
-        ris = np.where(diffs ==  1)[0] + 1
-        fal = np.where(diffs == -1)[0] + 1
-        if high[0]:  ris = np.insert(ris,  0, 0)
-        if high[-1]: fal = np.append( fal, len(high)-1)
-
-        run_r.append(time[ris])
-        run_f.append(time[fal])
-
-    run_r = np.vstack(run_r)   # (runs, pulses)
-    run_f = np.vstack(run_f)
-
-    r_mean = run_r.mean(axis=0)
-    f_mean = run_f.mean(axis=0)
-    r_std  = run_r.std(axis=0)
-    f_std  = run_f.std(axis=0)
-
-    jitter[ch] = {
-        'r_mean': r_mean, 'f_mean': f_mean,
-        'r_std' : r_std,  'f_std' : f_std
-    }
-
-    # print
-    print(f"\n=== {ch} edge-time jitter ===")
-    for i,(rm, rs, fm, fs) in enumerate(zip(r_mean, r_std, f_mean, f_std),1):
-        print(f" Pulse #{i}: rising-σ = {rs*1e6:6.2f} µs,  falling-σ = {fs*1e6:6.2f} µs")
-
-# === 5) PLOT EVERYTHING ===
-plt.figure(figsize=(12,6))
-
-# a) raw runs + mean±std in voltage
-for ch in CHANNELS:
-    for run in range(NUM_RUNS):
-        plt.plot(time, stacked[ch][run],
-                 color=COLORS[ch], alpha=0.3,
-                 label=f"{ch} Run {run+1}" if run==0 else None)
-    plt.plot(time, mean_vals[ch],
-             color=COLORS[ch], lw=2, label=f"{ch} Mean")
-    # plt.fill_between(time,
-    #                  mean_vals[ch]-std_vals[ch],
-    #                  mean_vals[ch]+std_vals[ch],
-    #                  color=COLORS[ch], alpha=0.2,
-    #                  label=f"{ch} ±1 Std V")
-
-# # b) horizontal shading for edge‑time jitter
-# for ch in CHANNELS:
-#     col = COLORS[ch]
-#     jm = jitter[ch]
-#     for i, (rm, rs, fm, fs) in enumerate(zip(jm['r_mean'], jm['r_std'],
-#                                            jm['f_mean'], jm['f_std'])):
-#         # rising edge jitter
-#         plt.axvspan(rm-rs, rm+rs, ymin=0, ymax=1,
-#                     color=col, alpha=0.15,
-#                     label=f"{ch} rising ±1σ" if i==0 else "")
-#         # falling edge jitter
-#         plt.axvspan(fm-fs, fm+fs, ymin=0, ymax=1,
-#                     color=col, alpha=0.15,
-#                     label=f"{ch} falling ±1σ" if i==0 else "")
-#         # # mark the mean edge times
-#         # plt.axvline(rm, color=col, ls='--', lw=1)
-#         # plt.axvline(fm, color=col, ls='--', lw=1)
-
-# tidy up
-plt.title("Channel 1 & 4: Pulse Durations + Edge-Time Jitter with 400kHz I2C")
-plt.xlabel("Time (s)")
-plt.ylabel("Voltage (V)")
-plt.gca().xaxis.set_major_locator(MaxNLocator(nbins=20))
-plt.xticks(rotation=45)
-plt.legend(ncol=2, fontsize='small', loc='upper right')
-plt.tight_layout()
-plt.show()
+RUN_STYLE = 'lines'  # 'lines' = min/max per pixel column, 'density' = persistence map (lod.py)
+
+TITLE     = "{channels}: Pulse Durations + Edge-Time Jitter with {bus} I2C"
+
+def channel_color(ch):
+    """COLORS entry, else the matplotlib cycle colour for the channel number ("CH2" → C1)."""
+    if ch in COLORS:
+        return COLORS[ch]
+    digits = ''.join(c for c in str(ch) if c.isdigit())
+    return f"C{(int(digits) - 1) % 10 if digits else 0}"
+
+def channel_label(channels):
+    """ "Channel 1 & 4" / "Channel 1, 2 & 4" from a channel list like ['CH1', 'CH4'] """
+    nums = [''.join(c for c in str(ch) if c.isdigit()) or str(ch) for ch in channels]
+    if len(nums) < 2:
+        return f"Channel {''.join(nums)}"
+    return f"Channel {', '.join(nums[:-1])} & {nums[-1]}"
+
+def bus_label(folder):
+    """ "400kHz" from a folder name like "pico_I2C(400kHz)" (catalog.bus_rate), else "?" """
+    hz = bus_rate(folder)
+    if hz is None:
+        return "?"
+    return f"{hz/1e6:g}MHz" if hz >= 1e6 else f"{hz/1e3:g}kHz"
+
+def compute_stats(time, stacked, channels=CHANNELS):
+    """Mean/std traces, pulse durations on the mean trace and edge-time jitter per channel."""
+    # === 2) COMPUTE VOLTAGE MEAN/STD ===
+    mean_vals = {ch: np.mean(stacked[ch], axis=0) for ch in channels}
+    std_vals  = {ch: np.std (stacked[ch], axis=0) for ch in channels}
+
+    # === 3) PULSE DURATION ON THE MEAN TRACE ===
+    durations = {}
+    for ch in channels:
+        mv     = mean_vals[ch]
+        thr    = 0.5*(mv.min() + mv.max())
+        high   = mv > thr
+        diffs  = np.diff(high.astype(int))
+
+        # rising = low→high, falling = high→low
+        ris_idx = np.where(diffs ==  1)[0] + 1
+        fal_idx = np.where(diffs == -1)[0] + 1
+        # edge‐cases
+        if high[0]:   ris_idx = np.insert(ris_idx,  0, 0)
+        if high[-1]:  fal_idx = np.append( fal_idx, len(high)-1)
+
+        dur = time[fal_idx] - time[ris_idx]
+        durations[ch] = {'ris_idx': ris_idx, 'fal_idx': fal_idx, 'dur': dur}
+
+    # === 4) EDGE‑TIME JITTER ACROSS RUNS ===
+    # all runs at once; edges are matched to a reference run by nearest time,
+    # so runs with a missing/extra pulse do not break the statistics
+    fs = 1.0 / (time[1] - time[0])
+    jitter = {}
+    for ch in channels:
+        jt = analyse(stacked[ch], fs)["jitter"]
+        r  = jt[jt['kind'] == RISING]
+        f  = jt[jt['kind'] == FALLING]
+
+        jitter[ch] = {
+            'r_mean': r['mean'], 'f_mean': f['mean'],
+            'r_std' : r['std'],  'f_std' : f['std']
+        }
+    return {'mean': mean_vals, 'std': std_vals, 'durations': durations,
+            'jitter': jitter, 'fs': fs}
+
+def print_stats(stats):
+    for ch, d in stats['durations'].items():
+        print(f"\n=== {ch} pulse durations ===")
+        for i, dur in enumerate(d['dur'],1):
+            print(f" Pulse #{i}: {dur*1e6:6.2f} µs")
+        #print(f" → mean = {dur.mean()*1e6:6.2f} µs ± {dur.std()*1e6:6.2f} µs")
+
+    for ch, jm in stats['jitter'].items():
+        print(f"\n=== {ch} edge-time jitter ===")
+        for i,(rs, fs_) in enumerate(zip(jm['r_std'], jm['f_std']),1):
+            print(f" Pulse #{i}: rising-σ = {rs*1e6:6.2f} µs,  falling-σ = {fs_*1e6:6.2f} µs")
+
+def draw(ax, time, stacked, stats, title, style=RUN_STYLE):
+    """Runs + mean traces of every channel in `stats` on `ax`."""
+    num_runs = len(next(iter(stacked.values())))
+
+    # a) raw runs (decimated to the screen, so deep buffers / many runs stay fast)
+    #    + mean±std in voltage
+    for ch, mean in stats['mean'].items():
+        color = channel_color(ch)
+        if style == 'density':
+            DensityPlot(ax, time, stacked[ch], color=color)
+        else:
+            LodPlot(ax, time, stacked[ch],
+                    color=color, alpha=0.3, label=f"{ch} Runs 1-{num_runs}")
+        ax.plot(time, mean,
+                color=color, lw=2, label=f"{ch} Mean")
+        # ax.fill_between(time,
+        #                 mean-stats['std'][ch],
+        #                 mean+stats['std'][ch],
+        #                 color=COLORS[ch], alpha=0.2,
+        #                 label=f"{ch} ±1 Std V")
+
+    # # b) horizontal shading for edge‑time jitter
+    # for ch, jm in stats['jitter'].items():
+    #     col = COLORS[ch]
+    #     for i, (rm, rs, fm, fs) in enumerate(zip(jm['r_mean'], jm['r_std'],
+    #                                            jm['f_mean'], jm['f_std'])):
+    #         # rising edge jitter
+    #         ax.axvspan(rm-rs, rm+rs, ymin=0, ymax=1,
+    #                    color=col, alpha=0.15,
+    #                    label=f"{ch} rising ±1σ" if i==0 else "")
+    #         # falling edge jitter
+    #         ax.axvspan(fm-fs, fm+fs, ymin=0, ymax=1,
+    #                    color=col, alpha=0.15,
+    #                    label=f"{ch} falling ±1σ" if i==0 else "")
+    #         # # mark the mean edge times
+    #         # ax.axvline(rm, color=col, ls='--', lw=1)
+    #         # ax.axvline(fm, color=col, ls='--', lw=1)
+
+    # tidy up
+    ax.set_title(title)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Voltage (V)")
+    ax.xaxis.set_major_locator(MaxNLocator(nbins=20))
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.legend(ncol=2, fontsize='small', loc='upper right')
+
+def main():
+    # === 1) LOAD ALL RUNS ===
+    # parsed in parallel; repeat runs are served from SAVE_PATH/.runcache
+    if NUM_RUNS is None:
+        paths = folder_runs(SAVE_PATH)
+    else:
+        paths = [run_path(SAVE_PATH, i) for i in range(1, NUM_RUNS+1)]
+    num_runs = len(paths)
+    timings = {}
+    time, stacked = load_runs(paths, CHANNELS, timings=timings)  # shape (runs, samples)
+    print(f"Loaded {num_runs} runs in {timings['total']*1e3:.0f} ms "
+          f"({timings['cached']} from cache)")
+
+    # === 2-4) STATS ===
+    stats = compute_stats(time, stacked)
+    print_stats(stats)
+
+    # === 5) PLOT EVERYTHING ===
+    plt.figure(figsize=(12,6))
+    draw(plt.gca(), time, stacked, stats, TITLE.format(channels=channel_label(CHANNELS), bus=bus_label(SAVE_PATH)))
+    plt.tight_layout()
+    plt.show()
+
+if __name__ == "__main__":
+    main()
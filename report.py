@@ -0,0 +1,194 @@
+"""
+Headless batch reports for every run folder under a root.
+
+Each folder holding pico_I2C_runNN files (.htcap preferred over .txt) gets
+    report.png / report.svg   plot.py's figure (runs, means), titled with the
+                              bus rate from the folder name
+    report.json               machine-readable summary: run count, sample
+                              rate, per-channel pulse durations, edge-time
+                              jitter and voltage range, plus the input
+                              fingerprint
+Folders are rendered on the Agg backend in a process pool, one folder per
+task.  The fingerprint covers every run file's name, size and mtime plus
+the report settings, so a folder whose inputs and settings are unchanged
+since its last report.json (and whose images still exist) is skipped
+without loading anything.  report_index.json in the root collects every
+folder's summary.
+
+Usage:
+    python report.py ROOT [--formats png svg] [--channels CH1 CH4]
+                          [--style lines|density] [--workers N] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+REPORT_FILE  = "report.json"
+INDEX_FILE   = "report_index.json"
+REPORT_STEM  = "report"
+VERSION      = 1                # bump when the report contents change
+_RUN_FILE    = re.compile(r"pico_I2C_run(\d+)\.(htcap|txt)$")
+
+
+def run_files(folder: str) -> list:
+    """Run files of `folder` in run order, one per run (binary preferred)."""
+    runs = {}
+    for name in os.listdir(folder):
+        m = _RUN_FILE.match(name)
+        if m and (m.group(2) == "htcap" or int(m.group(1)) not in runs):
+            runs[int(m.group(1))] = os.path.join(folder, name)
+    return [runs[r] for r in sorted(runs)]
+
+
+def find_folders(root: str) -> list:
+    """Every folder under `root` (itself included) that holds run files."""
+    out = []
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        if run_files(dirpath):
+            out.append(dirpath)
+    return out
+
+
+def fingerprint(paths: list, settings: dict) -> str:
+    h = hashlib.sha1(json.dumps([VERSION, settings], sort_keys=True).encode())
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{os.path.basename(p)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _load_report(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, REPORT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def up_to_date(folder: str, settings: dict) -> bool:
+    old = _load_report(folder)
+    return (old.get("fingerprint") == fingerprint(run_files(folder), settings)
+            and all(os.path.exists(os.path.join(folder, f"{REPORT_STEM}.{fmt}"))
+                    for fmt in settings["formats"]))
+
+
+def _list(a) -> list:
+    return [None if x != x else float(x) for x in a]       # NaN → null
+
+
+# ── WORKER ─────────────────────────────────────────────────────────────────────
+def report_folder(folder: str, settings: dict) -> dict:
+    """Load, analyse and render one folder; writes the images and report.json."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import plot
+    from catalog import bus_rate
+    from loader import load_runs
+
+    t0 = time.perf_counter()
+    paths = run_files(folder)
+    fp = fingerprint(paths, settings)
+    channels = settings["channels"]
+    t, stacked = load_runs(paths, channels, workers=1)
+    stats = plot.compute_stats(t, stacked, channels)
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    title = plot.TITLE.format(channels=plot.channel_label(channels), bus=plot.bus_label(folder))
+    plot.draw(ax, t, stacked, stats, title, style=settings["style"])
+    fig.tight_layout()
+    for fmt in settings["formats"]:
+        tmp = os.path.join(folder, f"{REPORT_STEM}.tmp.{fmt}")
+        fig.savefig(tmp, dpi=100)
+        os.replace(tmp, os.path.join(folder, f"{REPORT_STEM}.{fmt}"))
+    plt.close(fig)
+
+    summary = {
+        "folder":      os.path.abspath(folder),
+        "fingerprint": fp,
+        "created":     time.time(),
+        "bus_hz":      bus_rate(folder),
+        "runs":        len(paths),
+        "files":       [os.path.basename(p) for p in paths],
+        "samples":     len(t),
+        "sample_rate": stats["fs"],
+        "channels":    {},
+    }
+    for ch in channels:
+        x, dur, jm = stacked[ch], stats["durations"][ch]["dur"], stats["jitter"][ch]
+        summary["channels"][ch] = {
+            "v_min":           float(x.min()),
+            "v_max":           float(x.max()),
+            "pulse_durations": _list(dur),
+            "rise_mean":       _list(jm["r_mean"]),
+            "fall_mean":       _list(jm["f_mean"]),
+            "rise_jitter":     _list(jm["r_std"]),
+            "fall_jitter":     _list(jm["f_std"]),
+        }
+    summary["render_s"] = time.perf_counter() - t0
+    tmp = os.path.join(folder, REPORT_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(summary, f, indent=1)
+    os.replace(tmp, os.path.join(folder, REPORT_FILE))
+    return summary
+
+
+# ── DRIVER ─────────────────────────────────────────────────────────────────────
+def run_reports(root: str, formats=("png",), channels=("CH1", "CH4"),
+                style: str = "lines", workers: int = None, force: bool = False,
+                log=print) -> dict:
+    """Report every changed folder under `root`; returns counters."""
+    settings = {"formats": list(formats), "channels": list(channels), "style": style}
+    folders  = find_folders(root)
+    todo     = [f for f in folders if force or not up_to_date(f, settings)]
+    counters = {"folders": len(folders), "rendered": 0,
+                "skipped": len(folders) - len(todo), "failed": 0}
+    t0 = time.perf_counter()
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(report_folder, f, settings): f for f in todo}
+            for fut in as_completed(futures):
+                folder = os.path.relpath(futures[fut], root)
+                try:
+                    s = fut.result()
+                    counters["rendered"] += 1
+                    log(f"{folder}: {s['runs']} runs, {s['render_s']:.2f} s")
+                except Exception as exc:
+                    counters["failed"] += 1
+                    log(f"{folder}: FAILED {exc!r}")
+
+    index = {os.path.relpath(f, root): _load_report(f) for f in folders}
+    tmp = os.path.join(root, INDEX_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(root, INDEX_FILE))
+    counters["wall_s"] = time.perf_counter() - t0
+    return counters
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("root")
+    ap.add_argument("--formats", nargs="+", default=["png"], choices=["png", "svg", "pdf"])
+    ap.add_argument("--channels", nargs="+", default=["CH1", "CH4"])
+    ap.add_argument("--style", default="lines", choices=["lines", "density"])
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--force", action="store_true", help="re-render unchanged folders")
+    args = ap.parse_args(argv)
+
+    counters = run_reports(args.root, args.formats, args.channels, args.style,
+                           args.workers, args.force)
+    print(counters)
+    return 1 if counters["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Streaming per-sample and per-edge statistics, one capture at a time.
+
+RunStats keeps Welford accumulators instead of every run: per-sample
+count/mean/M2/min/max envelopes for the selected channels, and per-edge
+timing statistics (edges matched to the first capture's edges with
+edges.align_edges).  Accumulators from different workers can be merged
+(Chan et al. parallel update) and checkpointed to a .npz file.
+
+Usage (replay a run folder, .htcap or .txt):
+    python runstats.py "pico_I2C(400kHz)" [checkpoint.npz]
+"""
+
+import json
+import os
+import sys
+import threading
+import numpy as np
+
+from edges import EDGE_DTYPE, FALLING, RISING, align_edges, find_edges, match_nearest
+
+
+class Welford:
+    """Element-wise count/mean/M2/min/max over arrays of a fixed shape."""
+
+    def __init__(self, shape):
+        self.n    = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2   = np.zeros(shape)
+        self.min  = np.full(shape, np.inf)
+        self.max  = np.full(shape, -np.inf)
+
+    def _combine(self, n, mean, m2, mn, mx) -> None:
+        total = self.n + n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            w = np.where(total > 0, n / total, 0.0)
+            self.mean = self.mean + delta * w
+            self.m2   = self.m2 + m2 + delta * delta * self.n * w
+        self.n   = total
+        self.min = np.fmin(self.min, mn)
+        self.max = np.fmax(self.max, mx)
+
+    def add(self, batch: np.ndarray) -> None:
+        """Add k observations stacked along axis 0: shape (k,) + shape."""
+        batch = np.asarray(batch, dtype=float)
+        mean = batch.mean(axis=0)
+        self._combine(len(batch), mean, ((batch - mean) ** 2).sum(axis=0),
+                      batch.min(axis=0), batch.max(axis=0))
+
+    def add_moments(self, n, mean, std) -> None:
+        """
+        Add pre-reduced (count, mean, population std) arrays.  Min/max only
+        see the batch mean, so they are exact for one observation per update.
+        """
+        n = np.asarray(n, dtype=float)
+        ok = n > 0
+        self._combine(n, np.where(ok, mean, 0.0), np.where(ok, std * std * n, 0.0),
+                      np.where(ok, mean, np.inf), np.where(ok, mean, -np.inf))
+
+    def merge(self, other: "Welford") -> None:
+        self._combine(other.n, other.mean, other.m2, other.min, other.max)
+
+    @property
+    def var(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.m2 / self.n
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.var)
+
+    def state(self, prefix: str) -> dict:
+        return {f"{prefix}_{k}": getattr(self, k) for k in ("n", "mean", "m2", "min", "max")}
+
+    @classmethod
+    def from_state(cls, data, prefix: str) -> "Welford":
+        w = cls(data[f"{prefix}_n"].shape)
+        for k in ("n", "mean", "m2", "min", "max"):
+            setattr(w, k, np.array(data[f"{prefix}_{k}"]))
+        return w
+
+
+class RunStats:
+    """
+    Accumulate (4, n) volt captures.  `channels` are 0-based indices (CH1 = 0).
+    update() is thread-safe, so it can be called from pipeline workers.
+    """
+
+    def __init__(self, n_samples: int, fs: float, channels=(0, 1, 2, 3),
+                 hysteresis: float = 0.1):
+        self.n_samples  = n_samples
+        self.fs         = fs
+        self.channels   = list(channels)
+        self.hysteresis = hysteresis
+        self.trace      = Welford((len(self.channels), n_samples))
+        self.reference  = {}        # ch -> EDGE_DTYPE edges of the first capture
+        self.edge_stats = {}        # ch -> Welford over reference edges
+        self._lock      = threading.Lock()
+
+    @property
+    def runs(self) -> int:
+        return int(self.trace.n.flat[0]) if self.trace.n.size else 0
+
+    def update(self, volts: np.ndarray) -> None:
+        """Add one (4, n) capture, or several as (k, 4, n)."""
+        volts = np.asarray(volts, dtype=float)
+        if volts.ndim == 2:
+            volts = volts[None]
+        sel = volts[:, self.channels]
+        with self._lock:
+            self.trace.add(sel)
+            for i, ch in enumerate(self.channels):
+                self._update_edges(ch, sel[:, i])
+
+    def update_codes(self, codes: np.ndarray, scale, offset) -> None:
+        """Add one raw (4, n) code capture with its per-channel scale/offset."""
+        scale, offset = np.asarray(scale), np.asarray(offset)
+        self.update((codes - offset[:, None]) * scale[:, None])
+
+    def _update_edges(self, ch: int, runs: np.ndarray) -> None:
+        edges = find_edges(runs, self.fs, self.hysteresis)
+        if ch not in self.reference:
+            first = edges[edges["run"] == 0]
+            if len(first) == 0:
+                return
+            # same order as align_edges' jitter table: rising, then falling
+            first = np.concatenate([first[first["kind"] == RISING],
+                                    first[first["kind"] == FALLING]])
+            self.reference[ch]  = first
+            self.edge_stats[ch] = Welford(len(first))
+        jt = align_edges(edges, len(runs), reference=self.reference[ch])["jitter"]
+        self.edge_stats[ch].add_moments(jt["count"], jt["mean"], jt["std"])
+
+    def merge(self, other: "RunStats") -> None:
+        """
+        Fold in another worker's accumulator (same settings).  Its edges are
+        mapped onto ours by nearest reference time; edges with no
+        counterpart in our reference are dropped.
+        """
+        with self._lock:
+            self.trace.merge(other.trace)
+            for ch, ws in other.edge_stats.items():
+                if ch not in self.edge_stats:
+                    self.reference[ch]  = other.reference[ch]
+                    self.edge_stats[ch] = ws
+                    continue
+                m = _map_reference(self.reference[ch], other.reference[ch])
+                sel, k = m >= 0, len(self.reference[ch])
+                n, mean, m2 = np.zeros(k), np.zeros(k), np.zeros(k)
+                mn, mx = np.full(k, np.inf), np.full(k, -np.inf)
+                n[m[sel]], mean[m[sel]], m2[m[sel]] = ws.n[sel], ws.mean[sel], ws.m2[sel]
+                mn[m[sel]], mx[m[sel]] = ws.min[sel], ws.max[sel]
+                self.edge_stats[ch]._combine(n, mean, m2, mn, mx)
+
+    # ── checkpoint ────────────────────────────────────────────────────────────
+    def save(self, path: str) -> None:
+        meta = {"n_samples": self.n_samples, "fs": self.fs,
+                "channels": self.channels, "hysteresis": self.hysteresis,
+                "edge_channels": sorted(self.edge_stats)}
+        with self._lock:
+            data = self.trace.state("trace")
+            for ch, ws in self.edge_stats.items():
+                data.update(ws.state(f"edge{ch}"))
+                data[f"edge{ch}_ref"] = self.reference[ch]
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, meta=json.dumps(meta), **data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RunStats":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            rs = cls(meta["n_samples"], meta["fs"], meta["channels"],
+                     meta["hysteresis"])
+            rs.trace = Welford.from_state(data, "trace")
+            for ch in meta["edge_channels"]:
+                rs.edge_stats[ch] = Welford.from_state(data, f"edge{ch}")
+                rs.reference[ch]  = np.array(data[f"edge{ch}_ref"], dtype=EDGE_DTYPE)
+        return rs
+
+    # ── results ───────────────────────────────────────────────────────────────
+    def summary(self) -> dict:
+        out = {"runs": self.runs}
+        for i, ch in enumerate(self.channels):
+            d = {"mean": self.trace.mean[i], "std": self.trace.std[i],
+                 "min": self.trace.min[i], "max": self.trace.max[i]}
+            if ch in self.edge_stats:
+                ws, ref = self.edge_stats[ch], self.reference[ch]
+                d["edges"] = {"kind": ref["kind"], "mean": ws.mean,
+                              "std": ws.std, "count": ws.n}
+            out[f"CH{ch + 1}"] = d
+        return out
+
+
+def _map_reference(dst: np.ndarray, src: np.ndarray) -> np.ndarray:
+    """Index into `dst` of the nearest same-kind edge for each `src` edge, or -1."""
+    times = np.sort(dst["time"])
+    tol = 0.5 * np.diff(times).min() if len(times) > 1 else np.inf
+    out = np.full(len(src), -1)
+    for kind in (RISING, FALLING):
+        d = np.flatnonzero(dst["kind"] == kind)
+        s = np.flatnonzero(src["kind"] == kind)
+        m = match_nearest(src["time"][s], dst["time"][d], tol)
+        out[s] = np.where(m >= 0, d[np.maximum(m, 0)], -1)
+    return out
+
+
+# ── REPLAY ─────────────────────────────────────────────────────────────────────
+def load_volts(path: str) -> tuple:
+    """(fs, (4, n) volts) from an .htcap or tab-separated run file."""
+    if path.endswith(".htcap"):
+        from capfile import read_capture
+        cap = read_capture(path)
+        return cap.sample_rate, np.stack([cap.volts(ch) for ch in range(4)])
+    table = np.loadtxt(path, delimiter="\t", skiprows=1)
+    return 1.0 / (table[1, 0] - table[0, 0]), table[:, 1:].T
+
+
+def replay(paths, stats: RunStats = None, channels=(0, 1, 2, 3)) -> RunStats:
+    """Feed run files through a RunStats one at a time."""
+    for path in paths:
+        fs, volts = load_volts(path)
+        if stats is None:
+            stats = RunStats(volts.shape[1], fs, channels)
+        stats.update(volts)
+    return stats
+
+
+def run_files(folder: str) -> list:
+    """Run files in `folder`, preferring .htcap over .txt for the same run."""
+    names = sorted(os.listdir(folder))
+    stems = {os.path.splitext(n)[0] for n in names if n.endswith(".htcap")}
+    return [os.path.join(folder, n) for n in names
+            if n.endswith(".htcap")
+            or (n.endswith(".txt") and os.path.splitext(n)[0] not in stems)]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    stats = replay(run_files(sys.argv[1]), channels=(0, 3))
+    for ch, d in stats.summary().items():
+        if ch == "runs":
+            print(f"{d} runs")
+            continue
+        print(f"{ch}: mean σ(V) = {np.nanmean(d['std']):.4f}")
+        if "edges" in d:
+            for k, m, s in zip(d["edges"]["kind"], d["edges"]["mean"], d["edges"]["std"]):
+                print(f"  {'rise' if k > 0 else 'fall'} @ {m * 1e6:8.2f} µs  σ = {s * 1e6:5.2f} µs")
+    if len(sys.argv) > 2:
+        stats.save(sys.argv[2])
@@ -0,0 +1,139 @@
+"""
+Scope configuration as a list of driver calls, applied incrementally.
+
+config_calls() turns a (RelayControl, DataControl) pair into the
+configure_scope sequence: sample rate, channel/trigger, RAM/trigger
+control, four channel positions, trigger level and trigger mode.  Each call
+carries a fingerprint, the settings it actually sends:
+
+    dsoHTSetSampleRate          timebase, channel enables, nCHSet, buffer
+                                length, horizontal trigger position, YT format
+    dsoHTSetCHAndTrigger        every RelayControl field + timebase
+    dsoHTSetRamAndTrigerControl timebase, nCHSet, trigger source
+    dsoHTSetCHPos (×4)          that channel's volts/div, zero position, ADC mode
+    dsoHTSetVTriggerLevel       nVTriggerPos
+    dsoHTSetTrigerMode          nTriggerSlope
+
+ScopeState remembers the fingerprint last applied per call and apply()
+only makes the calls whose fingerprint changed, in the original order.
+sweep() walks a TIME_PER_DIVISION × VOLTS_PER_DIVISION grid (snake order,
+so consecutive points differ in one axis) applying only the deltas.
+
+Usage (sweep on the instrumented simulator):
+    python scopestate.py
+"""
+
+from ctypes import byref
+
+
+def config_calls(rc, dc, zero_pos, ch_mode: int = 1,
+                 yt_format: int = 0) -> list:
+    """[(key, function name, args after idx, fingerprint)] in configure order."""
+    rc_fields = (tuple(rc.bCHEnable), tuple(rc.nCHVoltDIV), tuple(rc.nCHCoupling),
+                 tuple(rc.bCHBWLimit), rc.nTrigSource, rc.bTrigFilt, rc.nALT)
+    calls = [
+        ("sample_rate", "dsoHTSetSampleRate", (yt_format, byref(rc), byref(dc)),
+         (yt_format, dc.nTimeDIV, tuple(rc.bCHEnable), dc.nCHSet,
+          dc.nBufferLen, dc.nHTriggerPos)),
+        ("ch_trigger", "dsoHTSetCHAndTrigger", (byref(rc), dc.nTimeDIV),
+         rc_fields + (dc.nTimeDIV,)),
+        ("ram_trigger", "dsoHTSetRamAndTrigerControl",
+         (dc.nTimeDIV, dc.nCHSet, dc.nTriggerSource, 0),
+         (dc.nTimeDIV, dc.nCHSet, dc.nTriggerSource)),
+    ]
+    for ch in range(4):
+        args = (rc.nCHVoltDIV[ch], zero_pos[ch], ch, ch_mode)
+        calls.append((f"ch_pos{ch}", "dsoHTSetCHPos", args, args))
+    calls += [
+        ("v_trigger", "dsoHTSetVTriggerLevel", (dc.nVTriggerPos, 4), (dc.nVTriggerPos,)),
+        ("trig_mode", "dsoHTSetTrigerMode", (0, dc.nTriggerSlope, 0), (dc.nTriggerSlope,)),
+    ]
+    return calls
+
+
+class ScopeState:
+    """Last applied configuration of one device, for delta reconfiguration."""
+
+    def __init__(self, scope, idx: int, zero_pos, ch_mode: int = 1,
+                 yt_format: int = 0):
+        self.scope     = scope
+        self.idx       = idx
+        self.zero_pos  = list(zero_pos)
+        self.ch_mode   = ch_mode
+        self.yt_format = yt_format
+        self.applied   = {}         # call key -> fingerprint
+        self.calls_made  = 0
+        self.calls_saved = 0
+        self.applies     = 0
+
+    def plan(self, rc, dc) -> list:
+        """The config_calls() entries apply() would make right now."""
+        return [c for c in config_calls(rc, dc, self.zero_pos, self.ch_mode, self.yt_format)
+                if self.applied.get(c[0]) != c[3]]
+
+    def apply(self, rc, dc, force: bool = False) -> list:
+        """Make the calls whose settings changed (all with `force`); returns their keys."""
+        calls = config_calls(rc, dc, self.zero_pos, self.ch_mode, self.yt_format)
+        done = []
+        for key, name, args, fp in calls:
+            if not force and self.applied.get(key) == fp:
+                continue
+            getattr(self.scope, name)(self.idx, *args)
+            self.applied[key] = fp
+            done.append(key)
+        self.applies     += 1
+        self.calls_made  += len(done)
+        self.calls_saved += len(calls) - len(done)
+        return done
+
+    def invalidate(self) -> None:
+        """Forget what was applied, e.g. after dsoInitHard or a USB reconnect."""
+        self.applied.clear()
+
+    def sweep(self, rc, dc, time_divs, volt_divs, snake: bool = True):
+        """
+        Apply every (time_div, volt_div) point and yield it once the scope is
+        configured.  `rc`/`dc` are updated in place (all four channels get
+        the volts/div); with `snake` the volts axis reverses on alternate
+        timebases so each step changes a single setting.
+        """
+        volt_divs = list(volt_divs)
+        for i, tdiv in enumerate(time_divs):
+            order = volt_divs[::-1] if snake and i % 2 else volt_divs
+            for vdiv in order:
+                dc.nTimeDIV = tdiv
+                for ch in range(4):
+                    rc.nCHVoltDIV[ch] = vdiv
+                self.apply(rc, dc)
+                yield tdiv, vdiv
+
+    def counters(self) -> dict:
+        total = self.calls_made + self.calls_saved
+        return {
+            "applies":     self.applies,
+            "calls_made":  self.calls_made,
+            "calls_saved": self.calls_saved,
+            "saved":       self.calls_saved / total if total else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    import getData
+    from driver import load_driver
+    from pipeline import CapturePipeline
+
+    scope = load_driver("sim", instrument=True)
+    rc, dc = getData.build_controls()
+    getData.initialize_device(0, scope)
+    state = ScopeState(scope, 0, getData.CH_ZERO_POS)
+    state.apply(rc, dc)
+
+    records = 0
+    for tdiv, vdiv in state.sweep(rc, dc, range(11, 17), range(6, 10)):
+        pipe = CapturePipeline(scope, 0, dc, lambda run, codes: None)
+        records += pipe.run(2)["runs"]
+    c = state.counters()
+    print(f"{c['applies']} configurations, {records} records: {c['calls_made']} "
+          f"config calls made, {c['calls_saved']} skipped ({c['saved']:.0%})")
+    funcs = scope.snapshot()["functions"]
+    print({k: v["calls"] for k, v in funcs.items() if k.startswith("dsoHTSet")})
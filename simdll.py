@@ -0,0 +1,362 @@
+"""
+Pure-Python stand-in for HTHardDll so the capture code can run without a scope.
+
+SimDll exposes the same entry points as the DLL (see driver.SIGNATURES),
+takes the same ctypes arguments (structs by reference, buffers as arrays or
+byref) and keeps per-device state from the configuration calls:
+
+    timebase / buffer length / ADC mode  → sample rate and record duration
+    volts/div and zero position          → volts-to-code conversion
+    trigger source                       → how long a trigger takes to arrive
+    DDS wave/frequency/amplitude/offset  → the "dds" loopback waveform
+
+Timing model for one block capture (all delays × `time_scale`):
+    armed → pre-trigger fill + trigger_latency + U(0, trigger period)
+          → post-trigger fill → dsoHTGetState reports ready (bit 1)
+    dsoHTGetData sleeps transfer_overhead
+                      + samples × enabled channels (nCHSet) × transfer_per_sample
+The trigger period is the repetition period of the trigger channel's
+waveform (I2C frame, square period), so the latency spread is realistic.
+
+Waveforms are given per channel by name or as a callable f(t, ch) → volts:
+    "i2c_scl"/"i2c_sda" – bursts of START, address+data bytes with ACKs, STOP
+    "square"            – 0 V / `level` square wave at `freq`
+    "noise"             – Gaussian noise only
+    "dds"               – the signal the simulated DDS is generating
+    "flat"              – 0 V
+Every channel gets `noise` V of Gaussian noise on top.  Captures are placed
+so the trigger (I2C START, square rising edge) sits at nHTriggerPos percent
+of the record, jittered by up to one sample.
+
+Starting with the roll bit (start control & 2) switches a device to roll
+mode: it then samples a ramp (code = absolute sample index % 256) at
+`roll_rate` into an nBufferLen ring, and every dsoHTGetData call copies the
+ring out and updates nAlreadyReadLen / nLastAddress (see streaming.py).
+With roll_waveforms=True the ring holds the channel waveforms sampled at
+absolute time index / roll_rate instead, so streams are continuous signals.
+"""
+
+import threading
+import time
+import numpy as np
+
+from convert import channel_scale
+from driver import SAMPLING_RATE_DUAL, SAMPLING_RATE_QUAD, SAMPLING_RATE_SINGLE, VOLT_MULT
+
+_RATES = {1: SAMPLING_RATE_SINGLE, 2: SAMPLING_RATE_DUAL, 4: SAMPLING_RATE_QUAD}
+
+
+def _deref(arg):
+    """Return the ctypes object behind byref(obj), or `arg` itself."""
+    return getattr(arg, "_obj", arg)
+
+
+class _Export:
+    """Callable that accepts `argtypes`/`restype` like a ctypes function."""
+
+    def __init__(self, fn):
+        self._fn      = fn
+        self.argtypes = None
+        self.restype  = None
+        self.__name__ = fn.__name__
+
+    def __call__(self, *args):
+        return self._fn(*args)
+
+
+# ── WAVEFORMS ──────────────────────────────────────────────────────────────────
+def i2c_frame(data=(0xA0, 0x5A, 0x3C), gap_bits: int = 12) -> tuple:
+    """
+    (scl, sda) levels per quarter bit for one I2C burst: START, every byte
+    in `data` followed by an ACK (SDA low), STOP, then `gap_bits` idle bits.
+    The START's SDA falling edge is at quarter 1.
+    """
+    scl, sda = [1, 1, 1, 0], [1, 0, 0, 0]
+    for byte in data:
+        for b in [(byte >> (7 - i)) & 1 for i in range(8)] + [0]:
+            scl += [0, 1, 1, 0]
+            sda += [b] * 4
+    scl += [0, 1, 1, 1] + [1] * 4 * gap_bits
+    sda += [0, 0, 1, 1] + [1] * 4 * gap_bits
+    return np.array(scl, dtype=np.uint8), np.array(sda, dtype=np.uint8)
+
+
+class _Device:
+    """Configuration and acquisition state of one simulated scope."""
+
+    def __init__(self, seed: int):
+        self.time_div   = 14
+        self.buffer_len = 4096
+        self.h_pos      = 50
+        self.ch_mode    = 1
+        self.trig_src   = 0
+        self.ch_set     = 0x0F
+        self.volt_div   = [8] * 4
+        self.zero_pos   = [128] * 4
+        self.ready_at   = None
+        self.trig_at    = None
+        self.roll_start = None
+        self.rng        = np.random.default_rng(seed)
+        self.dds        = {"on": 0, "mode": 0, "wave": 0, "freq": 1e3,
+                           "amp": 1000, "offset": 0}
+
+    @property
+    def sample_rate(self) -> float:
+        return _RATES.get(self.ch_mode, SAMPLING_RATE_QUAD)[self.time_div]
+
+
+class SimDll:
+    def __init__(self, n_devices: int = 1, waveforms=None,
+                 trigger_latency: float = 0.002, record_time: float = None,
+                 transfer_per_sample: float = 2.5e-8,
+                 transfer_overhead: float = 1e-4, noise: float = 0.01,
+                 level: float = 3.3, freq: float = 10e3,
+                 i2c_rate: float = 400e3, i2c_data=(0xA0, 0x5A, 0x3C),
+                 i2c_gap: int = 12,
+                 roll_rate: float = 250.0, roll_waveforms: bool = False,
+                 time_scale: float = 1.0,
+                 seed: int = 0):
+        """
+        `record_time` overrides the record duration derived from the
+        timebase; `time_scale` multiplies every simulated delay (0 = none).
+        `i2c_gap` is the idle time between I2C bursts in bit periods.
+        """
+        self.n_devices           = n_devices
+        self.waveforms           = list(waveforms or ("i2c_scl", "square", "noise", "i2c_sda"))
+        self.trigger_latency     = trigger_latency
+        self.record_time         = record_time
+        self.transfer_per_sample = transfer_per_sample
+        self.transfer_overhead   = transfer_overhead
+        self.noise               = noise
+        self.level               = level
+        self.freq                = freq
+        self.i2c_rate            = i2c_rate
+        self.roll_rate           = roll_rate
+        self.roll_waveforms      = roll_waveforms
+        self.time_scale          = time_scale
+        self._scl, self._sda     = i2c_frame(i2c_data, i2c_gap)
+        self._devices            = {i: _Device(seed + i) for i in range(n_devices)}
+        self._lock               = threading.Lock()
+        for name in dir(self):
+            if name.startswith(("dso", "dds")):
+                setattr(self, name, _Export(getattr(self, name)))
+
+    def _dev(self, idx) -> _Device:
+        idx = int(getattr(idx, "value", idx))
+        with self._lock:
+            if idx not in self._devices:
+                self._devices[idx] = _Device(idx)
+            return self._devices[idx]
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    # ── device ────────────────────────────────────────────────────────────────
+    def dsoHTSearchDevice(self, devices) -> int:
+        devices = _deref(devices)
+        for i in range(self.n_devices):
+            devices[i] = 1
+        return self.n_devices
+
+    def dsoInitHard(self, idx) -> int:
+        self._dev(idx)
+        return 1
+
+    # ── configuration ─────────────────────────────────────────────────────────
+    def dsoHTADCCHModGain(self, idx, gain) -> int:
+        return 1
+
+    def dsoHTSetSampleRate(self, idx, yt_format, rc, dc) -> int:
+        d, dc = self._dev(idx), _deref(dc)
+        d.time_div, d.buffer_len, d.h_pos = dc.nTimeDIV, dc.nBufferLen, dc.nHTriggerPos
+        return 1
+
+    def dsoHTSetCHAndTrigger(self, idx, rc, time_div) -> int:
+        d, rc = self._dev(idx), _deref(rc)
+        d.volt_div = list(rc.nCHVoltDIV)
+        d.trig_src = rc.nTrigSource
+        d.time_div = time_div
+        return 1
+
+    def dsoHTSetRamAndTrigerControl(self, idx, time_div, ch_set, source, peak) -> int:
+        d = self._dev(idx)
+        d.time_div, d.trig_src, d.ch_set = time_div, source, ch_set
+        return 1
+
+    def dsoHTSetCHPos(self, idx, volt_div, pos, ch, ch_mode) -> int:
+        d = self._dev(idx)
+        d.volt_div[ch], d.zero_pos[ch], d.ch_mode = volt_div, pos, ch_mode
+        return 1
+
+    def dsoHTSetVTriggerLevel(self, idx, pos, sensitivity) -> int:
+        return 1
+
+    def dsoHTSetTrigerMode(self, idx, mode, slope, couple) -> int:
+        return 1
+
+    # ── DDS (signal generator) ────────────────────────────────────────────────
+    def ddsSetCmd(self, idx, mode) -> int:
+        self._dev(idx).dds["mode"] = mode
+        return 1
+
+    def ddsSDKSetWaveType(self, idx, wave) -> int:
+        self._dev(idx).dds["wave"] = wave
+        return wave
+
+    def ddsSDKSetFre(self, idx, freq) -> float:
+        self._dev(idx).dds["freq"] = float(freq)
+        return float(freq)
+
+    def ddsSDKSetAmp(self, idx, amp) -> int:
+        self._dev(idx).dds["amp"] = amp
+        return amp
+
+    def ddsSDKSetOffset(self, idx, offset) -> int:
+        self._dev(idx).dds["offset"] = offset
+        return offset
+
+    def ddsSetOnOff(self, idx, on) -> int:
+        self._dev(idx).dds["on"] = on
+        return 1
+
+    # ── waveform model ────────────────────────────────────────────────────────
+    def _period(self, spec) -> float:
+        """Repetition period of a waveform (0 if it has none)."""
+        if spec in ("i2c_scl", "i2c_sda"):
+            return len(self._scl) / (4 * self.i2c_rate)
+        if spec == "square":
+            return 1.0 / self.freq
+        return 0.0
+
+    def _volts(self, spec, t: np.ndarray, ch: int, d: _Device) -> np.ndarray:
+        if callable(spec):
+            return np.asarray(spec(t, ch), dtype=float)
+        if spec in ("i2c_scl", "i2c_sda"):
+            # t = 0 is the START's SDA fall (quarter 1 of the frame)
+            q = np.floor(t * 4 * self.i2c_rate).astype(np.int64) + 1
+            table = self._scl if spec == "i2c_scl" else self._sda
+            return table[q % len(table)] * self.level
+        if spec == "square":
+            return np.where((t * self.freq) % 1.0 < 0.5, self.level, 0.0)
+        if spec == "dds":
+            return self._dds_volts(t, d)
+        if spec in ("noise", "flat"):
+            return np.zeros_like(t)
+        raise ValueError(f"unknown waveform {spec!r}")
+
+    def _dds_volts(self, t: np.ndarray, d: _Device) -> np.ndarray:
+        g = d.dds
+        if not g["on"]:
+            return np.zeros_like(t)
+        amp, off, phase = g["amp"] / 1000, g["offset"] / 1000, (t * g["freq"]) % 1.0
+        wave = g["wave"]
+        if wave == 0:
+            y = np.sin(2 * np.pi * phase)
+        elif wave == 1:
+            y = 2 * phase - 1
+        elif wave == 2:
+            y = np.where(phase < 0.5, 1.0, -1.0)
+        elif wave == 8:
+            y = d.rng.uniform(-1, 1, t.shape)
+        else:
+            y = np.zeros_like(t)
+        return off + amp * y
+
+    def _codes(self, d: _Device, t: np.ndarray) -> np.ndarray:
+        """(4, len(t)) codes of every channel's waveform (plus noise) at times `t`."""
+        scale, offset = channel_scale([VOLT_MULT[v] for v in d.volt_div], d.zero_pos)
+        out = np.empty((4, len(t)), dtype=np.uint16)
+        for ch, spec in enumerate(self.waveforms):
+            v = self._volts(spec, t, ch, d)
+            if self.noise:
+                v = v + d.rng.normal(0, self.noise, len(t))
+            out[ch] = np.clip(np.rint(v / scale[ch] + offset[ch]), 0, 255)
+        return out
+
+    def _capture(self, d: _Device, n: int) -> np.ndarray:
+        """(4, n) codes of one triggered record."""
+        pre = d.h_pos * n // 100
+        return self._codes(d, (np.arange(n) - pre + d.rng.uniform(0, 1)) / d.sample_rate)
+
+    # ── acquisition ───────────────────────────────────────────────────────────
+    def dsoHTStartCollectData(self, idx, start_control) -> int:
+        d, now = self._dev(idx), time.perf_counter()
+        if start_control & 2:
+            d.roll_start = now
+            return 1
+        d.roll_start = None
+        record = (self.record_time if self.record_time is not None
+                  else d.buffer_len / d.sample_rate)
+        wait = (record * d.h_pos / 100 + self.trigger_latency
+                + d.rng.uniform(0, self._period(self.waveforms[d.trig_src % 4])))
+        k = self.time_scale
+        d.trig_at  = now + wait * k
+        d.ready_at = now + (wait + record * (100 - d.h_pos) / 100) * k
+        return 1
+
+    def dsoHTGetState(self, idx) -> int:
+        d, now = self._dev(idx), time.perf_counter()
+        if d.ready_at is None:
+            return 0
+        return (1 if now >= d.trig_at else 0) | (2 if now >= d.ready_at else 0)
+
+    def dsoHTGetData(self, idx, ch1, ch2, ch3, ch4, dc) -> int:
+        d, dc = self._dev(idx), _deref(dc)
+        bufs = (ch1, ch2, ch3, ch4)
+        if d.roll_start is not None:
+            return self._get_roll_data(d, bufs, dc)
+        n = dc.nReadDataLen
+        codes = self._capture(d, n)
+        n_ch  = bin(d.ch_set & 0x0F).count("1")
+        self._sleep(self.transfer_overhead + n * n_ch * self.transfer_per_sample)
+        for ch, buf in enumerate(bufs):
+            np.frombuffer(_deref(buf), dtype=np.uint16)[:n] = codes[ch]
+        d.ready_at = d.trig_at = None
+        return 1
+
+    def _get_roll_data(self, d: _Device, bufs, dc) -> int:
+        n = dc.nBufferLen
+        total = int((time.perf_counter() - d.roll_start) * self.roll_rate)
+        self._sleep(self.transfer_overhead + n * 4 * self.transfer_per_sample)
+        # ring slot j holds the newest absolute sample k < total with k % n == j
+        slots = np.arange(n)
+        k = total - n + (slots - (total - n)) % n
+        if self.roll_waveforms:
+            data = self._codes(d, np.maximum(k, 0) / self.roll_rate)
+        else:
+            data = np.broadcast_to(np.where(k >= 0, k % 256, 0), (4, n))
+        for ch, buf in enumerate(bufs):
+            np.frombuffer(_deref(buf), dtype=np.uint16)[:n] = data[ch]
+        dc.nAlreadyReadLen = total & 0xFFFFFFFF
+        dc.nLastAddress    = total % n
+        return 1
+
+
+
+if __name__ == "__main__":
+    from ctypes import byref
+    from convert import alloc_raw, channel_view
+    from edges import find_edges
+    import getData
+
+    sim = SimDll(waveforms=("i2c_scl", "square", "dds", "i2c_sda"))
+    rc, dc = getData.build_controls()
+    getData.initialize_device(0, sim)
+    getData.configure_scope(0, rc, dc, sim)
+    sim.ddsSDKSetFre(0, 20e3)
+    sim.ddsSetOnOff(0, 1)
+    _, raw = alloc_raw(dc.nReadDataLen)
+
+    for run in range(5):
+        t0 = time.perf_counter()
+        sim.dsoHTStartCollectData(0, 1)
+        while not sim.dsoHTGetState(0) & 2:
+            time.sleep(50e-6)
+        t1 = time.perf_counter()
+        sim.dsoHTGetData(0, raw[0], raw[1], raw[2], raw[3], byref(dc))
+        t2 = time.perf_counter()
+        edges = find_edges(channel_view(raw), sim._dev(0).sample_rate)
+        counts = np.bincount(edges["run"], minlength=4)
+        print(f"run {run}: acquire {(t1 - t0) * 1e3:5.2f} ms  transfer "
+              f"{(t2 - t1) * 1e3:5.2f} ms  edges per channel {counts.tolist()}")
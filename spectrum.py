@@ -0,0 +1,325 @@
+"""
+Spectral analysis of batched captures: windowed FFTs, Welch PSD and
+THD / SNR / SINAD / SFDR / ENOB of a sine (e.g. the DDS output).
+
+Every function takes volts shaped (..., samples), typically
+(runs, channels, samples), and transforms the last axis in one FFT call.
+Windows (with their coherent gain and noise bandwidth) and frequency axes
+are cached per (window, length) and (length, sample rate), so repeated
+captures at one setting never rebuild them; sample_rate() maps a
+driver.TIME_MULT index to its SAMPLING_RATE_* entry.  scipy.fft is used
+when installed (multi-threaded, with its own plan cache), numpy.fft
+otherwise.
+
+    spectrum(x, fs)         one-sided amplitude spectrum (a sine of peak A
+                            reads A at its bin)
+    power_spectrum(x, fs)   V² per bin;  psd = power / (fs / n)
+    welch(x, fs, nperseg)   averaged PSD in V²/Hz over overlapping segments
+    sine_metrics(x, fs)     structured SINE_DTYPE array of the leading shape
+
+ArchiveSpectra streams an archive.py file one run at a time (so only one
+record is ever in memory), accumulating a Welch PSD per channel and the
+sine metrics of every run.
+
+Usage:
+    python spectrum.py --bench [samples]
+    python spectrum.py ARCHIVE.htarc [--channels 1 4] [--nperseg 65536]
+"""
+
+import argparse
+import functools
+import sys
+import time
+import numpy as np
+
+try:
+    import scipy.fft as _fft
+    _RFFT_KW = {"workers": -1}
+except ImportError:
+    _fft = np.fft
+    _RFFT_KW = {}
+
+SINE_DTYPE = np.dtype([("freq", "f8"), ("amplitude", "f8"), ("thd_db", "f8"),
+                       ("snr_db", "f8"), ("sinad_db", "f8"), ("sfdr_db", "f8"),
+                       ("enob", "f8")])
+
+# main-lobe half width in bins: what counts as "the tone" for each window
+_LOBE = {"rect": 1, "hann": 2, "blackmanharris": 4, "flattop": 5}
+_COSINE = {
+    "rect":           (1.0,),
+    "hann":           (0.5, 0.5),
+    "blackmanharris": (0.35875, 0.48829, 0.14128, 0.01168),
+    "flattop":        (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368),
+}
+
+
+def sample_rate(time_div: int, ch_mode: int = 1) -> float:
+    """Sample rate of a TIME_MULT index for 1, 2 or 4 active channels."""
+    from driver import SAMPLING_RATE_DUAL, SAMPLING_RATE_QUAD, SAMPLING_RATE_SINGLE
+
+    table = {1: SAMPLING_RATE_SINGLE, 2: SAMPLING_RATE_DUAL}.get(ch_mode, SAMPLING_RATE_QUAD)
+    return table[time_div]
+
+
+@functools.lru_cache(maxsize=32)
+def window(name: str, n: int) -> tuple:
+    """(w, coherent gain, ENBW in bins) of a periodic cosine-sum window; read-only."""
+    if name not in _COSINE:
+        raise ValueError(f"unknown window {name!r}; one of {sorted(_COSINE)}")
+    phase = 2 * np.pi * np.arange(n) / n
+    w = sum((-1) ** k * a * np.cos(k * phase) for k, a in enumerate(_COSINE[name]))
+    w = np.broadcast_to(w, (n,)).astype(np.float64)
+    w.flags.writeable = False
+    s1, s2 = w.sum(), (w * w).sum()
+    return w, s1 / n, n * s2 / (s1 * s1)
+
+
+@functools.lru_cache(maxsize=32)
+def frequencies(n: int, fs: float) -> np.ndarray:
+    """rfft bin frequencies for `n` samples at `fs`; read-only."""
+    f = np.fft.rfftfreq(n, 1.0 / fs)
+    f.flags.writeable = False
+    return f
+
+
+def _rfft(x: np.ndarray, win: str) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    w = window(win, x.shape[-1])[0]
+    return _fft.rfft((x - x.mean(axis=-1, keepdims=True)) * w, axis=-1, **_RFFT_KW)
+
+
+def spectrum(x, fs: float, win: str = "blackmanharris") -> tuple:
+    """(freqs, amplitude) with the mean removed; a sine of peak A shows as A."""
+    n = np.shape(x)[-1]
+    amp = np.abs(_rfft(x, win)) * (2.0 / (n * window(win, n)[1]))
+    return frequencies(n, fs), amp
+
+
+def power_spectrum(x, fs: float, win: str = "blackmanharris") -> tuple:
+    """(freqs, V² per bin) one-sided; summing a tone's lobe gives its power A²/2."""
+    n = np.shape(x)[-1]
+    w, cg, enbw = window(win, n)
+    p = np.abs(_rfft(x, win)) ** 2 * (2.0 / ((n * cg) ** 2 * enbw))
+    p[..., 0] /= 2
+    if n % 2 == 0:
+        p[..., -1] /= 2
+    return frequencies(n, fs), p
+
+
+def welch(x, fs: float, nperseg: int = 4096, overlap: float = 0.5,
+          win: str = "hann") -> tuple:
+    """
+    (freqs, PSD in V²/Hz) averaged over segments of `nperseg` samples
+    overlapping by `overlap`; segments are strided views, so every segment
+    of every leading index goes through one FFT call.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    nperseg = min(nperseg, n)
+    step = max(1, int(nperseg * (1 - overlap)))
+    seg = np.lib.stride_tricks.sliding_window_view(x, nperseg, axis=-1)[..., ::step, :]
+    _, p = power_spectrum(seg, fs, win)         # already noise power per bin
+    return frequencies(nperseg, fs), p.mean(axis=-2) / (fs / nperseg)
+
+
+def _fold(k: np.ndarray, n: int) -> np.ndarray:
+    """Alias (fractional) bin numbers of a real signal back into [0, n/2]."""
+    k = np.mod(k, n)
+    return np.where(k > n / 2, n - k, k)
+
+
+def sine_metrics(x, fs: float, fundamental: float = None, harmonics: int = 6,
+                 win: str = "blackmanharris") -> np.ndarray:
+    """
+    Sine-wave figures of merit for every leading index of `x` (volts,
+    (..., samples)), as a SINE_DTYPE array of the leading shape:
+        thd_db    harmonics 2..`harmonics` (aliased into band) vs the tone
+        snr_db    tone vs everything that is neither DC, tone nor harmonic
+        sinad_db  tone vs noise + distortion;  enob = (sinad - 1.76) / 6.02
+        sfdr_db   tone vs the largest other bin
+    The tone is the largest non-DC bin unless `fundamental` (Hz) is given;
+    a fundamental above Nyquist (fs / 2) is looked for at its alias, and
+    `freq` reports that alias.  The frequency is refined by the power
+    centroid of the tone's main lobe.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    lead, n = x.shape[:-1], x.shape[-1]
+    lobe = _LOBE[win]
+    if n // 2 + 1 <= 2 * lobe + 1:
+        raise ValueError(f"{n} samples give {n // 2 + 1} bins: too few to separate "
+                         f"DC, tone and noise with the {win} window's "
+                         f"{2 * lobe + 1}-bin main lobe")
+    _, p = power_spectrum(x.reshape(-1, n), fs, win)
+    rows, nb = p.shape
+    r = np.arange(rows)[:, None]
+    off = np.arange(-lobe, lobe + 1)
+
+    if fundamental is None:
+        k0 = np.argmax(p[:, lobe + 1:], axis=1) + lobe + 1
+    else:
+        k0 = np.full(rows, int(round(float(_fold(fundamental * n / fs, n)))))
+        if k0[0] <= lobe:
+            raise ValueError(f"fundamental {fundamental:g} Hz aliases to DC at "
+                             f"fs = {fs:g} Hz (Nyquist {fs / 2:g} Hz)")
+    around = np.clip(k0[:, None] + off, 0, nb - 1)
+    pw = p[r, around]
+    k_exact = (pw * around).sum(axis=1) / pw.sum(axis=1)
+
+    # bins belonging to DC, the tone and each harmonic's lobe
+    used = np.zeros(p.shape, dtype=bool)
+    used[:, :lobe + 1] = True
+    used[r, around] = True
+    tone = pw.sum(axis=1)
+    kh = np.rint(_fold(k_exact[:, None] * np.arange(2, harmonics + 1), n)).astype(np.int64)
+    hb = np.clip(kh[:, :, None] + off, 0, nb - 1)                   # (rows, h, lobe)
+    hmask = np.zeros(p.shape, dtype=bool)
+    hmask[r[:, :, None], hb] = True
+    hmask &= ~used                                                  # never count the tone twice
+    dist = (p * hmask).sum(axis=1)
+    noise = (p * ~(used | hmask)).sum(axis=1)
+    spur = np.where(used, 0.0, p).max(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.empty(rows, dtype=SINE_DTYPE)
+        out["freq"]      = k_exact * fs / n
+        out["amplitude"] = np.sqrt(2 * tone)
+        out["thd_db"]    = 10 * np.log10(dist / tone)
+        out["snr_db"]    = 10 * np.log10(tone / noise)
+        out["sinad_db"]  = 10 * np.log10(tone / (noise + dist))
+        # the spur is compared peak bin to peak bin
+        out["sfdr_db"]   = 10 * np.log10(p[np.arange(rows), k0] / spur)
+        out["enob"]      = (out["sinad_db"] - 1.76) / 6.02
+    return out.reshape(lead)
+
+
+# ── STREAMING OVER ARCHIVES ────────────────────────────────────────────────────
+class ArchiveSpectra:
+    """
+    Welch PSD and sine metrics over every run of an archive.py file, one
+    run in memory at a time.  Runs whose length or sample rate differ from
+    the first are skipped (counted in `skipped`).
+    """
+
+    def __init__(self, path: str, channels=(0,), nperseg: int = 65536,
+                 win: str = "hann", metrics_win: str = "blackmanharris", **metric_kwargs):
+        self.path          = path
+        self.channels      = list(channels)
+        self.nperseg       = nperseg
+        self.win           = win
+        self.metrics_win   = metrics_win
+        self.metric_kwargs = metric_kwargs
+        self.freqs         = None
+        self.psd_sum       = None
+        self.metrics       = []             # SINE_DTYPE (channels,) per run
+        self.runs          = 0
+        self.skipped       = 0
+
+    def run(self) -> dict:
+        from archive import ArchiveReader
+
+        shape = None
+        with ArchiveReader(self.path) as r:
+            for run, info in enumerate(r.runs):
+                key = (info["samples"], info["sample_rate"])
+                if shape is None:
+                    shape = key
+                elif key != shape:
+                    self.skipped += 1
+                    continue
+                v = np.stack([r.volts(run, ch) for ch in self.channels])
+                f, psd = welch(v, info["sample_rate"], self.nperseg, win=self.win)
+                self.freqs = f
+                self.psd_sum = psd if self.psd_sum is None else self.psd_sum + psd
+                self.metrics.append(sine_metrics(v, info["sample_rate"], win=self.metrics_win,
+                                                 **self.metric_kwargs))
+                self.runs += 1
+        return self.result()
+
+    def result(self) -> dict:
+        return {
+            "freqs":   self.freqs,
+            "psd":     None if self.psd_sum is None else self.psd_sum / self.runs,
+            "metrics": np.stack(self.metrics) if self.metrics else
+                       np.empty((0, len(self.channels)), SINE_DTYPE),
+            "runs":    self.runs,
+            "skipped": self.skipped,
+        }
+
+
+def print_metrics(m: np.ndarray, labels) -> None:
+    """One line per channel: mean ± std of each figure over runs (m is (runs, channels))."""
+    for j, label in enumerate(labels):
+        col = m[:, j]
+        parts = [f"{col['freq'].mean():10.1f} Hz", f"{col['amplitude'].mean():6.3f} V"]
+        for name in ("thd_db", "snr_db", "sinad_db", "sfdr_db"):
+            parts.append(f"{name[:-3].upper()} {col[name].mean():6.1f}±{col[name].std():.1f} dB")
+        parts.append(f"ENOB {col['enob'].mean():5.2f}")
+        print(f"{label}: " + "  ".join(parts))
+
+
+# ── BENCHMARK ──────────────────────────────────────────────────────────────────
+def _synthetic(shape, n: int, fs: float, f0: float = 17e3, rng=None) -> np.ndarray:
+    """8-bit-quantised sines (1 V peak, -50/-60 dBc 2nd/3rd harmonics, noise)."""
+    rng = rng or np.random.default_rng(0)
+    t = np.arange(n) / fs
+    x = (np.sin(2 * np.pi * f0 * t) + 10 ** (-50 / 20) * np.sin(4 * np.pi * f0 * t)
+         + 10 ** (-60 / 20) * np.sin(6 * np.pi * f0 * t))
+    x = np.broadcast_to(x, tuple(shape) + (n,)) + rng.normal(0, 2e-3, tuple(shape) + (n,))
+    lsb = 8.0 / 256                     # 1 V/div × 8 div over 256 codes
+    return np.round(x / lsb) * lsb
+
+
+def benchmark(n: int = 1 << 20, runs: int = 4, channels: int = 2, fs: float = 2.5e6) -> None:
+    x = _synthetic((runs, channels), n, fs)
+    print(f"{runs} runs × {channels} channels × {n} samples @ {fs / 1e6:g} MS/s "
+          f"({_fft.__name__})")
+
+    # per-record loop, window rebuilt each time (what a naive script does)
+    t0 = time.perf_counter()
+    for r in range(runs):
+        for c in range(channels):
+            w = np.blackman(n)
+            np.abs(np.fft.rfft((x[r, c] - x[r, c].mean()) * w))
+            np.fft.rfftfreq(n, 1 / fs)
+    loop = time.perf_counter() - t0
+
+    spectrum(x[:1, :1, :], fs)                  # warm the window/frequency caches
+    t0 = time.perf_counter()
+    f, a = spectrum(x, fs)
+    batched = time.perf_counter() - t0
+    print(f"  spectrum: per-record loop {loop * 1e3:7.0f} ms, "
+          f"batched + cached {batched * 1e3:7.0f} ms")
+
+    t0 = time.perf_counter()
+    fw, psd = welch(x, fs, nperseg=65536)
+    print(f"  welch (65536/50%): {(time.perf_counter() - t0) * 1e3:7.0f} ms "
+          f"→ {psd.shape}, noise floor {10 * np.log10(np.median(psd)):.1f} dBV²/Hz")
+
+    t0 = time.perf_counter()
+    m = sine_metrics(x, fs)
+    print(f"  sine_metrics: {(time.perf_counter() - t0) * 1e3:7.0f} ms")
+    print_metrics(m, [f"CH{c + 1}" for c in range(channels)])
+    print(f"  (expected THD ≈ -49.6 dB; 8-bit quantisation limits ENOB to < 8)")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("archive", nargs="?")
+    ap.add_argument("--channels", type=int, nargs="+", default=[1])
+    ap.add_argument("--nperseg", type=int, default=65536)
+    ap.add_argument("--bench", type=int, nargs="?", const=1 << 20)
+    args = ap.parse_args(argv)
+
+    if args.bench or not args.archive:
+        benchmark(args.bench or 1 << 20)
+        return 0
+    t0 = time.perf_counter()
+    spec = ArchiveSpectra(args.archive, [c - 1 for c in args.channels], args.nperseg)
+    res = spec.run()
+    print(f"{res['runs']} runs ({res['skipped']} skipped) in {time.perf_counter() - t0:.2f} s")
+    print_metrics(res["metrics"], [f"CH{c}" for c in args.channels])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Continuous scan/roll acquisition.
+
+In roll mode (YTFormat != 0, start-control bit 2) the scope keeps sampling
+into its nBufferLen-sample hardware ring.  Each dsoHTGetData call copies that
+ring out and updates the DataControl bookkeeping fields:
+
+    nAlreadyReadLen – total samples acquired since the start (32-bit, wraps)
+    nLastAddress    – ring index one past the newest sample
+
+RollStream turns successive reads into contiguous chunks of new samples.
+When more than a full ring was acquired between two reads the oldest samples
+were overwritten before we saw them: that is an overrun, and the lost range
+is recorded as a Gap so downstream code knows the stream is discontinuous.
+
+Usage (simulated driver):
+    python streaming.py
+"""
+
+import asyncio
+import time
+from ctypes import byref
+from typing import NamedTuple
+import numpy as np
+
+from convert import NUM_CHANNELS, alloc_raw, channel_view
+
+START_AUTO  = 1     # dsoHTStartCollectData control bits (see capture script)
+START_ROLL  = 2
+YT_NORMAL   = 0     # dsoHTSetSampleRate YTFormat
+YT_SCAN     = 1
+YT_ROLL     = 2
+_ULONG_MASK = 0xFFFFFFFF
+
+
+class Chunk(NamedTuple):
+    start: int              # absolute index of the first sample
+    codes: np.ndarray       # (4, k) uint16 raw codes
+
+
+class Gap(NamedTuple):
+    start: int              # absolute index of the first lost sample
+    length: int
+
+
+class RingBuffer:
+    """Fixed-size (4, capacity) history of the most recent streamed samples."""
+
+    def __init__(self, capacity: int, dtype=np.uint16):
+        self.data  = np.zeros((NUM_CHANNELS, capacity), dtype=dtype)
+        self.total = 0          # samples ever written
+
+    @property
+    def capacity(self) -> int:
+        return self.data.shape[1]
+
+    def write(self, codes: np.ndarray) -> None:
+        k = codes.shape[1]
+        if k > self.capacity:
+            self.total += k - self.capacity
+            codes, k = codes[:, -self.capacity:], self.capacity
+        pos = self.total % self.capacity
+        first = min(k, self.capacity - pos)
+        self.data[:, pos:pos + first] = codes[:, :first]
+        self.data[:, :k - first]      = codes[:, first:]
+        self.total += k
+
+    def window(self, start: int, stop: int) -> np.ndarray:
+        """Copy of samples [start, stop) counted from the first write; must still be held."""
+        if start < self.total - self.capacity or stop > self.total:
+            raise IndexError(f"samples [{start}, {stop}) not in ring "
+                             f"[{max(0, self.total - self.capacity)}, {self.total})")
+        return self.data[:, np.arange(start, stop) % self.capacity]
+
+    def latest(self, n: int) -> np.ndarray:
+        """Copy of the newest `n` samples in time order."""
+        n = min(n, self.total, self.capacity)
+        idx = (self.total - n + np.arange(n)) % self.capacity
+        return self.data[:, idx]
+
+
+class RollStream:
+    """
+    Incremental reader for roll mode.  The caller configures the scope first
+    (dsoHTSetSampleRate with YT_ROLL, channels, ...); start() arms it and
+    chunks()/achunks() yield new samples every `poll_interval` seconds,
+    which defaults to half the time it takes the scope to fill its ring.
+    """
+
+    def __init__(self, scope, idx: int, dc, sample_rate: float,
+                 poll_interval: float = None, history: int = None,
+                 start_control: int = START_AUTO):
+        self.scope         = scope
+        self.idx           = idx
+        self.dc            = dc
+        self.sample_rate   = sample_rate
+        self.n             = dc.nBufferLen
+        self.poll_interval = (0.5 * self.n / sample_rate
+                              if poll_interval is None else poll_interval)
+        self.start_control = start_control
+        self.ring          = RingBuffer(history or 4 * self.n)
+        self.gaps          = []
+        self.overruns      = 0
+        self.reads         = 0
+        self._block, self._raw = alloc_raw(self.n)
+        self._view         = channel_view(self._block)
+        self._prev         = 0      # last nAlreadyReadLen seen
+        self._pos          = 0      # absolute sample count, gaps included
+
+    def start(self) -> None:
+        self.dc.nReadDataLen    = self.n
+        self.dc.nAlreadyReadLen = 0
+        self.dc.nLastAddress    = 0
+        self._prev = self._pos  = 0
+        self.scope.dsoHTStartCollectData(self.idx, self.start_control | START_ROLL)
+
+    def read(self):
+        """Poll once; returns a Chunk of new samples or None if there are none."""
+        raw, dc = self._raw, self.dc
+        self.scope.dsoHTGetData(self.idx, raw[0], raw[1],
+                                raw[2], raw[3], byref(dc))
+        self.reads += 1
+
+        total = dc.nAlreadyReadLen
+        delta = (total - self._prev) & _ULONG_MASK
+        self._prev = total
+        if delta == 0:
+            return None
+        if delta > self.n:
+            self.overruns += 1
+            self.gaps.append(Gap(self._pos, delta - self.n))
+            self._pos += delta - self.n
+            delta = self.n
+
+        idx = (dc.nLastAddress - delta + np.arange(delta)) % self.n
+        chunk = Chunk(self._pos, self._view[:, idx])
+        self._pos += delta
+        self.ring.write(chunk.codes)
+        return chunk
+
+    def _done(self, t0: float, duration: float, max_samples: int) -> bool:
+        if duration is not None and time.perf_counter() - t0 >= duration:
+            return True
+        return max_samples is not None and self._pos >= max_samples
+
+    def chunks(self, duration: float = None, max_samples: int = None):
+        """Generator of Chunks until `duration` seconds or `max_samples` samples."""
+        self.start()
+        t0 = time.perf_counter()
+        next_poll = t0
+        while not self._done(t0, duration, max_samples):
+            next_poll += self.poll_interval
+            chunk = self.read()
+            if chunk is not None:
+                yield chunk
+            time.sleep(max(0.0, next_poll - time.perf_counter()))
+
+    async def achunks(self, duration: float = None, max_samples: int = None):
+        """Async-iterator form of chunks(); sleeps on the event loop between polls."""
+        self.start()
+        t0 = time.perf_counter()
+        next_poll = t0
+        while not self._done(t0, duration, max_samples):
+            next_poll += self.poll_interval
+            chunk = self.read()
+            if chunk is not None:
+                yield chunk
+            await asyncio.sleep(max(0.0, next_poll - time.perf_counter()))
+
+    def report(self) -> dict:
+        return {
+            "samples":  self._pos,
+            "reads":    self.reads,
+            "overruns": self.overruns,
+            "lost":     sum(g.length for g in self.gaps),
+            "gaps":     [tuple(g) for g in self.gaps],
+        }
+
+
+def check_ramp(chunk: Chunk) -> bool:
+    """True if `chunk` is the simulator's ramp (code = absolute index % 256)."""
+    expect = (chunk.start + np.arange(chunk.codes.shape[1])) % 256
+    return bool((chunk.codes == expect).all())
+
+
+if __name__ == "__main__":
+    from getData import DataControl
+    from simdll import SimDll
+
+    sim = SimDll(roll_rate=100e3)
+    for label, interval in (("keeping up", None), ("slow reader", 0.03)):
+        dc = DataControl(nBufferLen=2048)
+        stream = RollStream(sim, 0, dc, sample_rate=100e3, poll_interval=interval)
+        ok = all(check_ramp(c) for c in stream.chunks(duration=0.5))
+        print(f"{label:<12} ramp intact={ok}  {stream.report()}")
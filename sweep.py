@@ -0,0 +1,254 @@
+"""
+Parameter sweep: capture a grid of settings on one device and analyse each
+point in a process pool while the next one is being captured.
+
+Every (timebase, volts/div, trigger level) point gets its own folder of
+.htcap runs named like getData's (pico_I2C_runNN.htcap, so plot.py and
+loader.run_path read them) plus an analysis.npz of the per-channel jitter
+and pulse-width tables.  sweep_index.json in the root folder is the index
+of the whole dataset: settings, files, status and summary per point.
+
+Captures are serial (one device, reconfigured through
+scopestate.ScopeState so only changed settings are sent).  As soon as a
+point is captured its analysis is submitted to the pool.  A point's status
+goes "captured" → "analysed"; on resume, analysed points are skipped and
+captured-but-not-analysed points are only re-analysed.
+
+Usage:
+    python sweep.py OUT_FOLDER [--time 13 14] [--volts 8 9]
+                    [--trigger 150 200] [--runs 10] [--workers N]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import NamedTuple
+import numpy as np
+
+INDEX_FILE    = "sweep_index.json"
+ANALYSIS_FILE = "analysis.npz"
+CHANNELS      = ("CH1", "CH4")
+
+
+class SweepPoint(NamedTuple):
+    time_div: int
+    volt_div: int
+    v_trigger: int
+
+    @property
+    def name(self) -> str:
+        return f"tb{self.time_div:02d}_v{self.volt_div:02d}_trig{self.v_trigger:03d}"
+
+
+def grid(time_divs, volt_divs, v_triggers) -> list:
+    """Every point of the grid; the trigger level varies fastest, the timebase slowest."""
+    return [SweepPoint(t, v, trig) for t, v, trig
+            in itertools.product(time_divs, volt_divs, v_triggers)]
+
+
+# ── ANALYSIS (worker process) ──────────────────────────────────────────────────
+def analyse_point(folder: str, paths: list, channels=CHANNELS) -> dict:
+    """Edge/jitter/pulse-width summary of one point's runs; writes analysis.npz."""
+    from edges import analyse
+    from loader import load_runs
+
+    t, data = load_runs(paths, channels, workers=1, cache=False)
+    fs = 1.0 / (t[1] - t[0])
+    summary, arrays = {}, {}
+    for ch in channels:
+        x   = np.asarray(data[ch])
+        res = analyse(x, fs)
+        jt, w = res["jitter"], res["widths"]
+        arrays[f"{ch}_jitter"], arrays[f"{ch}_widths"] = jt, w
+        summary[ch] = {
+            "v_min":          float(x.min()),
+            "v_max":          float(x.max()),
+            "edges_per_run":  len(res["edges"]) / len(x),
+            "jitter_mean_s":  float(np.nanmean(jt["std"])) if len(jt) else None,
+            "jitter_max_s":   float(np.nanmax(jt["std"])) if len(jt) else None,
+            "width_mean_s":   float(w["width"].mean()) if len(w) else None,
+            "width_std_s":    float(w["width"].std()) if len(w) else None,
+        }
+    np.savez(os.path.join(folder, ANALYSIS_FILE), **arrays)
+    return summary
+
+
+# ── SWEEP ──────────────────────────────────────────────────────────────────────
+class Sweep:
+    def __init__(self, scope, root: str, points: list, runs: int = 10,
+                 workers: int = None, channels=CHANNELS, idx: int = None):
+        self.scope    = scope
+        self.root     = root
+        self.points   = list(points)
+        self.runs     = runs
+        self.workers  = workers
+        self.channels = tuple(channels)
+        self.idx      = idx
+        self.index    = {}
+        self.counters = {"captured": 0, "analysed": 0, "skipped": 0, "failed": 0}
+
+    # ── index ─────────────────────────────────────────────────────────────────
+    def _index_path(self) -> str:
+        return os.path.join(self.root, INDEX_FILE)
+
+    def load_index(self) -> dict:
+        try:
+            with open(self._index_path()) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        return self.index
+
+    def save_index(self) -> None:
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self._index_path())
+
+    # ── capture (main thread, serial) ─────────────────────────────────────────
+    def _setup(self):
+        import getData
+        from scopestate import ScopeState
+
+        if self.idx is None:
+            self.idx = getData.get_device_index(self.scope)
+        getData.initialize_device(self.idx, self.scope)
+        rc, dc = getData.build_controls()
+        return rc, dc, ScopeState(self.scope, self.idx, getData.CH_ZERO_POS)
+
+    def capture_point(self, point: SweepPoint, rc, dc, state) -> list:
+        import getData
+        from convert import to_codes
+        from driver import SAMPLING_RATE_SINGLE, VOLT_MULT
+        from pipeline import CapturePipeline
+        from waiting import Backoff
+
+        folder = os.path.join(self.root, point.name)
+        os.makedirs(folder, exist_ok=True)
+        dc.nTimeDIV, dc.nVTriggerPos = point.time_div, point.v_trigger
+        for ch in range(4):
+            rc.nCHVoltDIV[ch] = point.volt_div
+        state.apply(rc, dc)
+
+        paths = []
+
+        def sink(run: int, codes: np.ndarray, run_dc) -> None:
+            codes, scale, offset = to_codes(codes, VOLT_MULT[point.volt_div],
+                                            getData.CH_ZERO_POS,
+                                            getData.PROBE_MULTIPLIER)
+            fn = os.path.join(folder, f"pico_I2C_run{run:02d}.htcap")
+            getData.save_capture(fn, run_dc, codes, scale, offset)
+            paths.append(fn)
+
+        wait_policy = Backoff.for_record(dc.nReadDataLen,
+                                         SAMPLING_RATE_SINGLE[point.time_div],
+                                         timeout=getData.WAIT_TIMEOUT)
+        pipe = CapturePipeline(self.scope, self.idx, dc, sink, wait=wait_policy,
+                               sink_dc=True)
+        with contextlib.redirect_stdout(io.StringIO()):      # mute "Saved:"
+            report = pipe.run(self.runs)
+        self.index[point.name] = {
+            "settings": point._asdict(),
+            "folder":   point.name,
+            "files":    sorted(os.path.basename(p) for p in paths),
+            "status":   "captured",
+            "captured": time.time(),
+            "capture":  {"wall_s": report["wall_s"], "captures_s": report["captures_s"]},
+        }
+        self.save_index()
+        self.counters["captured"] += 1
+        return sorted(paths)
+
+    # ── driver ────────────────────────────────────────────────────────────────
+    def _collect(self, futures: dict, block: bool) -> None:
+        if not futures:
+            return
+        done, _ = wait(futures, timeout=None if block else 0,
+                       return_when=FIRST_COMPLETED)
+        for fut in done:
+            name = futures.pop(fut)
+            entry = self.index[name]
+            try:
+                entry["summary"] = fut.result()
+                entry["status"]  = "analysed"
+                self.counters["analysed"] += 1
+            except Exception as exc:
+                entry["error"] = repr(exc)
+                self.counters["failed"] += 1
+            self.save_index()
+
+    def run(self, log=print) -> dict:
+        """Capture and analyse every point not already analysed; returns counters."""
+        os.makedirs(self.root, exist_ok=True)
+        self.load_index()
+        todo = [p for p in self.points
+                if self.index.get(p.name, {}).get("status") != "analysed"]
+        self.counters["skipped"] = len(self.points) - len(todo)
+        t0 = time.perf_counter()
+
+        futures = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as ex:
+            setup = None
+            for point in todo:
+                entry = self.index.get(point.name)
+                if entry and entry["status"] == "captured":
+                    paths = [os.path.join(self.root, point.name, f) for f in entry["files"]]
+                else:
+                    if setup is None:
+                        setup = self._setup()
+                    paths = self.capture_point(point, *setup)
+                    log(f"captured {point.name}: {len(paths)} runs")
+                futures[ex.submit(analyse_point, os.path.join(self.root, point.name),
+                                  paths, self.channels)] = point.name
+                self._collect(futures, block=False)
+            while futures:
+                self._collect(futures, block=True)
+
+        self.counters["wall_s"] = time.perf_counter() - t0
+        if setup is not None:
+            self.counters["config"] = setup[2].counters()
+        return self.counters
+
+
+def print_index(index: dict, channels=CHANNELS) -> None:
+    for name, entry in sorted(index.items()):
+        s = entry.get("summary")
+        if s is None:
+            print(f"{name}: {entry['status']} {entry.get('error', '')}")
+            continue
+        parts = []
+        for ch in channels:
+            d = s[ch]
+            jit = "-" if d["jitter_mean_s"] is None else f"{d['jitter_mean_s'] * 1e9:.1f} ns"
+            parts.append(f"{ch} {d['edges_per_run']:.1f} edges σ={jit}")
+        print(f"{name}: " + ",  ".join(parts))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("root")
+    ap.add_argument("--time", type=int, nargs="+", default=[14])
+    ap.add_argument("--volts", type=int, nargs="+", default=[8])
+    ap.add_argument("--trigger", type=int, nargs="+", default=[200])
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    from driver import load_driver
+
+    sweep = Sweep(load_driver(), args.root, grid(args.time, args.volts, args.trigger),
+                  runs=args.runs, workers=args.workers)
+    counters = sweep.run()
+    print_index(sweep.index)
+    print(counters)
+    return 1 if counters["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Software triggers over a continuous stream, saving only the segments
+around each event.
+
+Triggers look at each chunk of new samples (volts, (4, k)) as a whole and
+return the absolute sample index of every event in it; state that spans
+chunks (current logic level, an open pulse, the last level regions) is
+carried over, so an event split across two reads is still found once.
+
+    PulseWidth(ch, level, min_width, max_width)  pulse (high, or low with
+                                  polarity=-1) whose width is inside
+                                  [min_width, max_width]; fires at its end
+    Runt(ch, low, high)           pulse that crosses `low` and falls back
+                                  without reaching `high`
+    Pattern({ch: level}, "1X0X")  every channel's logic level matches
+                                  (1/0/X per CH1..CH4); fires when it starts
+    I2CCondition(scl, sda, level, "start" | "stop" | "both")
+                                  SDA falls (START) / rises (STOP) while SCL high
+
+Logic levels use a hysteresis band of ±`hysteresis` V around each level.
+
+SegmentedCapture feeds streaming.RollStream chunks (or any (codes, start)
+pairs) through the triggers and keeps a ring of recent samples; each
+accepted event produces one segment of `pre` samples before and `post`
+samples after it, handed to `sink(codes, meta)` once the post-trigger
+samples have arrived.  `holdoff` (default `post`) suppresses re-triggers.
+A gap in the stream resets trigger state and drops segments that needed
+the lost samples.  ArchiveSink writes segments into one archive.py file.
+
+Usage (simulated roll-mode I2C bus with injected runt pulses):
+    python swtrigger.py
+"""
+
+import time
+import numpy as np
+
+from convert import channel_scale, to_volts
+from streaming import RingBuffer
+
+
+def _digitize(x: np.ndarray, lo: float, hi: float, prev: bool) -> np.ndarray:
+    """Logic level per sample with hysteresis; `prev` is the level before x[0]."""
+    above = x > hi
+    known = above | (x < lo)
+    last = np.where(known, np.arange(len(x)), -1)
+    np.maximum.accumulate(last, out=last)
+    return np.where(last >= 0, above[np.maximum(last, 0)], prev)
+
+
+def _transitions(state: np.ndarray, prev: bool) -> tuple:
+    """(rising, falling) sample offsets of a logic-level array."""
+    d = np.diff(state.view(np.int8), prepend=np.int8(prev))
+    return np.flatnonzero(d == 1), np.flatnonzero(d == -1)
+
+
+class Trigger:
+    """Base class: process(volts, start, fs) → absolute event indices (int64)."""
+
+    name = "trigger"
+
+    def reset(self) -> None:
+        pass
+
+    def process(self, volts: np.ndarray, start: int, fs: float) -> np.ndarray:
+        raise NotImplementedError
+
+
+class PulseWidth(Trigger):
+    name = "pulse_width"
+
+    def __init__(self, ch: int, level: float, min_width: float = 0.0,
+                 max_width: float = np.inf, polarity: int = 1,
+                 hysteresis: float = 0.1):
+        self.ch, self.level, self.hysteresis = ch, level, hysteresis
+        self.min_width, self.max_width, self.polarity = min_width, max_width, polarity
+        self.reset()
+
+    def reset(self) -> None:
+        self._level = None          # logic level at the end of the last chunk
+        self._open  = None          # absolute start of a pulse still in progress
+
+    def process(self, volts, start, fs):
+        x = volts[self.ch] if self.polarity > 0 else -volts[self.ch]
+        lvl = self.level if self.polarity > 0 else -self.level
+        prev = bool(x[0] > lvl) if self._level is None else self._level
+        state = _digitize(x, lvl - self.hysteresis, lvl + self.hysteresis, prev)
+        rise, fall = _transitions(state, prev)
+        rise, fall = rise + start, fall + start
+        if self._open is not None:
+            rise = np.concatenate(([self._open], rise))
+        if len(fall) and (not len(rise) or fall[0] < rise[0]):
+            fall = fall[1:]                 # pulse that began before the stream
+        k = len(fall)
+        width = (fall - rise[:k]) / fs
+        ok = (width >= self.min_width) & (width <= self.max_width)
+        self._level = bool(state[-1])
+        self._open  = int(rise[k]) if len(rise) > k else None
+        return fall[ok]
+
+
+class Runt(Trigger):
+    name = "runt"
+
+    def __init__(self, ch: int, low: float, high: float, hysteresis: float = 0.1):
+        self.ch, self.low, self.high, self.hysteresis = ch, low, high, hysteresis
+        self.reset()
+
+    def reset(self) -> None:
+        self._tail  = np.empty(0, dtype=np.int8)    # last two region values
+        self._above = None                          # (above low, above high) at chunk end
+
+    def process(self, volts, start, fs):
+        x, h = volts[self.ch], self.hysteresis
+        prev = (bool(x[0] > self.low), bool(x[0] > self.high)) if self._above is None else self._above
+        above_lo = _digitize(x, self.low - h, self.low + h, prev[0])
+        above_hi = _digitize(x, self.high - h, self.high + h, prev[1])
+        self._above = (bool(above_lo[-1]), bool(above_hi[-1]))
+        region = above_lo.astype(np.int8) + above_hi
+        # after a reset the level before the first change seeds the sequence,
+        # as the carried tail does between chunks
+        tail = self._tail if len(self._tail) else region[:1]
+        change = np.flatnonzero(np.diff(region, prepend=tail[-1]))
+        self._tail = tail
+        seq = np.concatenate((self._tail, region[change]))
+        pos = np.concatenate((np.full(len(self._tail), -1), change + start))
+        hit = np.flatnonzero((seq[:-2] == 0) & (seq[1:-1] == 1) & (seq[2:] == 0)) + 2
+        hit = hit[pos[hit] >= 0]
+        self._tail = seq[-2:]
+        return pos[hit].astype(np.int64)
+
+
+class Pattern(Trigger):
+    name = "pattern"
+
+    def __init__(self, levels: dict, pattern: str, hysteresis: float = 0.1):
+        """`levels` maps channel → threshold; `pattern` has one 1/0/X per CH1..CH4."""
+        self.levels, self.hysteresis = levels, hysteresis
+        self.want = {ch: c == "1" for ch, c in enumerate(pattern) if c in "01"}
+        self.reset()
+
+    def reset(self) -> None:
+        self._state = {}
+        self._match = None
+
+    def process(self, volts, start, fs):
+        match = np.ones(volts.shape[1], dtype=bool)
+        for ch, want in self.want.items():
+            lvl = self.levels[ch]
+            prev = self._state.get(ch, bool(volts[ch, 0] > lvl))
+            s = _digitize(volts[ch], lvl - self.hysteresis, lvl + self.hysteresis, prev)
+            self._state[ch] = bool(s[-1])
+            match &= s if want else ~s
+        prev = bool(match[0]) if self._match is None else self._match
+        rise, _ = _transitions(match, prev)
+        self._match = bool(match[-1])
+        return rise + start
+
+
+class I2CCondition(Trigger):
+    def __init__(self, scl: int, sda: int, level: float, kind: str = "start",
+                 hysteresis: float = 0.1):
+        if kind not in ("start", "stop", "both"):
+            raise ValueError(f"kind must be start, stop or both, not {kind!r}")
+        self.scl, self.sda, self.level, self.kind = scl, sda, level, kind
+        self.hysteresis = hysteresis
+        self.name = f"i2c_{kind}"
+        self.reset()
+
+    def reset(self) -> None:
+        self._scl = self._sda = None
+
+    def process(self, volts, start, fs):
+        lo, hi = self.level - self.hysteresis, self.level + self.hysteresis
+        p_scl = bool(volts[self.scl, 0] > self.level) if self._scl is None else self._scl
+        p_sda = bool(volts[self.sda, 0] > self.level) if self._sda is None else self._sda
+        scl = _digitize(volts[self.scl], lo, hi, p_scl)
+        sda = _digitize(volts[self.sda], lo, hi, p_sda)
+        self._scl, self._sda = bool(scl[-1]), bool(sda[-1])
+        rise, fall = _transitions(sda, p_sda)
+        events = {"start": fall, "stop": rise,
+                  "both": np.union1d(fall, rise)}[self.kind]
+        return events[scl[events]] + start
+
+
+# ── SEGMENTED CAPTURE ──────────────────────────────────────────────────────────
+class SegmentedCapture:
+    def __init__(self, triggers, pre: int, post: int, sample_rate: float,
+                 scale, offset, sink, holdoff: int = None, max_chunk: int = 1 << 16):
+        self.triggers    = list(triggers)
+        self.pre         = pre
+        self.post        = post
+        self.sample_rate = sample_rate
+        self.scale       = np.asarray(scale, dtype=float)
+        self.offset      = np.asarray(offset, dtype=float)
+        self.sink        = sink
+        self.holdoff     = post if holdoff is None else holdoff
+        self.capacity    = pre + post + max_chunk
+        self.ring        = RingBuffer(self.capacity)
+        self.base        = None     # absolute index of ring sample 0
+        self.pending     = []       # (event, trigger name) awaiting post samples
+        self.last_event  = None
+        self.counters    = {"samples": 0, "events": {t.name: 0 for t in self.triggers},
+                            "accepted": 0, "held_off": 0, "segments": 0,
+                            "dropped": 0, "saved_samples": 0, "chunks": 0}
+
+    @property
+    def end(self) -> int:
+        """Absolute index one past the newest sample."""
+        return self.base + self.ring.total
+
+    def _reset(self, start: int) -> None:
+        self.counters["dropped"] += len(self.pending)
+        self.pending = []
+        self.ring = RingBuffer(self.capacity)
+        self.base = start
+        for t in self.triggers:
+            t.reset()
+
+    def feed(self, codes: np.ndarray, start: int) -> None:
+        """Process one chunk of (4, k) codes starting at absolute sample `start`."""
+        if self.base is None or start != self.end:
+            self._reset(start)
+        self.ring.write(codes)
+        self.counters["samples"] += codes.shape[1]
+        self.counters["chunks"]  += 1
+
+        volts = to_volts(codes, self.scale, self.offset)
+        found = []
+        for t in self.triggers:
+            ev = t.process(volts, start, self.sample_rate)
+            self.counters["events"][t.name] += len(ev)
+            found += [(int(e), t.name) for e in ev]
+        for e, name in sorted(found):
+            if self.last_event is not None and e - self.last_event < self.holdoff:
+                self.counters["held_off"] += 1
+                continue
+            self.last_event = e
+            self.counters["accepted"] += 1
+            self.pending.append((e, name))
+        self._flush()
+
+    def _flush(self) -> None:
+        end, keep = self.end, []
+        for e, name in self.pending:
+            if e + self.post > end:
+                keep.append((e, name))
+                continue
+            lo = max(e - self.pre, self.base, end - self.ring.capacity)
+            seg = self.ring.window(lo - self.base, e + self.post - self.base)
+            self.sink(seg, {"trigger": name, "index": e, "pre": e - lo,
+                            "post": self.post})
+            self.counters["segments"] += 1
+            self.counters["saved_samples"] += seg.shape[1]
+        self.pending = keep
+
+    def run(self, stream, duration: float = None, max_samples: int = None) -> dict:
+        """Feed a streaming.RollStream until `duration` s / `max_samples`; returns report()."""
+        t0 = time.perf_counter()
+        for chunk in stream.chunks(duration, max_samples):
+            self.feed(chunk.codes, chunk.start)
+        self.counters["wall_s"] = time.perf_counter() - t0
+        return self.report()
+
+    def report(self) -> dict:
+        c = dict(self.counters)
+        c["pending"] = len(self.pending)
+        c["kept"] = c["saved_samples"] / c["samples"] if c["samples"] else 0.0
+        return c
+
+
+class ArchiveSink:
+    """Sink that appends each segment to an archive.ArchiveWriter."""
+
+    def __init__(self, path: str, scale, offset, sample_rate: float, **writer_kwargs):
+        from archive import ArchiveWriter
+
+        self.writer      = ArchiveWriter(path, **writer_kwargs)
+        self.scale       = scale
+        self.offset      = offset
+        self.sample_rate = sample_rate
+
+    def __call__(self, codes: np.ndarray, meta: dict) -> None:
+        self.writer.add(codes.astype(np.uint8), self.scale, self.offset,
+                        self.sample_rate, trigger=meta)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+# ── DEMO ───────────────────────────────────────────────────────────────────────
+def _runt_wave(period: float = 5e-3, every: int = 10, level: float = 3.3):
+    """Square pulses every `period` s; every `every`-th one only reaches 40 %."""
+    def wave(t, ch):
+        n = np.floor(t / period)
+        high = (t / period - n) < 0.3
+        amp = np.where(n % every == every - 1, 0.4 * level, level)
+        return np.where(high, amp, 0.0)
+    return wave
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from archive import ArchiveReader
+    from driver import VOLT_MULT
+    from getData import DataControl
+    from simdll import SimDll
+    from streaming import RollStream
+
+    # the first runt of a stream (no carried state yet) must be reported
+    v = np.zeros((4, 200))
+    v[1, 50:60] = 1.0
+    first = Runt(1, 0.5, 2.5).process(v, 0, 1.0)
+    assert first.tolist() == [60], first
+    v[1, 100:110] = 1.0
+    assert Runt(1, 0.5, 2.5).process(v, 0, 1.0).tolist() == [60, 110]
+    print(f"first-runt check: runt at samples 50-60 reported at {first.tolist()}")
+
+    # noise dithering around `low` on a full-height rising edge is not a runt
+    v = np.zeros((4, 200))
+    v[1, 50:] = [0.45, 0.52, 0.48, 0.55] * 5 + [3.0] * 130
+    dither = Runt(1, 0.5, 2.5).process(v, 0, 1.0)
+    assert dither.tolist() == [], dither
+    print("dither check: threshold chatter on a rising edge reports no runt")
+
+    fs = 200e3
+    sim = SimDll(waveforms=("i2c_scl", _runt_wave(), "noise", "i2c_sda"),
+                 roll_rate=fs, roll_waveforms=True, i2c_rate=5e3, i2c_gap=400)
+    scale, offset = channel_scale(VOLT_MULT[8], [128] * 4)
+    stream = RollStream(sim, 0, DataControl(nBufferLen=16384), sample_rate=fs)
+    path = os.path.join(tempfile.mkdtemp(), "segments.htarc")
+    sink = ArchiveSink(path, scale, offset, fs)
+    triggers = [I2CCondition(0, 3, 1.65, "start"),
+                Runt(1, 0.5, 2.5),
+                PulseWidth(0, 1.65, min_width=50e-3)]     # SCL idle between bursts
+    seg = SegmentedCapture(triggers, pre=200, post=800, sample_rate=fs,
+                           scale=scale, offset=offset, sink=sink, holdoff=0)
+    report = seg.run(stream, duration=1.0)
+    sink.close()
+    with ArchiveReader(path) as r:
+        kinds = [run["trigger"]["trigger"] for run in r.runs]
+    print(f"streamed {report['samples']} samples in {report['chunks']} chunks "
+          f"({stream.report()['overruns']} overruns)")
+    print(f"events {report['events']}, held off {report['held_off']}")
+    print(f"{report['segments']} segments saved ({report['kept']:.1%} of samples), "
+          f"archive {os.path.getsize(path) / 1e3:.1f} kB: "
+          f"{ {k: kinds.count(k) for k in set(kinds)} }")
@@ -0,0 +1,188 @@
+"""
+Wait strategies for "is the capture ready?" (dsoHTGetState(idx) & 2).
+
+A policy is called as policy(scope, idx) and returns once data can be read,
+or awaited as `await policy.wait_async(scope, idx)`.  Each policy only
+decides how long to sleep between polls (0 = spin); the shared loop handles
+timeouts and records a histogram of detection latency, i.e. the time between
+the last "not ready" poll and the "ready" poll, which bounds how late a
+ready record is noticed.
+"""
+
+import asyncio
+import time
+import numpy as np
+
+STATE_READY = 2
+
+
+class LatencyHistogram:
+    """Log-spaced histogram of latencies in seconds (1 µs … 10 s)."""
+
+    EDGES = np.array([m * 10.0 ** e for e in range(-6, 1) for m in (1, 2, 5)]
+                     + [10.0])
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES) + 1, dtype=np.int64)
+        self.total  = 0.0
+        self.max    = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[np.searchsorted(self.EDGES, seconds)] += 1
+        self.total += seconds
+        self.max    = max(self.max, seconds)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def percentile(self, q: float) -> float:
+        """Upper bin edge containing the q-th percentile (0-100)."""
+        n = self.count
+        if n == 0:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.counts), q / 100 * n))
+        return float(self.EDGES[i]) if i < len(self.EDGES) else self.max
+
+    def summary(self) -> dict:
+        n = self.count
+        return {
+            "count": n,
+            "mean":  self.total / n if n else 0.0,
+            "p50":   self.percentile(50),
+            "p99":   self.percentile(99),
+            "max":   self.max,
+        }
+
+
+class WaitPolicy:
+    """Base class: subclasses implement delays(), a generator of sleep times."""
+
+    def __init__(self, timeout: float = None):
+        self.timeout   = timeout
+        self.polls     = 0
+        self.histogram = LatencyHistogram()
+
+    def delays(self):
+        raise NotImplementedError
+
+    def _check_timeout(self, idx: int, start: float, now: float) -> None:
+        if self.timeout is not None and now - start > self.timeout:
+            raise TimeoutError(f"device {idx} not ready after {self.timeout} s")
+
+    def __call__(self, scope, idx: int) -> None:
+        start = last = time.perf_counter()
+        delays = self.delays()
+        while True:
+            self.polls += 1
+            ready = scope.dsoHTGetState(idx) & STATE_READY
+            now = time.perf_counter()
+            if ready:
+                self.histogram.add(now - last)
+                return
+            last = now
+            self._check_timeout(idx, start, now)
+            d = next(delays)
+            if d:
+                time.sleep(d)
+
+    async def wait_async(self, scope, idx: int) -> None:
+        """Same loop, sleeping with asyncio.sleep so the event loop keeps running."""
+        start = last = time.perf_counter()
+        delays = self.delays()
+        while True:
+            self.polls += 1
+            ready = scope.dsoHTGetState(idx) & STATE_READY
+            now = time.perf_counter()
+            if ready:
+                self.histogram.add(now - last)
+                return
+            last = now
+            self._check_timeout(idx, start, now)
+            await asyncio.sleep(next(delays))
+
+
+# ── POLICIES ───────────────────────────────────────────────────────────────────
+class SleepPoll(WaitPolicy):
+    """Fixed-interval polling (the original 1 ms loop)."""
+
+    def __init__(self, interval: float = 0.001, timeout: float = None):
+        super().__init__(timeout)
+        self.interval = interval
+
+    def delays(self):
+        while True:
+            yield self.interval
+
+
+class SpinThenSleep(WaitPolicy):
+    """Poll back-to-back for `spin` seconds, then fall back to `interval` sleeps."""
+
+    def __init__(self, spin: float = 200e-6, interval: float = 500e-6,
+                 timeout: float = None):
+        super().__init__(timeout)
+        self.spin     = spin
+        self.interval = interval
+
+    def delays(self):
+        end = time.perf_counter() + self.spin
+        while time.perf_counter() < end:
+            yield 0
+        while True:
+            yield self.interval
+
+
+class Backoff(WaitPolicy):
+    """
+    Sleep through part of the expected record duration, then poll with
+    exponentially growing sleeps starting at `initial` and capped at
+    `cap` × expected, so slow timebases make a handful of DLL calls rather
+    than thousands while fast ones stay near `initial` latency.
+    """
+
+    def __init__(self, expected: float, initial: float = 50e-6,
+                 factor: float = 2.0, presleep: float = 0.5, cap: float = 0.25,
+                 timeout: float = None):
+        super().__init__(timeout)
+        self.expected = expected
+        self.initial  = initial
+        self.factor   = factor
+        self.presleep = presleep
+        self.cap      = cap
+
+    @classmethod
+    def for_record(cls, buffer_len: int, sample_rate: float, **kwargs) -> "Backoff":
+        """Policy for a record of `buffer_len` samples at `sample_rate` (SAMPLING_RATE_* entry)."""
+        return cls(record_duration(buffer_len, sample_rate), **kwargs)
+
+    def delays(self):
+        if self.expected * self.presleep > self.initial:
+            yield self.expected * self.presleep
+        limit = max(self.initial, self.expected * self.cap)
+        d = self.initial
+        while True:
+            yield d
+            d = min(d * self.factor, limit)
+
+
+def record_duration(buffer_len: int, sample_rate: float) -> float:
+    """Seconds needed to fill one record of `buffer_len` samples."""
+    return buffer_len / sample_rate
+
+
+def print_summary(policy: WaitPolicy) -> None:
+    s = policy.histogram.summary()
+    print(f"{type(policy).__name__}: {s['count']} waits, {policy.polls} polls, "
+          f"latency mean={s['mean']*1e6:.0f} µs p50≤{s['p50']*1e6:.0f} µs "
+          f"p99≤{s['p99']*1e6:.0f} µs max={s['max']*1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    from simdll import SimDll
+
+    sim = SimDll(trigger_latency=0.002, record_time=0.0016)
+    for policy in (SleepPoll(), SpinThenSleep(), Backoff(0.0016)):
+        for _ in range(100):
+            sim.dsoHTStartCollectData(0, 1)
+            policy(sim, 0)
+        print_summary(policy)